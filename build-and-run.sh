@@ -2,7 +2,8 @@
 set -e
 
 echo "=== Building Docker image ==="
-docker build -t linux-observability-toolkit:latest .
+docker build --build-arg GIT_HASH="$(git rev-parse --short HEAD 2>/dev/null || echo unknown)" \
+    -t linux-observability-toolkit:latest .
 
 echo ""
 echo "=== Testing toolkit help ==="
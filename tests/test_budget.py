@@ -0,0 +1,77 @@
+"""Bundle size budget: tail truncation and how shares move between collectors."""
+
+from __future__ import annotations
+
+from toolkit.core.budget import MIN_KEEP_BYTES, BudgetGovernor, tail_truncate
+
+
+def _lines(n: int, width: int = 100) -> bytes:
+    return b"".join(b"%0*d\n" % (width - 1, i) for i in range(n))
+
+
+def test_tail_truncate_keeps_newest_from_a_line_start(tmp_path):
+    p = tmp_path / "journald.txt"
+    data = _lines(100)
+    p.write_bytes(data)
+    new_size = tail_truncate(p, 1050)
+    out = p.read_bytes()
+    marker, _, rest = out.partition(b"\n")
+    assert marker.startswith(b"[... ") and b"dropped" in marker
+    # 1050 bytes back lands mid-line - that partial line goes too
+    assert rest == data[-1000:]
+    assert b"%d bytes" % (len(data) - 1000) in marker
+    assert new_size == len(out)
+
+
+def test_tail_truncate_leaves_small_files_alone(tmp_path):
+    p = tmp_path / "x.txt"
+    p.write_bytes(b"short\n")
+    assert tail_truncate(p, 100) == 6
+    assert p.read_bytes() == b"short\n"
+
+
+def _spool(tmp_path, name: str, files) -> object:
+    d = tmp_path / name
+    for rel, data in files.items():
+        (d / rel).parent.mkdir(parents=True, exist_ok=True)
+        (d / rel).write_bytes(data)
+    return d
+
+
+def test_json_is_never_cut(tmp_path):
+    g = BudgetGovernor(10_000, ["process"])
+    big_json = b"[" + b"1," * 20_000 + b"1]"
+    d = _spool(tmp_path, "process", {"processes.json": big_json,
+                                     "processes.txt": _lines(200)})
+    info = g.settle("process", d)
+    assert (d / "processes.json").read_bytes() == big_json
+    assert (d / "processes.txt").stat().st_size < MIN_KEEP_BYTES + 200
+    assert [t["path"] for t in g.truncations] == ["processes.txt"]
+    assert info["used"] > info["granted"]
+
+
+def test_unused_share_carries_over_to_later_collectors(tmp_path):
+    g = BudgetGovernor(100_000, ["systemd", "journald"], weights={"systemd": 1, "journald": 1})
+    assert g.shares == {"systemd": 50_000, "journald": 50_000}
+    g.settle("systemd", _spool(tmp_path, "systemd", {"unit.txt": b"x" * 10_000}))
+    assert g.pool == 40_000
+    log = _lines(850)  # 85KB: over its own share, within share + pool
+    d = _spool(tmp_path, "journald", {"logs/journald.txt": log})
+    info = g.settle("journald", d)
+    assert info == {"share": 50_000, "granted": 85_000, "wanted": 85_000, "used": 85_000}
+    assert (d / "logs/journald.txt").read_bytes() == log
+    assert g.truncations == []
+    assert g.summary()["unused_bytes"] == 5_000
+
+
+def test_overshoot_becomes_debt_for_whoever_finishes_later(tmp_path):
+    g = BudgetGovernor(20_000, ["resource", "journald"], weights={"resource": 1, "journald": 1})
+    # Nothing here can be cut
+    g.settle("resource", _spool(tmp_path, "resource", {"resource.json": b"0" * 15_000}))
+    assert g.pool == -5_000
+    d = _spool(tmp_path, "journald", {"logs/journald.txt": _lines(100)})
+    info = g.settle("journald", d)
+    assert info["granted"] == 5_000
+    # Its 10KB share minus the 5KB debt
+    assert info["used"] <= 5_000
+    assert g.summary()["over_budget_bytes"] == 0
@@ -0,0 +1,182 @@
+"""cgroup collector: resolve/sample/rates/format_report against v2 and v1 fixture trees."""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Dict
+
+import pytest
+
+from toolkit.collectors import cgroup
+
+UNIT = "/system.slice/app.service"
+
+PSI = ("some avg10=1.00 avg60=0.50 avg300=0.10 total={some}\n"
+       "full avg10=0.00 avg60=0.00 avg300=0.00 total={full}\n")
+
+
+def _write(base: Path, files: Dict[str, str]) -> None:
+    base.mkdir(parents=True, exist_ok=True)
+    for name, text in files.items():
+        (base / name).write_text(text)
+
+
+@pytest.fixture(autouse=True)
+def _no_sysfs(monkeypatch):
+    # device names come from /sys/dev/block; keep the host out of it
+    monkeypatch.setattr(cgroup, "_devs", {"8:0": "sda"})
+
+
+@pytest.fixture
+def v2(tmp_path):
+    fs = tmp_path / "v2"
+    fs.mkdir()
+    (fs / "cgroup.controllers").write_text("cpu io memory pids\n")
+    root = fs / UNIT.lstrip("/")
+    _write(root, {
+        "memory.current": "104857600\n",
+        "memory.max": "209715200\n",
+        "memory.high": "max\n",
+        "memory.swap.current": "0\n",
+        "memory.swap.max": "max\n",
+        "memory.stat": "anon 52428800\nfile 41943040\npgmajfault 7\n",
+        "memory.events": "low 0\nhigh 0\nmax 3\noom 0\noom_kill 0\n",
+        "cpu.stat": "usage_usec 1000000\nnr_periods 100\nnr_throttled 10\n"
+                    "throttled_usec 50000\n",
+        "cpu.max": "50000 100000\n",
+        "io.stat": "8:0 rbytes=1000 wbytes=2000 rios=10 wios=20 dbytes=0 dios=0\n",
+        "pids.current": "12\n",
+        "pids.max": "max\n",
+        "cpu.pressure": PSI.format(some=1000000, full=0),
+        "memory.pressure": PSI.format(some=0, full=0),
+        "io.pressure": PSI.format(some=0, full=0),
+    })
+    return fs
+
+
+@pytest.fixture
+def v1(tmp_path):
+    fs = tmp_path / "v1"
+    rel = UNIT.lstrip("/")
+    _write(fs / "memory" / rel, {
+        "memory.usage_in_bytes": "104857600\n",
+        "memory.limit_in_bytes": str(cgroup._V1_UNLIMITED) + "\n",
+        "memory.oom_control": "oom_kill_disable 0\nunder_oom 0\noom_kill 2\n",
+        "memory.stat": "cache 41943040\nrss 52428800\ndirty 4096\nwriteback 0\n",
+        "memory.failcnt": "5\n",
+    })
+    _write(fs / "cpu,cpuacct" / rel, {
+        "cpu.stat": "nr_periods 100\nnr_throttled 10\nthrottled_time 50000000\n",
+        "cpuacct.usage": "1000000000\n",
+        "cpu.cfs_quota_us": "-1\n",
+        "cpu.cfs_period_us": "100000\n",
+    })
+    _write(fs / "pids" / rel, {"pids.current": "12\n", "pids.max": "max\n"})
+    _write(fs / "blkio" / rel, {
+        "blkio.throttle.io_service_bytes": "8:0 Read 1000\n8:0 Write 2000\n8:0 Total 3000\n"
+                                           "Total 3000\n",
+        "blkio.throttle.io_serviced": "8:0 Read 10\n8:0 Write 20\n8:0 Total 30\nTotal 30\n",
+    })
+    return fs
+
+
+def test_resolve_v2(v2):
+    where = cgroup.resolve(UNIT, v2)
+    assert where == {"version": 2, "root": v2 / "system.slice/app.service"}
+    assert cgroup.resolve("/system.slice/gone.service", v2) is None
+
+
+def test_resolve_v1_with_and_without_unified(v1):
+    where = cgroup.resolve(UNIT, v1)
+    assert where["version"] == 1
+    assert where["v1"]["memory"] == v1 / "memory/system.slice/app.service"
+    assert where["unified"] is None
+
+    (v1 / "unified/system.slice/app.service").mkdir(parents=True)
+    assert cgroup.resolve(UNIT, v1)["unified"] == v1 / "unified/system.slice/app.service"
+    assert cgroup.resolve("/system.slice/gone.service", v1) is None
+
+
+def test_sample_v2(v2):
+    s = cgroup.sample(cgroup.resolve(UNIT, v2))
+    assert s["memory"]["current"] == 104857600
+    assert s["memory"]["max"] == 209715200
+    assert s["memory"]["high"] is None
+    assert s["cpu"]["quota_cpus"] == 0.5
+    assert s["io"] == {"sda": {"rbytes": 1000, "wbytes": 2000, "rios": 10, "wios": 20,
+                               "dbytes": 0, "dios": 0}}
+    assert s["pids"] == {"current": 12, "max": None}
+    assert s["pressure"]["cpu"]["some"]["total"] == 1000000
+
+
+def test_sample_v1_normalizes_to_v2_names(v1):
+    s = cgroup.sample(cgroup.resolve(UNIT, v1))
+    mem = s["memory"]
+    assert mem["max"] is None
+    assert mem["stat"]["anon"] == 52428800
+    assert mem["stat"]["file"] == 41943040
+    assert mem["stat"]["file_dirty"] == 4096
+    assert mem["events"] == {"max": 5, "oom_kill": 2, "under_oom": 0}
+    assert s["cpu"] == {"nr_periods": 100, "nr_throttled": 10, "throttled_usec": 50000,
+                        "usage_usec": 1000000, "quota_cpus": None}
+    assert s["io"] == {"sda": {"rbytes": 1000, "wbytes": 2000, "rios": 10, "wios": 20}}
+    assert s["pressure"] == {}
+
+
+def test_rates_between_two_v2_samples(v2):
+    where = cgroup.resolve(UNIT, v2)
+    a = cgroup.sample(where)
+    root = where["root"]
+    (root / "cpu.stat").write_text("usage_usec 1500000\nnr_periods 120\nnr_throttled 15\n"
+                                   "throttled_usec 150000\n")
+    (root / "io.stat").write_text("8:0 rbytes=5000 wbytes=2000 rios=30 wios=20\n")
+    (root / "memory.events").write_text("low 0\nhigh 0\nmax 3\noom 1\noom_kill 1\n")
+    (root / "cpu.pressure").write_text(PSI.format(some=1250000, full=0))
+    b = cgroup.sample(where)
+    a["t"], b["t"] = 10.0, 12.0
+
+    r = cgroup.rates(a, b)
+    assert r["interval_sec"] == 2.0
+    assert r["cpu_pct"] == 25.0
+    assert r["throttled_periods"] == 5
+    assert r["throttled_periods_pct"] == 25.0
+    assert r["throttled_pct"] == 5.0
+    assert r["io"] == {"sda": {"rbytes": 2000, "wbytes": 0, "rios": 10, "wios": 0}}
+    assert r["memory_events"] == {"oom": 1, "oom_kill": 1}
+    assert r["pressure_stall_pct"]["cpu"] == {"some": 12.5, "full": 0.0}
+
+
+def test_rates_needs_time_to_pass(v2):
+    s = cgroup.sample(cgroup.resolve(UNIT, v2))
+    assert cgroup.rates(s, s) == {}
+
+
+def test_format_report_v2(v2):
+    where = cgroup.resolve(UNIT, v2)
+    a = cgroup.sample(where)
+    b = cgroup.sample(where)
+    a["t"], b["t"] = 0.0, 1.0
+    b["host_pressure"] = a["host_pressure"] = {}
+    text = cgroup.format_report(UNIT, 2, b, cgroup.rates(a, b))
+
+    assert text.startswith(f"# cgroup {UNIT} (v2)\n# rates over 1.0s\n")
+    assert "(50%)" in text
+    assert "quota 0.5 CPUs   usage 0.0% of one CPU" in text
+    assert "throttled 10 of 100 periods" in text
+    assert "\nsda " in text
+    assert "12 / unlimited" in text
+    assert "  unit   cpu    some   0.00%   avg10   1.00" in text
+    assert "no PSI" not in text
+
+
+def test_format_report_v1_without_rates_or_psi(v1):
+    s = cgroup.sample(cgroup.resolve(UNIT, v1))
+    s["host_pressure"] = {}
+    text = cgroup.format_report(UNIT, 1, s, {})
+
+    assert "# rates over" not in text
+    assert "limit unlimited" in text
+    assert "events (since cgroup creation): max 5  oom_kill 2  under_oom 0" in text
+    assert "quota none" in text
+    assert "  in the window:" not in text
+    assert "[no PSI" in text
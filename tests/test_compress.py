@@ -0,0 +1,62 @@
+"""Block-parallel compression: output stays a plain gzip/xz stream."""
+
+from __future__ import annotations
+
+import gzip
+import io
+import lzma
+import random
+
+import pytest
+
+from toolkit.core import compress
+from toolkit.core.compress import BlockCompressor
+
+
+def _data(n: int) -> bytes:
+    rnd = random.Random(7)
+    return b"".join(b"%d %08x some log text\n" % (i, rnd.getrandbits(32)) for i in range(n))
+
+
+@pytest.mark.parametrize("codec, decompress", [
+    ("gzip", gzip.decompress),
+    ("xz", lzma.decompress),
+])
+@pytest.mark.parametrize("threads", [1, 4])
+def test_multi_block_round_trip(codec, decompress, threads):
+    data = _data(20000)
+    out = io.BytesIO()
+    c = BlockCompressor(out, codec=codec, level=1, threads=threads, block_size=16 * 1024)
+    # Odd-sized writes so blocks don't line up with them
+    for off in range(0, len(data), 7001):
+        c.write(data[off:off + 7001])
+    c.close()
+    stats = c.stats()
+    assert stats["blocks"] == -(-len(data) // (16 * 1024))
+    assert stats["raw_bytes"] == len(data)
+    assert stats["compressed_bytes"] == len(out.getvalue())
+    assert stats["threads"] == threads
+    assert decompress(out.getvalue()) == data
+
+
+def test_none_codec_passes_through():
+    out = io.BytesIO()
+    c = BlockCompressor(out, codec="none", threads=4, block_size=1000)
+    c.write(b"x" * 2500)
+    c.close()
+    assert out.getvalue() == b"x" * 2500
+
+
+def test_resolve_falls_back_to_gzip(capsys):
+    r = compress.resolve({"codec": "brotli", "level": "best", "threads": 2})
+    assert r == {"codec": "gzip", "level": 9, "threads": 2}
+    assert "unknown compression codec" in capsys.readouterr().err
+
+
+def test_resolve_levels_and_aliases():
+    assert compress.resolve(None)["codec"] == "gzip"
+    assert compress.resolve({"codec": "gz", "level": "fast"})["level"] == 1
+    assert compress.resolve({"codec": "xz", "level": 3})["level"] == 3
+    assert compress.resolve({"codec": "xz"})["threads"] >= 1
+    assert compress.extension("xz") == ".tar.xz"
+    assert compress.extension("bogus") == ".tar.gz"
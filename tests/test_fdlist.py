@@ -0,0 +1,125 @@
+"""fd inventory: link classification and socket resolution against /proc/net fixtures."""
+
+from __future__ import annotations
+
+import os
+
+import pytest
+
+from toolkit.core import fdlist, netsock
+
+TCP = """\
+  sl  local_address rem_address   st tx_queue rx_queue tr tm->when retrnsmt   uid  timeout inode
+   0: 0100007F:1F90 00000000:0000 0A 00000000:00000000 00:00000000 00000000  1000        0 1001 1 0
+   1: 0100007F:1F90 0200000A:C350 01 00000010:00000020 00:00000000 00000000  1000        0 1002 1 0
+   2: 0100007F:D431 0300000A:1538 01 00000000:00000000 00:00000000 00000000  1000        0 1003 1 0
+"""
+# v6 rows are too wide for one source line
+_V6_LOOPBACK = "0" * 24 + "01000000"
+TCP6 = ("  sl  local_address remote_address st tx_queue rx_queue tr tm->when retrnsmt uid timeout"
+        " inode\n"
+        f"   0: {_V6_LOOPBACK}:0050 {'0' * 32}:0000 0A 00000000:00000000 00:00000000 00000000"
+        "     0        0 2001 1 0\n")
+UDP = """\
+  sl  local_address rem_address   st tx_queue rx_queue tr tm->when retrnsmt   uid  timeout inode
+   0: 00000000:0044 00000000:0000 07 00000000:00000000 00:00000000 00000000     0      0 3001 2 0
+"""
+UNIX = """\
+Num       RefCount Protocol Flags    Type St Inode Path
+0000000000000000: 00000002 00000000 00010000 0001 01 4001 /run/app.sock
+0000000000000000: 00000003 00000000 00000000 0001 03 4002 /run/app.sock
+0000000000000000: 00000003 00000000 00000000 0002 03 4003
+"""
+
+FDS = {
+    0: "/dev/null",
+    1: "socket:[1001]",
+    2: "socket:[1002]",
+    3: "socket:[1003]",
+    4: "socket:[2001]",
+    5: "socket:[3001]",
+    6: "socket:[4001]",
+    7: "socket:[4002]",
+    8: "socket:[4003]",
+    9: "socket:[9999]",
+    10: "pipe:[555]",
+    11: "anon_inode:[eventfd]",
+    12: "/var/log/app.log",
+    13: "/tmp/big.dat (deleted)",
+    14: "net:[4026531840]",
+}
+
+
+@pytest.fixture
+def proc(tmp_path):
+    pid_dir = tmp_path / "100"
+    (pid_dir / "fd").mkdir(parents=True)
+    for fd, target in FDS.items():
+        os.symlink(target, pid_dir / "fd" / str(fd))
+    net = pid_dir / "net"
+    net.mkdir()
+    for name, text in (("tcp", TCP), ("tcp6", TCP6), ("udp", UDP), ("unix", UNIX)):
+        (net / name).write_text(text)
+    return tmp_path
+
+
+@pytest.mark.parametrize("target, expected", [
+    ("socket:[123]", ("socket", "123")),
+    ("pipe:[77]", ("pipe", "77")),
+    ("anon_inode:[eventpoll]", ("anon_inode", "eventpoll")),
+    ("anon_inode:inotify", ("anon_inode", "inotify")),
+    ("/srv/data (deleted)", ("deleted", "/srv/data")),
+    ("/dev/pts/0", ("device", "/dev/pts/0")),
+    ("/etc/passwd", ("file", "/etc/passwd")),
+    ("mnt:[4026531841]", ("other", "mnt:[4026531841]")),
+])
+def test_classify(target, expected):
+    assert fdlist.classify(target) == expected
+
+
+def test_decode_addr():
+    assert netsock.decode_addr("0100007F:0050") == ("127.0.0.1", 80)
+    assert netsock.decode_addr("00000000000000000000000001000000:01BB") == ("::1", 443)
+    assert netsock.fmt_endpoint("::1", 443) == "[::1]:443"
+
+
+def test_socket_index_decodes_tables(proc):
+    index = netsock.socket_index(["1001", "1002", "2001", "3001", "4001", "4002", "4003", "42"],
+                                 proc / "100")
+    assert index["1001"] == {"proto": "tcp", "local": "127.0.0.1:8080", "remote": None,
+                             "state": "LISTEN", "rx_queue": 0, "tx_queue": 0}
+    assert index["1002"]["remote"] == "10.0.0.2:50000"
+    assert (index["1002"]["state"], index["1002"]["tx_queue"], index["1002"]["rx_queue"]) == (
+        "ESTABLISHED", 16, 32)
+    assert (index["2001"]["local"], index["2001"]["state"]) == ("[::1]:80", "LISTEN")
+    assert (index["3001"]["local"], index["3001"]["state"]) == ("0.0.0.0:68", "UNCONN")
+    assert index["4001"] == {"proto": "unix", "type": "stream", "state": "LISTEN",
+                             "path": "/run/app.sock"}
+    assert index["4002"]["state"] == "CONNECTED"
+    assert (index["4003"]["type"], index["4003"]["path"]) == ("dgram", None)
+    assert "42" not in index
+
+
+def test_inventory(proc):
+    inv = fdlist.inventory([100, 12345], proc=proc)
+    assert inv["unreadable_pids"] == [12345]
+    assert inv["total"] == len(FDS)
+    assert inv["by_type"] == {"socket": 9, "device": 1, "pipe": 1, "anon_inode": 1, "file": 1,
+                              "deleted": 1, "other": 1}
+    assert inv["sockets_by_state"]["tcp ESTABLISHED"] == 2
+    assert inv["sockets_by_state"]["unresolved"] == 1
+    assert inv["listening"] == ["tcp 127.0.0.1:8080", "tcp6 [::1]:80", "unix /run/app.sock"]
+    remotes = dict(inv["sockets_by_remote"])
+    # Client of a port we listen on: grouped by client address, not its ephemeral port
+    assert remotes["tcp 10.0.0.2 -> :8080"] == 1
+    assert remotes["tcp 10.0.0.3:5432"] == 1
+    assert inv["deleted_open"] == [{"pid": 100, "fd": 13, "path": "/tmp/big.dat"}]
+    assert not inv["list_truncated"]
+    text = fdlist.format_inventory(inv)
+    assert "tcp ESTABLISHED 127.0.0.1:8080 -> 10.0.0.2:50000" in text
+
+
+def test_inventory_caps_the_list(proc):
+    inv = fdlist.inventory([100], max_list=3, proc=proc)
+    assert len(inv["fds"]) == 3 and inv["list_truncated"]
+    assert inv["total"] == len(FDS)
@@ -0,0 +1,110 @@
+"""Redaction must match the old per-pattern re.sub loop, line by line.
+
+Serial or split across processes.
+"""
+
+from __future__ import annotations
+
+import re
+from collections import Counter
+
+import pytest
+
+from toolkit.core import redact
+from toolkit.core.redact import DEFAULT_REDACT_PATTERNS, REDACTED, get_redactor, redact_parallel
+
+
+def sequential(line: str, patterns=()) -> str:
+    """The original redact_text: every pattern in turn over the previous output."""
+    for pattern in DEFAULT_REDACT_PATTERNS + list(patterns):
+        line = re.sub(pattern, REDACTED, line)
+    return line
+
+
+LINES = [
+    # keyword whose "value" is another keyword - the value after it must still go
+    "bearer secret=s3cr3t",
+    "token: password=hunter2",
+    "login token pwd=xyz",
+    "Authorization: Bearer abc.def-ghi",
+    "api_key=AKIA123 secret=foo token=bar",
+    "password='quoted value' and passwd=\"x\"",
+    "aws_secret=abc aws_access:def",
+    "connecting to postgres://app:pa55w0rd@db:5432/app",
+    "https://user:tok:en@host/ and http://other:pw@x/",
+    "apikey apikey=1 api-key: 2 API_KEY 3",
+    "pwd=a pwd=b pwd=c",
+    "tokentoken=1",
+    "secret",
+    "nothing to see here",
+    "",
+    "PASSWORD=Upper TOKEN=Upper",
+    "İstanbul token=unicode-lowercase-changes-length",
+    "key=value keychain monkey=1",
+    "user=bob password= spaced",
+    "bearer\ttab-separated",
+]
+
+
+@pytest.mark.parametrize("line", LINES)
+def test_redact_line_matches_sequential(line):
+    assert get_redactor().redact_line(line) == sequential(line)
+
+
+@pytest.mark.parametrize("line", LINES)
+def test_prefiltered_redact_matches_sequential(line):
+    assert get_redactor().redact(line) == sequential(line)
+
+
+def test_multiline_text_matches_sequential_per_line():
+    text = "\n".join(LINES * 3) + "\n"
+    expected = "\n".join(sequential(line) for line in text.split("\n"))
+    assert get_redactor().redact(text) == expected
+
+
+@pytest.mark.parametrize("line", [
+    "session=abc123 password=x",
+    "REDACTED thing",  # keyword inside the replacement text
+    "x ***REDACTED*** y",
+])
+def test_user_patterns_match_sequential(line):
+    patterns = [r"session=\w+", r"(?i)redacted", r"\by\b"]
+    assert get_redactor(patterns).redact(line) == sequential(line, patterns)
+
+
+@pytest.mark.parametrize("pattern", [
+    r"(?x) acct_id \s* : \s* \d+",
+    r"(?x)acct_id : \d+",
+    r"(?ix) ACCT_ID \s* : \s* \d+",
+])
+def test_verbose_user_patterns_are_not_prefiltered_on_their_text(pattern):
+    text = "acct_id:12345 ok\nnext"
+    assert get_redactor([pattern]).redact(text) == re.sub(pattern, REDACTED, text)
+    assert "12345" not in get_redactor([pattern]).redact(text)
+
+
+def test_whitelist_keeps_only_overlapping_match():
+    r = get_redactor(whitelist=[r"token=public-\w+"])
+    stats: Counter = Counter()
+    out = r.redact("token=public-build password=hunter2", stats)
+    assert out == f"token=public-build {REDACTED}"
+    assert stats["whitelisted"] == 1
+    assert stats["password"] == 1
+
+
+def test_parallel_matches_sequential(monkeypatch):
+    monkeypatch.setattr(redact, "PARALLEL_MIN_BYTES", 0)
+    patterns = [r"session=\w+"]
+    text = "\n".join(LINES * 20 + ["session=abc123 password=x"]) + "\n"
+    expected = "\n".join(sequential(line, patterns) for line in text.split("\n"))
+    serial_stats: Counter = Counter()
+    parallel_stats: Counter = Counter()
+    serial = get_redactor(patterns).redact(text, serial_stats)
+    assert redact_parallel(text, patterns, workers=2, stats=parallel_stats) == expected == serial
+    assert parallel_stats == serial_stats
+
+
+def test_auto_workers_stay_serial_for_ordinary_logs():
+    assert redact.resolve_workers(0, 10_000_000) == 1
+    assert redact.resolve_workers(4, 10_000_000) == 1
+    assert redact.resolve_workers(0, 100_000_000) <= 100_000_000 // redact.AUTO_BYTES_PER_WORKER
@@ -0,0 +1,57 @@
+"""Scheduler: priority is the volatility class, unit properties are prefetched first."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+from toolkit.core.engine import command_priority
+from toolkit.core.schedule import NORMAL, STABLE, VOLATILE, Job, Scheduler, plan
+
+
+def _job(kind: str, unit: str | None = "app.service") -> Job:
+    return Job(kind, kind, lambda d: None, Path("/nonexistent") / kind, unit=unit)
+
+
+def test_plan_orders_by_volatility_then_cost():
+    jobs = [_job(k) for k in ("journald", "hardening", "systemd", "resource", "process",
+                              "recorder")]
+    order = plan(jobs)
+    assert [j.name for j in order] == ["recorder", "process", "resource", "systemd",
+                                       "hardening", "journald"]
+    assert {j.name: j.priority for j in order} == {
+        "recorder": VOLATILE, "process": VOLATILE, "resource": VOLATILE,
+        "systemd": NORMAL, "hardening": STABLE, "journald": STABLE,
+    }
+
+
+def test_unknown_kind_is_normal():
+    (job,) = plan([_job("custom")])
+    assert job.priority == NORMAL
+
+
+class _Engine:
+    def remaining(self):
+        return None
+
+
+class _Ctx:
+    engine = _Engine()
+    tracer = None
+
+    def __init__(self):
+        self.prefetched = []
+
+    def prefetch_unit(self, unit):
+        self.prefetched.append((unit, command_priority.get()))
+
+
+def test_unit_properties_prefetched_once_at_most_volatile_priority():
+    ctx = _Ctx()
+    ran = []
+    jobs = [Job(k, k, lambda d, k=k: ran.append(k), Path("/nonexistent"), unit="app.service")
+            for k in ("hardening", "process", "journald")]
+    done, failed, stuck = Scheduler(ctx).run(jobs, lambda name: None, serial=True)
+    # process (volatile) and hardening (stable) need it; journald doesn't
+    assert ctx.prefetched == [("app.service", VOLATILE)]
+    assert ran == ["process", "hardening", "journald"]
+    assert done == ran and not failed and not stuck
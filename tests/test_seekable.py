@@ -0,0 +1,88 @@
+"""Seekable bundles: per-member gzip + footer index, still a plain .tar.gz."""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import io
+import tarfile
+
+import pytest
+
+from toolkit.core import seekable
+from toolkit.core.bundle import tar_gz
+
+FILES = {
+    "logs/journald.txt": b"line\n" * 5000,
+    "process/processes.json": b'{"rows": []}',
+    "empty.txt": b"",
+}
+
+
+@pytest.fixture
+def bundle(tmp_path):
+    spool = tmp_path / "spool"
+    for rel, data in FILES.items():
+        (spool / rel).parent.mkdir(parents=True, exist_ok=True)
+        (spool / rel).write_bytes(data)
+    w = seekable.SeekableWriter(tmp_path / "b1.tar.gz", "b1")
+    w.add_tree(spool)
+    w.add_bytes("meta.json", b'{"ok": true}')
+    path = w.close()
+    assert not w.errors
+    return path
+
+
+def test_index_lists_every_file_with_checksums(bundle):
+    index = seekable.read_index(bundle)
+    assert index is not None and index["root"] == "b1"
+    files = {m["path"]: m for m in index["members"] if m["type"] == "file"}
+    assert set(files) == set(FILES) | {"meta.json"}
+    for rel, data in FILES.items():
+        assert files[rel]["size"] == len(data)
+        assert files[rel]["sha256"] == hashlib.sha256(data).hexdigest()
+        assert seekable.read_member(bundle, files[rel]) == data
+
+
+def test_read_member_verifies_sha256(bundle):
+    entry = next(m for m in seekable.read_index(bundle)["members"]
+                 if m["path"] == "logs/journald.txt")
+    bad = dict(entry, sha256="0" * 64)
+    with pytest.raises(ValueError, match="checksum mismatch"):
+        seekable.read_member(bundle, bad)
+    assert seekable.read_member(bundle, bad, verify=False) == FILES["logs/journald.txt"]
+
+
+def test_still_a_plain_tar_gz(bundle):
+    with tarfile.open(bundle, "r:gz") as tf:
+        got = {ti.name: tf.extractfile(ti).read() for ti in tf if ti.isfile()}
+    for rel, data in FILES.items():
+        assert got[f"b1/{rel}"] == data
+    assert f"b1/{seekable.INDEX_NAME}" in got
+    # The footer member decompresses to nothing - gunzip sees just the tar
+    raw = gzip.decompress(bundle.read_bytes())
+    with tarfile.open(fileobj=io.BytesIO(raw)) as tf:
+        assert "b1/logs/journald.txt" in tf.getnames()
+
+
+def test_read_file_and_list_members(bundle):
+    assert seekable.read_file(bundle, "process/processes.json") == FILES["process/processes.json"]
+    assert seekable.read_file(bundle, "/b1/meta.json") == b'{"ok": true}'
+    with pytest.raises(FileNotFoundError):
+        seekable.read_file(bundle, "nope.txt")
+    assert {m["path"] for m in seekable.list_members(bundle)} == set(FILES) | {"meta.json"}
+
+
+def test_plain_tar_gz_falls_back_to_reading_through(tmp_path):
+    d = tmp_path / "b2"
+    for rel, data in FILES.items():
+        (d / rel).parent.mkdir(parents=True, exist_ok=True)
+        (d / rel).write_bytes(data)
+    path = tar_gz(d)
+    assert seekable.read_index(path) is None
+    assert seekable.read_file(path, "logs/journald.txt") == FILES["logs/journald.txt"]
+    assert seekable.read_file(path, "b2/empty.txt") == b""
+    with pytest.raises(FileNotFoundError):
+        seekable.read_file(path, "nope.txt")
+    assert {m["path"]: m["size"] for m in seekable.list_members(path)} == {
+        rel: len(data) for rel, data in FILES.items()}
@@ -0,0 +1,125 @@
+"""Host socket summary: /proc/net hex decoding, state counts and flags on fixture tables."""
+
+from __future__ import annotations
+
+import socket
+import struct
+
+import pytest
+
+from toolkit.core import socktable
+
+HEADER = "  sl  local_address rem_address   st tx_queue rx_queue tr tm->when retrnsmt   uid\n"
+
+
+def _v4(ip: str, port: int) -> str:
+    # The kernel prints the address as a host-endian u32
+    (word,) = struct.unpack("=I", socket.inet_aton(ip))
+    return f"{word:08X}:{port:04X}"
+
+
+def _v6(ip: str, port: int) -> str:
+    words = struct.unpack("=4I", socket.inet_pton(socket.AF_INET6, ip))
+    return "".join(f"{w:08X}" for w in words) + f":{port:04X}"
+
+
+def _row(i: int, local: str, remote: str, st: str, tx: int = 0, rx: int = 0) -> str:
+    return f"{i:4}: {local} {remote} {st} {tx:08X}:{rx:08X} 00:00000000 00000000 0 0 {1000 + i}\n"
+
+
+@pytest.fixture
+def proc(tmp_path):
+    net = tmp_path / "net"
+    net.mkdir()
+    any4 = _v4("0.0.0.0", 0)
+    tcp = [
+        _row(0, _v4("0.0.0.0", 443), any4, "0A", rx=129),  # accept queue backing up
+        _row(1, _v4("127.0.0.1", 5432), any4, "0A"),
+    ]
+    # 5 clients from 10.1.2.0/24 on :443, 3 of them in TIME_WAIT
+    for i in range(5):
+        st = "06" if i < 3 else "01"
+        tcp.append(_row(2 + i, _v4("10.0.0.1", 443), _v4(f"10.1.2.{i + 10}", 40000 + i), st))
+    # an outgoing connection stuck in CLOSE_WAIT with data queued
+    tcp.append(_row(7, _v4("10.0.0.1", 51000), _v4("192.168.5.5", 6379), "08", tx=10, rx=20))
+    (net / "tcp").write_text(HEADER + "".join(tcp))
+    any6 = _v6("::", 0)
+    (net / "tcp6").write_text(HEADER + "".join([
+        _row(0, _v6("::", 443), any6, "0A"),
+        _row(1, _v6("2001:db8::1", 443), _v6("2001:db8:1:2::99", 50000), "01"),
+        # v4 client of the dual-stack listener - counted with the v4 /24s
+        _row(2, _v6("::ffff:10.0.0.1", 443), _v6("::ffff:10.1.2.77", 50001), "01"),
+    ]))
+    (net / "udp").write_text(HEADER + "".join([
+        _row(0, _v4("0.0.0.0", 53), any4, "07"),
+        _row(1, _v4("10.0.0.1", 40001), _v4("8.8.8.8", 53), "01"),
+    ]))
+    (net / "netstat").write_text(
+        "TcpExt: SyncookiesSent ListenOverflows ListenDrops\nTcpExt: 0 17 19\n"
+        "IpExt: InNoRoutes\nIpExt: 0\n")
+    (net / "sockstat").write_text("sockets: used 42\nTCP: inuse 8 orphan 0 tw 3 alloc 9 mem 1\n")
+    (tmp_path / "sys/net/core").mkdir(parents=True)
+    (tmp_path / "sys/net/core/somaxconn").write_text("128\n")
+    return tmp_path
+
+
+def test_prefix_formatting():
+    v4 = _v4("10.1.2.3", 0)
+    assert socktable._fmt_prefix(v4[socktable._V4_NET].encode()) == "10.1.2.0/24"
+    v6 = _v6("2001:db8:1:2::99", 0)
+    assert socktable._fmt_prefix(v6[:16].encode()) == "2001:db8:1:2::/64"
+
+
+def test_summarize(proc):
+    s = socktable.summarize(proc, top_n=5)
+    assert s["tables"] == {"tcp": 8, "tcp6": 3, "udp": 2}
+    assert s["total"] == 13
+    assert s["by_state"]["tcp TIME_WAIT"] == 3
+    assert s["by_state"]["tcp LISTEN"] == 3
+    assert s["by_state"]["udp UNCONN"] == 1
+
+    listeners = {(r["proto"], r["local"]): r for r in s["listeners"]}
+    assert listeners[("tcp", "0.0.0.0:443")]["rx_queue"] == 129
+    assert ("tcp6", "[::]:443") in listeners
+    assert listeners[("udp", "0.0.0.0:53")]["listen"] is False
+    assert s["listeners"][0]["local"] == "0.0.0.0:443"  # biggest queue first
+
+    ports = {(p["proto"], p["port"]): p for p in s["ports"]}
+    p443 = ports[("tcp", 443)]
+    assert p443["listening"] and p443["connections"] == 7
+    assert (p443["ESTABLISHED"], p443["TIME_WAIT"]) == (4, 3)
+
+    remotes = {(r["proto"], r["prefix"]): r for r in s["remotes"]}
+    assert remotes[("tcp", "10.1.2.0/24")]["total"] == 6
+    assert remotes[("tcp", "2001:db8:1:2::/64")]["ESTABLISHED"] == 1
+    assert remotes[("udp", "8.8.8.0/24")]["total"] == 1
+
+    assert s["queues"] == [{"proto": "tcp", "state": "CLOSE_WAIT", "local": "10.0.0.1:51000",
+                            "remote": "192.168.5.5:6379", "rx_queue": 20, "tx_queue": 10}]
+    assert s["netstat"] == {"ListenOverflows": 17, "ListenDrops": 19}
+    assert s["sockstat"]["TCP"]["tw"] == 3
+    assert s["somaxconn"] == 128
+
+
+def test_flags(proc, monkeypatch):
+    monkeypatch.setattr(socktable, "TIME_WAIT_WARN", 3)
+    monkeypatch.setattr(socktable, "CLOSE_WAIT_WARN", 1)
+    flags = socktable.summarize(proc)["flags"]
+    assert ("129 connections waiting to be accepted on tcp 0.0.0.0:443"
+            " - at somaxconn, it's full") in flags
+    assert "3 sockets in TIME_WAIT (most to 10.1.2.0/24: 3)" in flags
+    assert any(f.startswith("1 sockets in CLOSE_WAIT (most on local port 51000: 1)")
+               for f in flags)
+    assert "ListenOverflows 17 since boot (ListenDrops 19)" in flags
+
+
+def test_prefix_cap_counts_the_rest(proc):
+    s = socktable.summarize(proc, max_prefixes=1)
+    assert s["remote_prefixes_dropped"] > 0
+    assert "more past the cap" in socktable.format_summary(s)
+
+
+def test_missing_tables(tmp_path):
+    s = socktable.summarize(tmp_path)
+    assert s["total"] == 0 and s["flags"] == [] and s["somaxconn"] is None
+    assert "(none)" in socktable.format_summary(s)
@@ -0,0 +1,111 @@
+"""Content-addressed store: chunking, dedup across bundles, export and gc."""
+
+from __future__ import annotations
+
+import os
+import random
+import tarfile
+import time
+
+import pytest
+
+from toolkit.core import store as store_mod
+from toolkit.core.store import CHUNK_MAX, CHUNK_MIN, Store, StoreWriter, chunks
+
+
+def _log(n: int, seed: int = 1) -> bytes:
+    rnd = random.Random(seed)
+    return b"".join(b"%d request id=%08x took %d ms\n" % (i, rnd.getrandbits(32), i % 97)
+                    for i in range(n))
+
+
+def test_chunks_reassemble_and_respect_bounds():
+    data = _log(20000)
+    parts = list(chunks(data))
+    assert b"".join(parts) == data
+    assert len(parts) > 10
+    assert all(len(p) <= CHUNK_MAX for p in parts)
+    assert all(len(p) >= CHUNK_MIN and p.endswith(b"\n") for p in parts[:-1])
+
+
+def test_chunks_small_empty_and_no_newlines():
+    assert list(chunks(b"")) == []
+    assert list(chunks(b"tiny\n")) == [b"tiny\n"]
+    blob = bytes(range(256)) * 1000  # no line ends in reach - hard cuts
+    parts = list(chunks(blob))
+    assert b"".join(parts) == blob
+    assert all(len(p) == CHUNK_MAX for p in parts[:-1])
+
+
+def test_inserted_line_only_changes_nearby_chunks():
+    data = _log(20000)
+    edited = b"a brand new first line\n" + data
+    before, after = set(chunks(data)), list(chunks(edited))
+    assert sum(c not in before for c in after) <= 2
+
+
+def _write(st: Store, bundle_id: str, tmp_path, files) -> dict:
+    spool = tmp_path / f"spool-{bundle_id}"
+    for rel, data in files.items():
+        (spool / rel).parent.mkdir(parents=True, exist_ok=True)
+        (spool / rel).write_bytes(data)
+    w = StoreWriter(st, bundle_id)
+    w.add_tree(spool)
+    w.close()
+    assert not w.errors
+    return w.stats()
+
+
+def test_second_bundle_dedups_against_the_first(tmp_path):
+    st = Store(tmp_path)
+    log = _log(20000)
+    first = _write(st, "b1", tmp_path, {"logs/journald.txt": log, "unit.txt": b"[Unit]\n"})
+    assert first["new_chunks"] == first["chunks"]
+    second = _write(st, "b2", tmp_path, {"logs/journald.txt": log + b"one more line\n",
+                                         "unit.txt": b"[Unit]\n"})
+    assert second["new_chunks"] <= 2
+    assert second["new_bytes"] < len(log) // 10
+    assert st.list_bundles() == ["b1", "b2"]
+    with pytest.raises(FileExistsError):
+        StoreWriter(st, "b1")
+
+
+def test_export_round_trip(tmp_path):
+    st = Store(tmp_path)
+    files = {"logs/journald.txt": _log(5000), "meta/host.txt": b"vm\n", "empty": b""}
+    _write(st, "b1", tmp_path, files)
+    out = st.export("b1", tmp_path / "b1.tar.gz")
+    with tarfile.open(out, "r:gz") as tf:
+        got = {ti.name: tf.extractfile(ti).read() for ti in tf if ti.isfile()}
+        assert "b1/logs" in tf.getnames()
+    assert got == {f"b1/{rel}": data for rel, data in files.items()}
+    assert not (tmp_path / "b1.tar.gz.partial").exists()
+
+
+def _age(path, sec: float) -> None:
+    t = time.time() - sec
+    os.utime(path, (t, t))
+
+
+def test_gc_removes_only_old_unreferenced_blobs(tmp_path):
+    st = Store(tmp_path)
+    _write(st, "b1", tmp_path, {"a.txt": b"keep me\n"})
+    old_orphan = st.blob_path(st.put(b"orphan, old\n")[0])
+    new_orphan = st.blob_path(st.put(b"orphan, still being written\n")[0])
+    for p in st.blobs.glob("*/*"):
+        if p != new_orphan:
+            _age(p, store_mod.GC_GRACE_SEC * 2)
+    res = st.gc()
+    assert res["removed"] == 1 and res["bytes"] > 0 and res["kept"] == 2
+    assert not old_orphan.exists() and new_orphan.exists()
+    assert st.read_file(st.load_manifest("b1")["files"][0]) == b"keep me\n"
+
+
+def test_gc_does_nothing_with_a_broken_manifest(tmp_path):
+    st = Store(tmp_path)
+    _write(st, "b1", tmp_path, {"a.txt": b"x\n"})
+    orphan = st.blob_path(st.put(b"orphan\n")[0])
+    _age(orphan, store_mod.GC_GRACE_SEC * 2)
+    st.manifest_path("broken").write_text("{not json")
+    assert st.gc() == {"removed": 0, "bytes": 0, "kept": -1}
+    assert orphan.exists()
@@ -0,0 +1,92 @@
+"""Watch: journal entries -> events, the gate, and systemctl show transitions."""
+
+from __future__ import annotations
+
+from toolkit.core.watch import _MSG_OOM, Event, Gate, Watcher, classify, parse_show_batch
+
+UNITS = {"nginx.service"}
+
+
+def _entry(msg: str, **fields) -> dict:
+    return {"UNIT": "nginx.service", "MESSAGE": msg, **fields}
+
+
+def test_clean_exit_from_text_is_not_a_crash():
+    msg = "nginx.service: Main process exited, code=exited, status=0/SUCCESS"
+    assert classify(_entry(msg), UNITS) is None
+
+
+def test_nonzero_exit_and_signal_from_text_are_crashes():
+    ev = classify(_entry("Main process exited, code=exited, status=1/FAILURE"), UNITS)
+    assert ev.kind == "crash" and ev.detail == "code=exited status=1"
+    ev = classify(_entry("Main process exited, code=killed, status=11/SEGV"), UNITS)
+    assert ev.kind == "crash" and ev.detail == "code=killed status=11"
+
+
+def test_structured_fields():
+    assert classify(_entry("", EXIT_CODE="exited", EXIT_STATUS="0"), UNITS) is None
+    assert classify(_entry("", EXIT_CODE="dumped", EXIT_STATUS="SEGV"), UNITS).kind == "crash"
+    assert classify(_entry("", MESSAGE_ID=_MSG_OOM), UNITS).kind == "oom"
+    assert classify(_entry("", UNIT_RESULT="timeout"), UNITS).kind == "failed"
+    assert classify(_entry("", UNIT_RESULT="success"), UNITS) is None
+
+
+def test_failed_and_restart_text():
+    ev = classify(_entry("nginx.service: Failed with result 'exit-code'."), UNITS)
+    assert (ev.kind, ev.detail) == ("failed", "result=exit-code")
+    ev = classify(_entry("nginx.service: Scheduled restart job, restart counter is at 3."), UNITS)
+    assert ev.kind == "restart"
+
+
+def test_other_units_and_binary_messages_are_ignored():
+    assert classify({"UNIT": "other.service", "UNIT_RESULT": "timeout"}, UNITS) is None
+    assert classify(_entry([104, 105]), UNITS) is None
+
+
+def test_gate_debounces_and_folds():
+    g = Gate(debounce_sec=60, max_per_hour=6)
+    ev, folded = g.offer(Event("a", "crash", "1", ts=1000))
+    assert ev is not None and folded == []
+    assert g.offer(Event("a", "crash", "2", ts=1010)) == (None, [])
+    # Other units have their own window
+    assert g.offer(Event("b", "crash", "x", ts=1010))[0] is not None
+    ev, folded = g.offer(Event("a", "failed", "3", ts=1070))
+    assert ev.detail == "3"
+    assert [f["detail"] for f in folded] == ["2"]
+
+
+def test_gate_caps_per_hour():
+    g = Gate(debounce_sec=0, max_per_hour=2)
+    fired = [g.offer(Event("a", "crash", str(i), ts=1000 + i))[0] for i in range(4)]
+    assert [e is not None for e in fired] == [True, True, False, False]
+    ev, folded = g.offer(Event("a", "crash", "late", ts=1000 + 3601))
+    assert ev is not None
+    assert [f.get("suppressed") for f in folded] == ["max_per_hour", "max_per_hour"]
+
+
+def test_gate_restart_burst():
+    g = Gate(restart_burst=3, burst_window_sec=60)
+    assert g.offer(Event("a", "restart", "", ts=0))[0] is None
+    assert g.offer(Event("a", "restart", "", ts=100))[0] is None  # first one aged out
+    assert g.offer(Event("a", "restart", "", ts=110))[0] is None
+    ev, _ = g.offer(Event("a", "restart", "", ts=120))
+    assert ev.kind == "restart-burst" and ev.detail == "3 restarts in 60s"
+
+
+def test_transitions():
+    before = {"ActiveState": "active", "Result": "success", "NRestarts": "1"}
+    assert Watcher._transitions("a", before, dict(before)) == []
+    evs = Watcher._transitions("a", before, {"ActiveState": "failed", "Result": "oom-kill",
+                                             "NRestarts": "3"})
+    assert [e.kind for e in evs] == ["oom", "restart", "restart"]
+    evs = Watcher._transitions("a", {"ActiveState": "active", "Result": "exit-code"},
+                               {"ActiveState": "failed", "Result": "exit-code"})
+    assert [(e.kind, e.detail) for e in evs] == [("failed", "result=exit-code")]
+
+
+def test_parse_show_batch():
+    out = "Id=a.service\nActiveState=active\n\nId=b.service\nResult=timeout\n"
+    assert parse_show_batch(out) == {
+        "a.service": {"Id": "a.service", "ActiveState": "active"},
+        "b.service": {"Id": "b.service", "Result": "timeout"},
+    }
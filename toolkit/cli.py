@@ -3,134 +3,683 @@
 from __future__ import annotations
 
 import argparse
-import socket
+import json
+import signal
 import sys
+import threading
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, List
 
-from toolkit.core.config import load_config
-from toolkit.core.bundle import make_bundle_dir, write_json, tar_gz, check_disk_space
-from toolkit.collectors.systemd import collect_systemd
-from toolkit.collectors.journald import collect_journald
-from toolkit.collectors.resource import collect_resource
-from toolkit.collectors.process import collect_process
-from toolkit.collectors.hardening import collect_hardening
-from toolkit.version import __version__, get_git_hash
-from toolkit.metrics import write_metrics
+from toolkit import collectors, startup
+from toolkit.core.config import DEFAULTS, load_config
+
+# Everything else is imported inside the subcommand that needs it - a
+# watch-triggered or cron collect shouldn't spend its first 100ms loading
+# asyncio, yaml, the compressors and every collector (see --startup-profile)
+if TYPE_CHECKING:
+    from toolkit.core.context import CollectionContext
+    from toolkit.core.store import Store
+
+
+def _spool_relative(t: dict, spool: Path, dirs: dict) -> dict:
+    """Engine truncation record -> collector + path inside its output."""
+    t = dict(t)
+    if t.get("path"):
+        try:
+            d, rel = Path(t["path"]).relative_to(spool).as_posix().split("/", 1)
+            t["collector"], t["path"] = dirs.get(d, d), rel
+        except ValueError:
+            pass
+    return t
+
+
+def _tree_bytes(path: Path) -> int:
+    """Size of everything under a collector's spool dir."""
+    if not path.exists():
+        return 0
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+def _snapshot_tree(src: Path, dst: Path) -> Path:
+    """Copy what's in a spool dir right now - for a collector still writing to it."""
+    import shutil
+
+    for p in src.rglob("*") if src.exists() else ():
+        target = dst / p.relative_to(src)
+        try:
+            if p.is_dir():
+                target.mkdir(parents=True, exist_ok=True)
+            else:
+                target.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copyfile(p, target)
+        except OSError:
+            pass  # came and went while we looked
+    return dst
+
+
+def _bundle_members(bundle: str, store: Store):
+    """Files in a bundle - a tarball path, or a bundle id from the store."""
+    from toolkit.core import seekable
+
+    path = Path(bundle)
+    if path.exists():
+        return seekable.list_members(path)
+    return store.load_manifest(bundle)["files"]
+
+
+def _bundle(args) -> int:
+    """`toolkit bundle ...` - work with bundles already collected."""
+    import tarfile
+
+    from toolkit.core import compress, seekable
+    from toolkit.core.store import Store
+
+    cfg = load_config(args.config) if args.config else DEFAULTS
+    artifacts_dir = args.artifacts_dir or cfg["output"]["artifacts_dir"]
+    store = Store(artifacts_dir)
+
+    if args.subcmd == "export":
+        comp = compress.resolve(cfg["output"].get("compression"))
+        dest = Path(args.output or f"{args.bundle_id}{compress.extension(comp['codec'])}")
+        try:
+            print(store.export(args.bundle_id, dest, comp))
+        except FileNotFoundError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            known = store.list_bundles()
+            if known:
+                print("Latest bundles in the store:\n  " + "\n  ".join(known[-10:]),
+                      file=sys.stderr)
+            return 1
+        return 0
+
+    if args.subcmd == "ls":
+        rc = 0
+        for b in args.bundles:
+            try:
+                if len(args.bundles) > 1:
+                    print(f"{b}:")
+                for m in _bundle_members(b, store):
+                    stamp = time.strftime("%Y-%m-%d %H:%M", time.localtime(m["mtime"]))
+                    print(f"{m['size']:>10}  {stamp}  {m['path']}")
+            except BrokenPipeError:  # | head
+                return rc
+            except (OSError, ValueError, tarfile.TarError) as e:
+                print(f"Error: {b}: {e}", file=sys.stderr)
+                rc = 1
+        return rc
+
+    if args.subcmd == "cat":
+        try:
+            path = Path(args.bundle)
+            if path.exists():
+                data = seekable.read_file(path, args.path)
+            else:
+                manifest = store.load_manifest(args.bundle)
+                entry = next((e for e in manifest["files"] if e["path"] == args.path.strip("/")),
+                             None)
+                if entry is None:
+                    raise FileNotFoundError(f"{args.path} not in {args.bundle}")
+                data = store.read_file(entry)
+        except (OSError, ValueError, tarfile.TarError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+        sys.stdout.buffer.write(data)
+        return 0
+
+    if args.subcmd == "gc":
+        res = store.gc()
+        if res["kept"] < 0:
+            print("Error: unreadable manifest in the store, not deleting anything",
+                  file=sys.stderr)
+            return 1
+        print(f"removed {res['removed']} blobs ({res['bytes'] // 1024} KiB), kept {res['kept']}")
+        return 0
+
+    return 2
+
+
+# Same for every service on the box - in a multi-service run these run once
+HOST_COLLECTORS = ("resource", "recorder")
+
+
+def _config_paths(values: List[str]) -> List[Path]:
+    """--config values -> config files. Directories contribute their *.yaml/*.yml."""
+    out: List[Path] = []
+    for v in values:
+        p = Path(v)
+        if p.is_dir():
+            out += sorted(list(p.glob("*.yaml")) + list(p.glob("*.yml")))
+        else:
+            out.append(p)
+    return out
+
+
+def _load_services(values: List[str]) -> List[dict]:
+    cfgs = []
+    units = set()
+    for path in _config_paths(values):
+        cfg = load_config(str(path))
+        unit = cfg["service"]["unit"]
+        if unit in units:
+            print(f"Note: {path} is another config for {unit}, skipping it", file=sys.stderr)
+            continue
+        units.add(unit)
+        cfg["_path"] = str(path)
+        cfgs.append(cfg)
+    if not cfgs:
+        raise SystemExit("No service configs found")
+    startup.mark("config loaded")
+    return cfgs
+
+
+def _recorder_socket(cfg: dict) -> Path:
+    from toolkit.core import recorder
+
+    sock = cfg.get("recorder", {}).get("socket")
+    return Path(sock or Path(cfg["output"]["artifacts_dir"]).expanduser() / recorder.SOCKET_NAME)
+
+
+def _record(args) -> int:
+    """`toolkit record` - flight recorder. Runs until SIGTERM/Ctrl-C."""
+    import subprocess
+
+    from toolkit.core import recorder
+
+    cfgs = _load_services(args.config)
+    cfg = cfgs[0]
+    sock = _recorder_socket(cfg)
+
+    if args.trigger:
+        if not recorder.trigger(sock):
+            print(f"Error: no recorder answering on {sock} (or a collection is already running)",
+                  file=sys.stderr)
+            return 1
+        return 0
+
+    rcfg = cfg.get("recorder", {})
+    rec = recorder.Recorder(
+        [c["service"]["unit"] for c in cfgs],
+        interval_sec=args.interval or rcfg.get("interval_sec", 1.0),
+        history_min=args.history_min or rcfg.get("history_min", 30),
+    )
+
+    # Collections run as a child process - same as running collect by hand,
+    # and it fetches our history over the socket like any other collect
+    child: List[subprocess.Popen] = []
+
+    def _start_collect() -> bool:
+        if child and child[0].poll() is None:
+            print("Note: collection already running, not starting another", file=sys.stderr)
+            return False
+        cmd = [sys.executable, "-m", "toolkit", "incident", "collect"]
+        for c in cfgs:
+            cmd += ["--config", c["_path"]]
+        child[:] = [subprocess.Popen(cmd)]
+        return True
+
+    sock.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        srv = recorder.serve(rec, sock, on_collect=_start_collect)
+    except (RuntimeError, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    signal.signal(signal.SIGUSR1, lambda *_: _start_collect())
+    signal.signal(signal.SIGTERM, lambda *_: rec.stop())
+    print(f"Recording {', '.join(rec.units)} every {rec.interval}s "
+          f"({rec.history_min} min kept) on {sock}. "
+          f"SIGUSR1 or `toolkit record --trigger` collects a bundle.", file=sys.stderr)
+    try:
+        rec.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        srv.shutdown()
+        srv.server_close()
+        try:
+            sock.unlink()
+        except OSError:
+            pass
+    return 0
+
+
+def _watch(args) -> int:
+    """`toolkit watch` - collect automatically when a unit crashes, OOMs or loops."""
+    from toolkit.core import watch
+
+    cfgs = _load_services(args.config)
+    by_unit = {c["service"]["unit"]: c for c in cfgs}
+    wcfg = cfgs[0].get("watch", {})
+    gate = watch.Gate(
+        debounce_sec=wcfg.get("debounce_sec", 60),
+        max_per_hour=wcfg.get("max_per_hour", 6),
+        restart_burst=wcfg.get("restart_burst", 3),
+        burst_window_sec=wcfg.get("burst_window_sec", 60),
+    )
+
+    def _on_event(ev: watch.Event) -> None:
+        fire, folded = gate.offer(ev)
+        if fire is None:
+            # Debounced, over the hourly limit, or a restart that isn't a loop (yet)
+            print(f"{ev.unit}: {ev.kind} ({ev.detail}) - noted, not collecting",
+                  file=sys.stderr)
+            return
+        print(f"{ev.unit}: {fire.kind} ({fire.detail}) - collecting", file=sys.stderr)
+        cargs = argparse.Namespace(
+            config=[by_unit[ev.unit]["_path"]], since=None, lines=None, redact=False,
+            serial=False, incremental=False, deadline=None, keep_dir=False, trace=None,
+        )
+        trigger = {"source": "watch", "event": fire.to_dict(), "earlier_events": folded}
+        # In-process, on its own thread - no interpreter startup between the
+        # event and the first /proc read, and the watcher keeps reading
+        threading.Thread(target=_collect, args=(cargs, trigger),
+                         name=f"collect-{ev.unit}", daemon=False).start()
+
+    w = watch.Watcher(list(by_unit), _on_event, poll=args.poll,
+                      poll_sec=wcfg.get("poll_sec", 2))
+    signal.signal(signal.SIGTERM, lambda *_: w.stop())
+    print(f"Watching {', '.join(by_unit)}", file=sys.stderr)
+    try:
+        w.run()
+    except KeyboardInterrupt:
+        w.stop()
+    return 0
+
+
+def _service_jobs(cfg: dict, args, ctx: CollectionContext, with_host: bool) -> List[tuple]:
+    """(collector, fn) for one service. fn takes the dir to write into.
+
+    Collector modules are imported when their job runs, not before.
+    """
+    unit = cfg["service"]["unit"]
+    since = args.since or cfg["logs"]["since"]
+    lines = args.lines or cfg["logs"]["lines"]
+    copts = cfg.get("collector_options", {})
+
+    # Redaction settings
+    redact_cfg = cfg.get("redact", {})
+    do_redact = args.redact or redact_cfg.get("enabled", False)
+    extra_patterns = redact_cfg.get("patterns", [])
+    whitelist = redact_cfg.get("whitelist", [])
+    redact_workers = redact_cfg.get("workers", 0)
+
+    jobs = []
+
+    if cfg["collect"].get("systemd", True):
+        jobs.append(("systemd", lambda d, u=unit: collectors.get("systemd")(d, u, ctx=ctx)))
+
+    if cfg["collect"].get("journald", True):
+        jopts = copts.get("journald", {})
+        incremental = args.incremental or jopts.get("incremental", False)
+        # Need default args in lambda to avoid closure issues (learned this the hard way)
+        fmt = jopts.get("output_format", "short-iso")
+        jobs.append(("journald", lambda d, u=unit, s=since, l=lines, i=incremental, f=fmt:
+            collectors.get("journald")(d, u, s, l, redact=do_redact,
+                                       redact_patterns=extra_patterns,
+                                       redact_whitelist=whitelist,
+                                       incremental=i, output_format=f,
+                                       redact_workers=redact_workers, ctx=ctx)))
+
+    if with_host and cfg["collect"].get("resource", True):
+        opts = copts.get("resource", {})
+        jobs.append(("resource", lambda d, o=opts:
+            collectors.get("resource")(d, options=o, ctx=ctx)))
+
+    if with_host and cfg["collect"].get("recorder", True):
+        minutes = cfg.get("recorder", {}).get("bundle_min", 10)
+        sock = _recorder_socket(cfg)
+        jobs.append(("recorder", lambda d, s=sock, m=minutes:
+            collectors.get("recorder")(d, s, m, ctx=ctx)))
+
+    if cfg["collect"].get("process", True):
+        opts = copts.get("process", {})
+        jobs.append(("process", lambda d, u=unit, o=opts:
+            collectors.get("process")(d, u, options=o, ctx=ctx)))
+
+    if cfg["collect"].get("cgroup", True):
+        opts = copts.get("cgroup", {})
+        jobs.append(("cgroup", lambda d, u=unit, o=opts:
+            collectors.get("cgroup")(d, u, options=o, ctx=ctx)))
+
+    if cfg["collect"].get("hardening", False):
+        opts = copts.get("hardening", {})
+        jobs.append(("hardening", lambda d, u=unit, o=opts:
+            collectors.get("hardening")(d, u, o, ctx=ctx)))
+
+    return jobs
+
+
+def _collect(args, trigger: dict | None = None) -> int:
+    import shutil
+    import socket
+
+    from toolkit.core import compress, seekable
+    from toolkit.core.budget import BudgetGovernor
+    from toolkit.core.bundle import (
+        BundleWriter,
+        check_disk_space,
+        make_bundle_dir,
+        make_spool_dir,
+        utc_stamp,
+    )
+    from toolkit.core.context import CollectionContext
+    from toolkit.core.engine import CommandEngine
+    from toolkit.core.schedule import Job, Scheduler
+    from toolkit.core.store import Store, StoreWriter
+    from toolkit.core.trace import Tracer
+    from toolkit.metrics import write_metrics_multi
+    from toolkit.version import __version__, get_git_hash
+
+    startup.mark("collect modules imported")
+    start_time = time.time()
+    tracer = Tracer()
+
+    cfgs = _load_services(args.config)
+    multi = len(cfgs) > 1
+    # Output, runtime etc. come from the first config
+    cfg = cfgs[0]
+    names = [c["service"]["name"] for c in cfgs]
+    artifacts_dir = cfg["output"]["artifacts_dir"]
+
+    # Sanity check - don't fill up the disk
+    ok, avail = check_disk_space(artifacts_dir)
+    if not ok:
+        print(f"WARNING: Low disk ({avail}MB free)", file=sys.stderr)
+
+    label = names[0]
+    if multi:
+        label = "+".join(names)
+        if len(label) > 48:
+            label = f"{len(names)}-services"
+
+    # Collectors write into a spool dir, one subdir each; the writer
+    # moves their files into the tarball as soon as each one returns
+    bundle_id = f"{utc_stamp()}-{label}"
+    use_store = cfg["output"].get("store", False)
+    if use_store:
+        store = Store(artifacts_dir)
+        out_path = store.manifest_path(bundle_id)
+    else:
+        comp = compress.resolve(cfg["output"].get("compression"))
+        ext = compress.extension(comp["codec"])
+        out_path = Path(artifacts_dir).expanduser() / f"{bundle_id}{ext}"
+    try:
+        spool = make_spool_dir(artifacts_dir, bundle_id, out_path)
+    except FileExistsError as e:
+        # Same service, same second (a trigger fired twice?)
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    keep_dir = make_bundle_dir(artifacts_dir, label, bundle_id) if args.keep_dir else None
+    if use_store:
+        # Deduplicated store instead of a tarball - see toolkit/core/store.py
+        writer = StoreWriter(store, bundle_id, keep_dir=keep_dir)
+    else:
+        # Seekable = gzip member per file + index, so `bundle cat` can
+        # jump straight to one file. Still a plain .tar.gz to tar.
+        use_seekable = comp["codec"] == "gzip" and cfg["output"].get("seekable", True)
+        writer_cls = seekable.SeekableWriter if use_seekable else BundleWriter
+        writer = writer_cls(out_path, bundle_id, keep_dir=keep_dir, compression=comp)
+    writer.tracer = tracer
+
+    # One engine for every command in the run - a single concurrency
+    # limit and (optionally) a deadline for the whole bundle
+    runtime = cfg.get("runtime", {})
+    deadline = args.deadline or runtime.get("deadline_sec")
+    max_conc = 1 if args.serial else runtime.get("max_concurrency", 8)
+    engine = CommandEngine(max_concurrency=max_conc, deadline_sec=deadline).start()
+    startup.mark("engine started")
+    # Shared per-run state: unit properties get fetched once for everyone
+    ctx = CollectionContext(
+        engine, bundle_id=bundle_id, state_dir=Path(artifacts_dir).expanduser(), tracer=tracer,
+        background=True,
+    )
+
+    # Queue up collector jobs: name -> (fn, path prefix inside the bundle).
+    # One service keeps the usual flat layout. Several services get
+    # services/<name>/..., with host-level collectors once at the top.
+    jobs = {}
+    owner = {}  # job -> service it counts for (None = host-level, counts for all)
+    units = {}  # job -> unit, for unit-level collectors
+    for i, c in enumerate(cfgs):
+        svc = c["service"]["name"]
+        for collector, fn in _service_jobs(c, args, ctx, with_host=(i == 0)):
+            if not multi:
+                name, prefix, who = collector, "", svc
+            elif collector in HOST_COLLECTORS:
+                name, prefix, who = collector, "", None
+            else:
+                name, prefix, who = f"{svc}/{collector}", f"services/{svc}", svc
+            jobs[name] = (fn, prefix)
+            owner[name] = who
+            if collector not in HOST_COLLECTORS:
+                units[name] = c["service"]["unit"]
+
+    spools = {name: spool / name.replace("/", "--") for name in jobs}
+
+    # Optional size budget for the whole bundle, split by weight
+    budget = None
+    max_mb = cfg["output"].get("max_bundle_mb")
+    if max_mb:
+        budget = BudgetGovernor(int(float(max_mb) * 1024 * 1024), list(jobs),
+                                cfg["output"].get("budget_weights"))
+
+    def _handoff(name, tree=None):
+        """Collector done - fit it into the budget, then into the bundle."""
+        tree = tree or spools[name]
+        tracer.annotate(name, bytes=_tree_bytes(tree))
+        if budget is not None:
+            with tracer.span("budget", collector=name):
+                budget.settle(name, tree)
+        writer.add_tree(tree, prefix=jobs[name][1])
+
+    # Run em - parallel by default, volatile stuff first (see core/schedule.py)
+    scheduler = Scheduler(ctx)
+    sched_jobs = [Job(name, name.rsplit("/", 1)[-1], fn, spools[name], unit=units.get(name))
+                  for name, (fn, _) in jobs.items()]
+    done, failed, stuck = scheduler.run(sched_jobs, _handoff, serial=args.serial)
+
+    engine.close()
+    # Collectors cut off by the deadline. Their commands are dead now, so
+    # most return right away; the rest are still writing to their spool
+    # dir, so bundle a copy of it and leave the dir alone
+    running = scheduler.join(stuck, timeout=5)
+    for name in stuck:
+        if name in running:
+            _handoff(name, _snapshot_tree(spools[name], spool / f"{spools[name].name}.snapshot"))
+        else:
+            _handoff(name)
+
+    # Work collectors left running after they returned (host samples)
+    left = engine.remaining()
+    by_dir = {spools[name]: name for name in jobs}
+    for out_dir, late, finished in ctx.join_background(None if left is None else left + 5):
+        name = by_dir[out_dir]
+        if not finished:
+            print(f"'{name}' background work still running, skipping it", file=sys.stderr)
+            continue
+        if budget is not None:
+            budget.settle(f"{name} (background)", late)
+        writer.add_tree(late, prefix=jobs[name][1])
+
+    services = [{
+        "name": c["service"]["name"],
+        "unit": c["service"]["unit"],
+        "since": args.since or c["logs"]["since"],
+        "lines": args.lines or c["logs"]["lines"],
+        "redact": args.redact or c.get("redact", {}).get("enabled", False),
+    } for c in cfgs]
+    meta = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "toolkit_version": __version__,
+        "toolkit_git": get_git_hash(),
+        "host": socket.gethostname(),
+        "collectors": done,
+        "collectors_failed": failed,
+        "commands_cut_by_deadline": engine.deadline_hits,
+    }
+    if multi:
+        meta["services"] = services
+        meta["args"] = {"deadline_sec": deadline}
+    else:
+        s = services[0]
+        meta["service"] = {"name": s["name"], "unit": s["unit"]}
+        meta["args"] = {"since": s["since"], "lines": s["lines"], "redact": s["redact"],
+                        "deadline_sec": deadline}
+    if trigger is not None:
+        meta["trigger"] = trigger
+    meta.update(ctx.meta)
+    dirs = {spools[name].name: name for name in jobs}
+    truncations = [_spool_relative(t, spool, dirs) for t in engine.truncations]
+    if budget is not None:
+        meta["budget"] = budget.summary()
+        truncations += budget.truncations
+    meta["truncations"] = truncations
+    meta["schedule"] = scheduler.summary()
+    # Everything but meta.json itself is compressed/stored by now
+    writer.sync()
+    out_stats = writer.stats()
+    meta["store" if use_store else "compression"] = out_stats
+    # Last, so it has everything up to here - only the archive's finish is missing
+    meta["trace"] = tracer.summary()
+
+    writer.add_bytes(
+        "meta.json", json.dumps(meta, indent=2, ensure_ascii=False).encode("utf-8")
+    )
+    tgz = writer.close()
+    if not writer.errors:
+        ctx.commit()  # e.g. journal cursors - only for a bundle that's complete
+    running = scheduler.join(running, timeout=1)
+    if running:
+        # Only their dirs are left - don't pull them out from under them
+        print(f"Warning: {', '.join(running)} still running, leaving {spool}", file=sys.stderr)
+    else:
+        shutil.rmtree(spool, ignore_errors=True)
+    for err in writer.errors:
+        print(f"Warning: couldn't add to bundle: {err}", file=sys.stderr)
+    duration = time.time() - start_time
+
+    # Write metrics for Prometheus (if node_exporter textfile collector is set up)
+    if use_store:
+        # What this run actually added to disk
+        out_stats = writer.stats()
+        bundle_size = out_stats["stored_bytes"]
+        comp_sec, ratio = 0.0, out_stats["dedup_ratio"]
+    else:
+        try:
+            bundle_size = tgz.stat().st_size
+        except OSError:
+            bundle_size = 0
+        comp_sec, ratio = out_stats["cpu_sec"], out_stats["ratio"]
+    # One file, one set of samples per service (host-level collectors count for each)
+    write_metrics_multi([{
+        "service": svc,
+        "collectors_run": [n for n in done if owner[n] in (svc, None)],
+        "collectors_failed": [n for n in failed if owner[n] in (svc, None)],
+        "duration_sec": duration,
+        "bundle_size_bytes": bundle_size,
+        "compression_sec": comp_sec,
+        "compression_ratio": ratio,
+        # Per collector, by its plain name - host-level ones show up under every service
+        "collectors": {n.rsplit("/", 1)[-1]: c for n, c in tracer.collectors().items()
+                       if owner.get(n, svc) in (svc, None)},
+        "phases": tracer.phases(),
+    } for svc in names])
+
+    if args.trace is not None:
+        trace_path = Path(args.trace) if args.trace else spool.parent / f"{bundle_id}.trace.json"
+        try:
+            trace_path.write_text(json.dumps(tracer.chrome(bundle_id)))
+            print(f"Trace: {trace_path}", file=sys.stderr)
+        except OSError as e:
+            print(f"Warning: couldn't write trace: {e}", file=sys.stderr)
+
+    print(str(tgz))
+
+    return 1 if failed else 0
 
 
 def main():
+    # Checked by hand so the import timer is in before anything else loads
+    if "--startup-profile" in sys.argv[1:]:
+        startup.enable()
+
     p = argparse.ArgumentParser(prog="toolkit")
+    p.add_argument("--startup-profile", action="store_true",
+                   help="Print where startup time went (imports, config, first command)")
     sub = p.add_subparsers(dest="cmd", required=True)
 
     inc = sub.add_parser("incident")
     inc_sub = inc.add_subparsers(dest="subcmd", required=True)
 
     coll = inc_sub.add_parser("collect")
-    coll.add_argument("--config", required=True)
+    coll.add_argument("--config", required=True, action="append",
+                      help="Service config; repeat it (or pass a directory of configs) "
+                           "to collect several services into one bundle")
     coll.add_argument("--since", default=None)
     coll.add_argument("--lines", type=int, default=None)
     coll.add_argument("--redact", action="store_true", help="Scrub secrets from logs")
     coll.add_argument("--serial", action="store_true", help="Don't parallelize (for debugging)")
+    coll.add_argument("--incremental", action="store_true",
+                      help="Only pull journal entries newer than the last bundle's")
+    coll.add_argument("--deadline", type=float, default=None,
+                      help="Finish the whole bundle within this many seconds")
+    coll.add_argument("--keep-dir", action="store_true",
+                      help="Also leave the unpacked bundle directory next to the tarball")
+    coll.add_argument("--trace", nargs="?", const="", default=None, metavar="FILE",
+                      help="Write Chrome trace-event JSON of the run (default: "
+                           "<bundle>.trace.json next to the bundle)")
+
+    rec = sub.add_parser("record", help="Flight recorder: keep recent host/unit samples in memory")
+    rec.add_argument("--config", required=True, action="append",
+                     help="Service config(s) whose units to sample; repeat or pass a directory")
+    rec.add_argument("--interval", type=float, default=None, help="Seconds between samples")
+    rec.add_argument("--history-min", type=float, default=None, help="Minutes of history to keep")
+    rec.add_argument("--trigger", action="store_true",
+                     help="Ask the running recorder to collect a bundle, then exit")
+
+    wat = sub.add_parser("watch",
+                         help="Collect automatically on unit failure, OOM kill or restart loop")
+    wat.add_argument("--config", required=True, action="append",
+                     help="Service config(s) to watch; repeat or pass a directory")
+    wat.add_argument("--poll", action="store_true",
+                     help="Poll systemctl show instead of following the journal")
+
+    bun = sub.add_parser("bundle")
+    bun_sub = bun.add_subparsers(dest="subcmd", required=True)
+    exp = bun_sub.add_parser("export", help="Rebuild a normal tarball from the bundle store")
+    exp.add_argument("bundle_id")
+    exp.add_argument("-o", "--output", default=None, help="Tarball path (default: ./<id>.tar.gz)")
+    ls = bun_sub.add_parser("ls", help="List files in bundles (tarball paths or store ids)")
+    ls.add_argument("bundles", nargs="+")
+    cat = bun_sub.add_parser("cat", help="Print one file from a bundle")
+    cat.add_argument("bundle")
+    cat.add_argument("path", help="e.g. process/snapshot.txt")
+    gc = bun_sub.add_parser("gc", help="Delete store blobs no bundle points at any more")
+    for sp in (exp, ls, cat, gc):
+        sp.add_argument("--config", default=None, help="Service config (for artifacts_dir)")
+        sp.add_argument("--artifacts-dir", default=None)
 
     args = p.parse_args()
+    startup.mark("args parsed")
+    try:
+        return _dispatch(args)
+    finally:
+        if startup.enabled:
+            print(startup.report(), file=sys.stderr)
 
-    if args.cmd == "incident" and args.subcmd == "collect":
-        start_time = time.time()
 
-        cfg = load_config(args.config)
-        unit = cfg["service"]["unit"]
-        svc = cfg["service"]["name"]
-        artifacts_dir = cfg["output"]["artifacts_dir"]
-        since = args.since or cfg["logs"]["since"]
-        lines = args.lines or cfg["logs"]["lines"]
-
-        # Sanity check - don't fill up the disk
-        ok, avail = check_disk_space(artifacts_dir)
-        if not ok:
-            print(f"WARNING: Low disk ({avail}MB free)", file=sys.stderr)
-
-        out_dir = make_bundle_dir(artifacts_dir, svc)
-
-        # Redaction settings
-        redact_cfg = cfg.get("redact", {})
-        do_redact = args.redact or redact_cfg.get("enabled", False)
-        extra_patterns = redact_cfg.get("patterns", [])
-        whitelist = redact_cfg.get("whitelist", [])
-
-        # Queue up collector jobs
-        jobs = []
-
-        if cfg["collect"].get("systemd", True):
-            jobs.append(("systemd", lambda: collect_systemd(out_dir, unit)))
-
-        if cfg["collect"].get("journald", True):
-            # Need default args in lambda to avoid closure issues (learned this the hard way)
-            jobs.append(("journald", lambda u=unit, s=since, l=lines:
-                collect_journald(out_dir, u, s, l, redact=do_redact,
-                                redact_patterns=extra_patterns, redact_whitelist=whitelist)))
-
-        if cfg["collect"].get("resource", True):
-            jobs.append(("resource", lambda: collect_resource(out_dir)))
-
-        if cfg["collect"].get("process", True):
-            jobs.append(("process", lambda u=unit: collect_process(out_dir, u)))
-
-        if cfg["collect"].get("hardening", False):
-            opts = cfg.get("collector_options", {}).get("hardening", {})
-            jobs.append(("hardening", lambda u=unit, o=opts: collect_hardening(out_dir, u, o)))
-
-        # Run em - parallel by default, way faster for I/O bound stuff
-        done = []
-        failed = []
-
-        if args.serial or len(jobs) <= 1:
-            for name, fn in jobs:
-                try:
-                    fn()
-                    done.append(name)
-                except Exception as e:
-                    print(f"'{name}' failed: {e}", file=sys.stderr)
-                    failed.append(name)
-        else:
-            # Parallel - usually finishes in half the time
-            with ThreadPoolExecutor(max_workers=4) as pool:
-                futures = {pool.submit(fn): name for name, fn in jobs}
-                for f in as_completed(futures):
-                    name = futures[f]
-                    try:
-                        f.result()
-                        done.append(name)
-                    except Exception as e:
-                        print(f"'{name}' failed: {e}", file=sys.stderr)
-                        failed.append(name)
-
-        meta = {
-            "timestamp": datetime.now(timezone.utc).isoformat(),
-            "toolkit_version": __version__,
-            "toolkit_git": get_git_hash(),
-            "service": {"name": svc, "unit": unit},
-            "host": socket.gethostname(),
-            "args": {"since": since, "lines": lines, "redact": do_redact},
-            "collectors": done,
-            "collectors_failed": failed,
-        }
-
-        write_json(out_dir / "meta.json", meta)
-
-        tgz = tar_gz(out_dir)
-        duration = time.time() - start_time
-
-        # Write metrics for Prometheus (if node_exporter textfile collector is set up)
-        try:
-            bundle_size = tgz.stat().st_size
-        except OSError:
-            bundle_size = 0
-        write_metrics(svc, done, failed, duration, bundle_size)
+def _dispatch(args) -> int:
+    if args.cmd == "bundle":
+        return _bundle(args)
+
+    if args.cmd == "record":
+        return _record(args)
 
-        print(str(tgz))
+    if args.cmd == "watch":
+        return _watch(args)
 
-        return 1 if failed else 0
+    if args.cmd == "incident" and args.subcmd == "collect":
+        return _collect(args)
 
     return 2
@@ -1,15 +1,37 @@
-"""Collectors for incident data."""
-
-from toolkit.collectors.systemd import collect_systemd
-from toolkit.collectors.journald import collect_journald
-from toolkit.collectors.resource import collect_resource
-from toolkit.collectors.process import collect_process
-from toolkit.collectors.hardening import collect_hardening
-
-__all__ = [
-    "collect_systemd",
-    "collect_journald",
-    "collect_resource",
-    "collect_process",
-    "collect_hardening",
-]
+"""Collectors for incident data.
+
+A registry rather than eager imports: `toolkit bundle ls` or a watch
+trigger shouldn't pay for importing collectors it never runs.
+`get("journald")` imports on first use; `from toolkit.collectors import
+collect_journald` still works.
+"""
+
+from __future__ import annotations
+
+import importlib
+from typing import Callable, Dict
+
+# collector name -> module:function
+REGISTRY: Dict[str, str] = {
+    "systemd": "toolkit.collectors.systemd:collect_systemd",
+    "journald": "toolkit.collectors.journald:collect_journald",
+    "resource": "toolkit.collectors.resource:collect_resource",
+    "process": "toolkit.collectors.process:collect_process",
+    "cgroup": "toolkit.collectors.cgroup:collect_cgroup",
+    "hardening": "toolkit.collectors.hardening:collect_hardening",
+    "recorder": "toolkit.collectors.recorder:collect_recorder",
+}
+
+__all__ = ["REGISTRY", "get"] + [f"collect_{name}" for name in REGISTRY]
+
+
+def get(name: str) -> Callable:
+    """The collect function for a collector name (imports its module)."""
+    module, _, func = REGISTRY[name].partition(":")
+    return getattr(importlib.import_module(module), func)
+
+
+def __getattr__(name: str):
+    if name.startswith("collect_") and name[len("collect_"):] in REGISTRY:
+        return get(name[len("collect_"):])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
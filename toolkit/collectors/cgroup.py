@@ -0,0 +1,321 @@
+"""cgroup collector - what the kernel thinks the unit is using and waiting on.
+
+`free -h` says how the host is doing. "Why was it slow" and "why was it
+killed" are usually about the unit's own cgroup: its memory limit and OOM
+kills, CPU quota throttling, I/O, pids.max, and pressure stall (PSI) -
+how much of the time its tasks were stuck waiting on CPU, memory or I/O.
+
+Everything is a plain file read under /sys/fs/cgroup, no forks. cgroup
+v2 is read directly. On v1/hybrid hosts the same numbers come from the
+memory, cpu,cpuacct, pids and blkio hierarchies, and pressure from the
+unified one if the kernel has PSI. Two samples sample_interval_sec apart
+turn the counters into rates: CPU use, throttling, I/O per device, PSI
+stall % and OOM kills in the window.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict
+
+from toolkit.core import procfs
+from toolkit.core.bundle import write_json, write_text
+from toolkit.core.context import CollectionContext
+
+CGROUP_FS = Path("/sys/fs/cgroup")
+
+PRESSURE = ("cpu", "memory", "io")
+
+# memory.stat keys worth a line in cgroup.txt (v2 names)
+_MEM_KEYS = ("anon", "file", "kernel", "kernel_stack", "slab", "sock", "shmem",
+             "file_dirty", "file_writeback", "pgmajfault")
+
+# v1 limits that mean "no limit" (PAGE_COUNTER_MAX rounded to pages)
+_V1_UNLIMITED = 1 << 62
+
+
+_devs: Dict[str, str] = {}
+
+
+def _dev_name(majmin: str) -> str:
+    name = _devs.get(majmin)
+    if name is None:
+        try:
+            name = os.path.basename(os.readlink(f"/sys/dev/block/{majmin}"))
+        except OSError:
+            name = majmin
+        _devs[majmin] = name
+    return name
+
+
+def _read_io_stat(path: Path) -> Dict[str, Dict[str, int]]:
+    """v2 io.stat: "8:0 rbytes=1 wbytes=2 rios=3 wios=4 ..." -> {dev: {...}}."""
+    out: Dict[str, Dict[str, int]] = {}
+    try:
+        text = path.read_text()
+    except OSError:
+        return out
+    for line in text.splitlines():
+        dev, *kvs = line.split()
+        vals = {}
+        for kv in kvs:
+            k, _, v = kv.partition("=")
+            if v.isdigit():
+                vals[k] = int(v)
+        out[_dev_name(dev)] = vals
+    return out
+
+
+def _read_blkio(base: Path) -> Dict[str, Dict[str, int]]:
+    """v1 blkio.throttle.io_service_bytes/io_serviced -> same shape as io.stat."""
+    out: Dict[str, Dict[str, int]] = {}
+    for fname, prefix in (("blkio.throttle.io_service_bytes", "bytes"),
+                          ("blkio.throttle.io_serviced", "ios")):
+        try:
+            text = (base / fname).read_text()
+        except OSError:
+            continue
+        for line in text.splitlines():
+            parts = line.split()
+            if len(parts) != 3 or parts[1] not in ("Read", "Write"):
+                continue
+            key = ("r" if parts[1] == "Read" else "w") + prefix
+            out.setdefault(_dev_name(parts[0]), {})[key] = int(parts[2])
+    return out
+
+
+def resolve(cgroup: str, fs: Path = CGROUP_FS) -> Dict[str, Any] | None:
+    """Where the unit's cgroup files are. None if the cgroup doesn't exist (unit stopped)."""
+    rel = cgroup.lstrip("/")
+    if (fs / "cgroup.controllers").exists():
+        root = fs / rel
+        return {"version": 2, "root": root} if root.is_dir() else None
+    v1 = {c: fs / c / rel for c in ("memory", "cpu,cpuacct", "cpu", "cpuacct", "pids", "blkio")}
+    if not any(p.is_dir() for p in v1.values()):
+        return None
+    unified = fs / "unified" / rel
+    return {"version": 1, "v1": v1, "unified": unified if unified.is_dir() else None}
+
+
+def sample(where: Dict[str, Any]) -> Dict[str, Any]:
+    """One read of everything, normalized to the v2 names."""
+    s: Dict[str, Any] = {"t": time.monotonic()}
+    if where["version"] == 2:
+        root = where["root"]
+        mem_max = procfs.read_value(root / "memory.max")
+        s["memory"] = {
+            "current": procfs.read_value(root / "memory.current"),
+            "max": mem_max,
+            "high": procfs.read_value(root / "memory.high"),
+            "swap_current": procfs.read_value(root / "memory.swap.current"),
+            "swap_max": procfs.read_value(root / "memory.swap.max"),
+            "stat": procfs.read_keyed(root / "memory.stat"),
+            "events": procfs.read_keyed(root / "memory.events"),
+        }
+        cpu = procfs.read_keyed(root / "cpu.stat")
+        try:
+            quota, period = (root / "cpu.max").read_text().split()
+            cpu["quota_cpus"] = None if quota == "max" else round(int(quota) / int(period), 2)
+        except (OSError, ValueError):
+            pass
+        s["cpu"] = cpu
+        s["io"] = _read_io_stat(root / "io.stat")
+        s["pids"] = {"current": procfs.read_value(root / "pids.current"),
+                     "max": procfs.read_value(root / "pids.max")}
+        psi_root = root
+    else:
+        v1 = where["v1"]
+        mem = v1["memory"]
+        limit = procfs.read_value(mem / "memory.limit_in_bytes")
+        oom = procfs.read_keyed(mem / "memory.oom_control")
+        stat = procfs.read_keyed(mem / "memory.stat")
+        s["memory"] = {
+            "current": procfs.read_value(mem / "memory.usage_in_bytes"),
+            "max": None if limit is None or limit >= _V1_UNLIMITED else limit,
+            "high": None,
+            "swap_current": None,
+            "swap_max": None,
+            # v1 names -> the v2 ones used in cgroup.txt
+            "stat": dict(stat, anon=stat.get("rss"), file=stat.get("cache"),
+                         file_dirty=stat.get("dirty"), file_writeback=stat.get("writeback")),
+            "events": {"max": procfs.read_value(mem / "memory.failcnt") or 0,
+                       "oom_kill": oom.get("oom_kill", 0), "under_oom": oom.get("under_oom", 0)},
+        }
+        cpu_dir = next((p for p in (v1["cpu,cpuacct"], v1["cpu"]) if p.is_dir()), v1["cpu"])
+        acct_dir = next((p for p in (v1["cpu,cpuacct"], v1["cpuacct"]) if p.is_dir()),
+                        v1["cpuacct"])
+        raw = procfs.read_keyed(cpu_dir / "cpu.stat")
+        usage_ns = procfs.read_value(acct_dir / "cpuacct.usage")
+        cpu = {"nr_periods": raw.get("nr_periods", 0), "nr_throttled": raw.get("nr_throttled", 0),
+               "throttled_usec": raw.get("throttled_time", 0) // 1000}
+        if usage_ns is not None:
+            cpu["usage_usec"] = usage_ns // 1000
+        quota = procfs.read_value(cpu_dir / "cpu.cfs_quota_us")
+        period = procfs.read_value(cpu_dir / "cpu.cfs_period_us")
+        if quota is not None and period:
+            cpu["quota_cpus"] = None if quota < 0 else round(quota / period, 2)
+        s["cpu"] = cpu
+        s["io"] = _read_blkio(v1["blkio"])
+        s["pids"] = {"current": procfs.read_value(v1["pids"] / "pids.current"),
+                     "max": procfs.read_value(v1["pids"] / "pids.max")}
+        psi_root = where["unified"]
+    s["pressure"] = {r: procfs.read_pressure_file(psi_root / f"{r}.pressure")
+                     for r in PRESSURE} if psi_root is not None else {}
+    s["host_pressure"] = {r: procfs.read_pressure(r) for r in PRESSURE}
+    return s
+
+
+def _psi_rates(a: Dict[str, Any], b: Dict[str, Any], dt: float) -> Dict[str, Dict[str, float]]:
+    """% of the window tasks were stalled, from the PSI totals (usec)."""
+    out: Dict[str, Dict[str, float]] = {}
+    for res, kinds in b.items():
+        for kind, vals in kinds.items():
+            before = a.get(res, {}).get(kind, {}).get("total")
+            if before is not None and "total" in vals:
+                out.setdefault(res, {})[kind] = round((vals["total"] - before) / (dt * 1e4), 2)
+    return out
+
+
+def rates(a: Dict[str, Any], b: Dict[str, Any]) -> Dict[str, Any]:
+    """Per-second / percent rates between two samples."""
+    dt = b["t"] - a["t"]
+    if dt <= 0:
+        return {}
+    ca, cb = a["cpu"], b["cpu"]
+    out: Dict[str, Any] = {"interval_sec": round(dt, 3)}
+    if "usage_usec" in cb and "usage_usec" in ca:
+        out["cpu_pct"] = round((cb["usage_usec"] - ca["usage_usec"]) / (dt * 1e4), 1)
+    periods = cb.get("nr_periods", 0) - ca.get("nr_periods", 0)
+    throttled = cb.get("nr_throttled", 0) - ca.get("nr_throttled", 0)
+    out["throttled_periods"] = throttled
+    out["throttled_periods_pct"] = round(throttled * 100 / periods, 1) if periods else 0.0
+    out["throttled_pct"] = round((cb.get("throttled_usec", 0) - ca.get("throttled_usec", 0))
+                                 / (dt * 1e4), 1)
+    out["io"] = {dev: {k: round((v - a["io"].get(dev, {}).get(k, 0)) / dt)
+                       for k, v in vals.items() if k in ("rbytes", "wbytes", "rios", "wios")}
+                 for dev, vals in b["io"].items()}
+    ea, eb = a["memory"]["events"], b["memory"]["events"]
+    out["memory_events"] = {k: v - ea.get(k, 0) for k, v in eb.items() if v != ea.get(k, 0)}
+    out["pressure_stall_pct"] = _psi_rates(a["pressure"], b["pressure"], dt)
+    out["host_pressure_stall_pct"] = _psi_rates(a["host_pressure"], b["host_pressure"], dt)
+    return out
+
+
+def _h(n) -> str:
+    return "unlimited" if n is None else procfs.human_bytes(n)
+
+
+def _psi_lines(label: str, psi: Dict[str, Any], stall: Dict[str, Any]) -> list:
+    lines = []
+    for res in PRESSURE:
+        for kind in ("some", "full"):
+            vals = psi.get(res, {}).get(kind)
+            if vals is None:
+                continue
+            now = stall.get(res, {}).get(kind)
+            window = f"{now:6.2f}%" if now is not None else "     -"
+            lines.append(f"  {label:<7}{res:<7}{kind:<5}{window}"
+                         f"   avg10 {vals.get('avg10', 0):6.2f}"
+                         f"  avg60 {vals.get('avg60', 0):6.2f}"
+                         f"  avg300 {vals.get('avg300', 0):6.2f}")
+    return lines
+
+
+def format_report(cgroup: str, version: int, s: Dict[str, Any], r: Dict[str, Any]) -> str:
+    mem, cpu = s["memory"], s["cpu"]
+    lines = [f"# cgroup {cgroup} (v{version})"]
+    if r:
+        lines.append(f"# rates over {r['interval_sec']}s")
+
+    cur, mx = mem["current"], mem["max"]
+    pct = f" ({cur * 100 // mx}%)" if cur is not None and mx else ""
+    lines += ["", "## memory",
+              f"current {_h(cur)} / limit {_h(mx)}{pct}   high {_h(mem['high'])}   "
+              f"swap {_h(mem['swap_current']) if mem['swap_current'] is not None else '-'}"
+              f" / {_h(mem['swap_max'])}"]
+    st = mem["stat"]
+    lines.append("  " + "  ".join(f"{k} {procfs.human_bytes(st[k]) if k != 'pgmajfault' else st[k]}"
+                                  for k in _MEM_KEYS if st.get(k) is not None))
+    ev = mem["events"]
+    if ev:
+        lines.append("  events (since cgroup creation): "
+                     + "  ".join(f"{k} {v}" for k, v in ev.items()))
+    if r.get("memory_events"):
+        lines.append("  in the window: "
+                     + "  ".join(f"{k} +{v}" for k, v in r["memory_events"].items()))
+
+    lines += ["", "## cpu"]
+    quota = cpu.get("quota_cpus")
+    lines.append(f"quota {'none' if quota is None else f'{quota} CPUs'}"
+                 + (f"   usage {r['cpu_pct']}% of one CPU" if "cpu_pct" in r else ""))
+    lines.append(f"  throttled {cpu.get('nr_throttled', 0)} of {cpu.get('nr_periods', 0)} periods, "
+                 f"{cpu.get('throttled_usec', 0) / 1e6:.1f}s total")
+    if r:
+        lines.append(f"  in the window: throttled {r['throttled_periods_pct']}% of periods, "
+                     f"{r['throttled_pct']}% of the time")
+
+    if s["io"]:
+        lines += ["", "## io", f"{'DEVICE':<12}{'READ/s':>10}{'WRITE/s':>10}"
+                  f"{'R IOPS':>9}{'W IOPS':>9}{'READ total':>12}{'WRITE total':>12}"]
+        for dev, vals in sorted(s["io"].items()):
+            rr = r.get("io", {}).get(dev, {})
+            lines.append(f"{dev:<12}{procfs.human_bytes(rr.get('rbytes', 0)):>10}"
+                         f"{procfs.human_bytes(rr.get('wbytes', 0)):>10}{rr.get('rios', 0):>9}"
+                         f"{rr.get('wios', 0):>9}{procfs.human_bytes(vals.get('rbytes', 0)):>12}"
+                         f"{procfs.human_bytes(vals.get('wbytes', 0)):>12}")
+
+    p = s["pids"]
+    lines += ["", "## pids", f"{p['current'] if p['current'] is not None else '-'} / "
+              f"{'unlimited' if p['max'] is None else p['max']}"]
+
+    lines += ["", "## pressure (stall % in the window; kernel averages over 10/60/300s)"]
+    psi = _psi_lines("unit", s["pressure"], r.get("pressure_stall_pct", {}))
+    psi += _psi_lines("host", s["host_pressure"], r.get("host_pressure_stall_pct", {}))
+    lines += psi or ["  [no PSI - kernel older than 4.20 or booted with psi=0]"]
+    return "\n".join(lines) + "\n"
+
+
+def collect_cgroup(out_dir: Path, unit: str, options: Dict[str, Any] | None = None,
+                   ctx: CollectionContext | None = None):
+    """Memory/CPU/IO/pids/PSI for the unit's cgroup, plus host PSI.
+
+    Two samples collector_options.cgroup.sample_interval_sec apart (0 =
+    just one, no rates). cgroup.txt for people, cgroup.json with both raw
+    samples and the rates.
+    """
+    ctx = ctx or CollectionContext()
+    options = options or {}
+    cgroup = ctx.unit_properties(unit).get("ControlGroup", "")
+    where = resolve(cgroup) if cgroup else None
+    if where is None:
+        write_text(out_dir / "cgroup/cgroup.txt",
+                   f"No cgroup for {unit} (ControlGroup={cgroup or 'unset'}) - stopped?\n")
+        print(f"Note: No cgroup for '{unit}'", file=sys.stderr)
+        return
+
+    interval = float(options.get("sample_interval_sec", 1.0) or 0)
+    left = ctx.engine.remaining()
+    if left is not None:
+        interval = min(interval, max(0.0, left - 1))
+    first = sample(where)
+    second = first
+    if interval > 0:
+        time.sleep(interval)
+        second = sample(where)
+    r = rates(first, second) if second is not first else {}
+
+    write_text(out_dir / "cgroup/cgroup.txt", format_report(cgroup, where["version"], second, r))
+    for s in (first, second):
+        s.pop("t", None)
+    write_json(out_dir / "cgroup/cgroup.json", {
+        "unit": unit,
+        "cgroup": cgroup,
+        "version": where["version"],
+        "captured": datetime.now(timezone.utc).isoformat(),
+        "rates": r,
+        "samples": [first, second] if r else [first],
+    })
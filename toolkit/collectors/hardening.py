@@ -10,7 +10,7 @@ from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Dict
 
-from toolkit.core.runner import run_cmd
+from toolkit.core.context import CollectionContext, parse_systemctl_show
 from toolkit.core.bundle import write_text, write_json
 
 
@@ -66,13 +66,8 @@ HARDENING_CHECKS: Dict[str, tuple[callable, str]] = {
 }
 
 
-def _parse_systemctl_show(output: str) -> Dict[str, str]:
-    props = {}
-    for line in output.splitlines():
-        if "=" in line:
-            key, _, value = line.partition("=")
-            props[key.strip()] = value.strip()
-    return props
+# Lives in core now so every collector can share one parsed snapshot
+_parse_systemctl_show = parse_systemctl_show
 
 
 def _get_distro_info() -> str:
@@ -90,9 +85,11 @@ def _get_distro_info() -> str:
     return ""
 
 
-def collect_hardening(out_dir: Path, unit: str, options: Dict[str, Any]) -> None:
+def collect_hardening(out_dir: Path, unit: str, options: Dict[str, Any],
+                      ctx: CollectionContext | None = None) -> None:
     """Run hardening checks and write report."""
-    r = run_cmd(["systemctl", "show", unit], timeout_sec=8)
+    ctx = ctx or CollectionContext()
+    r = ctx.unit_show(unit)
     if r.returncode != 0:
         write_text(
             out_dir / "hardening/report.txt",
@@ -100,7 +97,7 @@ def collect_hardening(out_dir: Path, unit: str, options: Dict[str, Any]) -> None
         )
         return
 
-    props = _parse_systemctl_show(r.stdout)
+    props = ctx.unit_properties(unit)
     results: list[CheckResult] = []
 
     for prop_name, (check_fn, description) in HARDENING_CHECKS.items():
@@ -2,32 +2,115 @@
 
 from __future__ import annotations
 
+import json
+import os
 import sys
+import threading
+from collections import Counter
+from datetime import datetime, timezone
 from pathlib import Path
+from typing import Any, Dict
 
-from toolkit.core.runner import run_cmd
-from toolkit.core.bundle import write_text
+from toolkit.core import trace
+from toolkit.core.bundle import redact_file, redact_text, write_json
+from toolkit.core.context import CollectionContext
+from toolkit.core.journal import JournalSink
+from toolkit.core.redact import stats_summary
+
+# Per-unit journal cursors, kept next to the bundles
+CURSOR_STATE_FILE = ".journald-cursors.json"
+
+# Several units can be collected in one process - serialize state updates
+_state_lock = threading.Lock()
+
+
+def _load_cursor_state(state_dir: Path) -> Dict[str, Any]:
+    try:
+        return json.loads((state_dir / CURSOR_STATE_FILE).read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cursor(state_dir: Path, unit: str, entry: Dict[str, Any]) -> None:
+    """Update one unit's cursor. Atomic rename so a crash can't leave half a file."""
+    with _state_lock:
+        state = _load_cursor_state(state_dir)
+        state[unit] = entry
+        path = state_dir / CURSOR_STATE_FILE
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(state, indent=2))
+        os.replace(tmp, path)
+
+
+def _redact_index(index: Dict[str, Any], patterns, whitelist) -> None:
+    """Messages in the index are log text too - scrub them like the log.
+
+    Hits here aren't counted - they're the same secrets as in the log.
+    """
+    for item in index["top_messages"]:
+        item["signature"] = redact_text(item["signature"], patterns, whitelist)
+        item["example"] = redact_text(item["example"], patterns, whitelist)
 
 
 def collect_journald(out_dir: Path, unit: str, since: str, lines: int,
-                     redact=False, redact_patterns=None, redact_whitelist=None):
+                     redact=False, redact_patterns=None, redact_whitelist=None,
+                     incremental=False, output_format: str = "short-iso",
+                     redact_workers: int | None = 0,
+                     ctx: CollectionContext | None = None):
     """Grab logs via journalctl.
 
     NOTE: Be careful with 'lines' param on busy services -
     I once froze a box trying to pull 500k lines without --no-pager. Lesson learned.
+
+    journalctl always runs with `-o json`; entries are parsed as they
+    stream in and rendered to journald.txt in `output_format` (short-iso,
+    short, cat, or json for the raw entries). The same pass builds
+    logs/journald.index.json - per-minute counts by priority, new PIDs, top
+    message signatures, first/last/first-error timestamps - so "when did
+    errors start" doesn't need a grep through 5MB of text. The text is
+    capped at 5MB, keeping the newest entries; the index covers every
+    entry read.
+
+    With incremental=True the journal cursor is saved per unit under the
+    artifacts dir, and the next collection only pulls entries after it
+    (instead of re-reading the whole --since window), all of them - `lines`
+    only limits full reads. The bundle records which earlier bundle holds
+    the older lines, and notes it when the byte cap left a gap.
     """
-    r = run_cmd(
-        [
-            "journalctl",
-            "-u", unit,
-            "--since", since,
+    ctx = ctx or CollectionContext()
+    log_path = out_dir / "logs/journald.txt"
+    state_dir = ctx.state_dir
+    incremental = incremental and state_dir is not None
+
+    prev: Dict[str, Any] = {}
+    if incremental:
+        prev = _load_cursor_state(state_dir).get(unit, {})
+
+    def _journalctl(after_cursor: str | None):
+        cmd = ["journalctl", "-u", unit]
+        if after_cursor:
+            # No -n here: it keeps the *last* N entries, silently dropping
+            # whatever came right after the cursor. The byte cap (newest
+            # kept, truncation recorded) bounds it instead
+            cmd += ["--after-cursor", after_cursor]
+        else:
+            cmd += ["--since", since, "-n", str(lines)]
+        cmd += [
             "--no-pager",  # seriously, don't remove this
-            "-n", str(lines),
-            "--output=short-iso",
-        ],
-        timeout_sec=15,
-        max_bytes=5_000_000,
-    )
+            "--output=json",
+        ]
+        sink = JournalSink(log_path, max_bytes=5_000_000, fmt=output_format)
+        return ctx.engine.run(cmd, timeout_sec=15, sink=sink), sink
+
+    after = prev.get("cursor")
+    r, sink = _journalctl(after)
+    if after and r.returncode != 0 and "cursor" in r.stderr.lower():
+        # Journal got rotated/vacuumed past our cursor - start over
+        print(f"Note: saved journal cursor for '{unit}' is stale, doing a full read",
+              file=sys.stderr)
+        after = None
+        prev = {}
+        r, sink = _journalctl(None)
 
     if r.returncode != 0 and "No entries" in r.stderr:
         print(
@@ -36,12 +119,53 @@ def collect_journald(out_dir: Path, unit: str, since: str, lines: int,
             file=sys.stderr,
         )
 
-    output = r.stdout + "\n\n" + r.stderr
+    if r.truncated:
+        print(
+            f"Note: journal text for '{unit}' hit the {r.stdout_bytes} byte cap, "
+            f"kept the newest entries (the index still counts all of them). "
+            f"Lower --lines or narrow --since.",
+            file=sys.stderr,
+        )
+
+    index = sink.index.to_dict()
+    index.update({
+        "unit": unit,
+        "text_format": sink.fmt,
+        "text_truncated": r.truncated,
+        "unparsed_lines": sink.bad_lines,
+    })
+    if redact:
+        _redact_index(index, redact_patterns, redact_whitelist)
+    write_json(out_dir / "logs/journald.index.json", index, indent=None)
+
+    if incremental:
+        # The newest entry is always in the text, even when the cap dropped older ones
+        new_cursor = sink.written_cursor or None
+        info = {
+            "mode": "incremental" if after else "full",
+            "after_cursor": after,
+            # The bundle holding the lines before after_cursor
+            "previous_bundle": prev.get("bundle") if after else None,
+            "cursor": new_cursor,
+        }
+        if new_cursor:
+            # Only once the bundle is on disk - if this run dies before
+            # that, the next one has to read these entries again
+            entry = {"cursor": new_cursor, "bundle": ctx.bundle_id}
+            ctx.on_commit(lambda: _save_cursor(state_dir, unit, dict(
+                entry, updated=datetime.now(timezone.utc).isoformat())))
+        if r.truncated:
+            # Chain isn't gap-free in text: the entries right after
+            # after_cursor are only counted in the index
+            info["gap"] = True
+            info["note"] = ("text truncated - the oldest entries in this window "
+                            "are only in the index")
+        write_json(out_dir / "logs/journald.cursor.json", info)
+        ctx.add_meta("journald", info, key=unit)
 
-    write_text(
-        out_dir / "logs/journald.txt",
-        output,
-        redact=redact,
-        patterns=redact_patterns,
-        whitelist=redact_whitelist
-    )
+    if redact:
+        stats: Counter = Counter()
+        with trace.span("redact", unit=unit):
+            redact_file(log_path, redact_patterns, redact_whitelist, stats,
+                        workers=redact_workers)
+        ctx.add_meta("redaction", stats_summary(stats), key=unit)
@@ -2,23 +2,21 @@
 
 from __future__ import annotations
 
-import re
 import sys
 from datetime import datetime, timezone
 from pathlib import Path
+from typing import Any, Dict, List
 
-from toolkit.core.runner import run_cmd
-from toolkit.core.bundle import write_text
+from toolkit.core import fdlist, procfs, procsample, proctable
+from toolkit.core.bundle import write_json, write_text
+from toolkit.core.context import CollectionContext
 
 
-def _get_main_pid(unit):
-    """Get MainPID from systemctl. Returns None if service isn't running."""
-    r = run_cmd(["systemctl", "show", unit, "--property=MainPID"], timeout_sec=5)
-    if r.returncode != 0:
-        return None
-    m = re.search(r"MainPID=(\d+)", r.stdout)
-    if m:
-        pid = int(m.group(1))
+def _get_main_pid(unit, ctx: CollectionContext):
+    """Get MainPID from the unit properties. Returns None if service isn't running."""
+    value = ctx.unit_properties(unit).get("MainPID", "")
+    if value.isdigit():
+        pid = int(value)
         return pid if pid > 0 else None
     return None
 
@@ -28,25 +26,121 @@ def _get_main_pid(unit):
 # on hardened kernels with hidepid=2 - haven't tested that yet.
 def _read_proc_file(pid, filename):
     """Read a /proc file. Returns error string if it fails."""
-    # FIXME: racey - process could die between PID check and here
+    # FIXME: racey - process could die between PID check and here.
+    # `toolkit watch` shrinks the window (collects on the first crash event)
+    # but can't close it
     proc_path = Path(f"/proc/{pid}/{filename}")
     try:
         return proc_path.read_text(encoding="utf-8", errors="replace")
     except PermissionError:
-        return f"[Permission denied - need root?]"
+        return "[Permission denied - need root?]"
     except FileNotFoundError:
         return f"[Process {pid} gone]"
     except Exception as e:
         return f"[Error: {e}]"
 
 
-def collect_process(out_dir: Path, unit: str):
-    """Grab process info for the service's MainPID.
+def _unit_pids(unit: str, main_pid: int | None, ctx: CollectionContext) -> tuple:
+    """(cgroup, every pid in it). Falls back to just MainPID without a readable cgroup."""
+    cgroup = ctx.unit_properties(unit).get("ControlGroup", "")
+    pids = procfs.cgroup_pids(cgroup) if cgroup else []
+    if not pids and main_pid is not None:
+        pids = [main_pid]
+    return cgroup, pids
+
+
+def _sample_pids(cgroup: str, rows: List[Dict[str, Any]]):
+    """Pid lister for the sampler - busiest so far first (so sample_max_pids
+    drops the idle ones), then anything forked since the snapshot."""
+    ranked = [r["pid"] for r in sorted(rows, key=lambda r: r["cpu_sec"], reverse=True)]
+
+    def _list() -> List[int]:
+        if not cgroup:
+            return ranked
+        live = set(procfs.cgroup_pids(cgroup))
+        return [p for p in ranked if p in live] + sorted(live.difference(ranked))
+    return _list
 
-    Gets ps output, /proc limits, status, fd count. Useful for debugging
-    resource exhaustion, fd leaks, that kind of thing.
+
+def _start_sampler(options: Dict[str, Any], cgroup: str, rows, ctx: CollectionContext):
+    hz = float(options.get("sample_hz", 10) or 0)
+    window = float(options.get("sample_sec", 5) or 0)
+    left = ctx.engine.remaining()
+    if left is not None:
+        window = min(window, left - 1)  # leave time to write it out before the deadline
+    if hz <= 0 or window <= 0 or not rows:
+        return None
+    return procsample.ProcSampler(_sample_pids(cgroup, rows), interval_sec=1 / hz,
+                                  window_sec=window,
+                                  max_pids=int(options.get("sample_max_pids", 200))).start()
+
+
+def _write_samples(out_dir: Path, sampler: procsample.ProcSampler, rows, total: int) -> None:
+    sampler.join()  # in the background - see _finish_samples
+    rates = sampler.rates()
+    comm = {r["pid"]: r["comm"] for r in rows}
+    info = sampler.summary()
+    info["processes"] = total
+    info["sampled"] = len(rates)
+    write_text(
+        out_dir / "process/rates.txt",
+        f"# {info['window_sec']}s at {info['achieved_hz']} Hz, {len(rates)} of {total} processes "
+        f"(busiest by CPU time first). %CPU is over the window, MAX the busiest interval\n\n"
+        + procsample.format_rates(rates, comm),
+    )
+    write_json(out_dir / "process/rates.json", dict(info, rates=rates), indent=None)
+    write_text(out_dir / "process/samples.csv", sampler.csv())
+
+
+def _finish_samples(out_dir: Path, sampler, rows, total: int, ctx: CollectionContext) -> None:
+    """Let the sampler run out after we return - the snapshot files get
+    bundled right away, rates/samples follow when the window is over."""
+    if sampler is not None:
+        ctx.in_background(out_dir, lambda d: _write_samples(d, sampler, rows, total),
+                          stop=sampler.stop)
+
+
+def collect_process(out_dir: Path, unit: str, options: Dict[str, Any] | None = None,
+                    ctx: CollectionContext | None = None):
+    """Grab process info for everything in the service's cgroup.
+
+    processes.txt/.json: one row per process (stat, status, io,
+    smaps_rollup, fd count), biggest RSS first - see core/proctable.py.
+    rates.txt/.json, samples.csv: CPU, I/O, fd and thread rates from a few
+    seconds of sampling (collector_options.process.sample_*, see
+    core/procsample.py) - finished in the background, so the snapshot
+    isn't held back by the sampling window. fds.txt/.json with
+    include_fd_list: every open fd classified, sockets resolved
+    (core/fdlist.py). snapshot.txt: /proc limits, status and fd count for
+    MainPID. Useful for debugging resource exhaustion, fd leaks, that kind
+    of thing.
     """
-    pid = _get_main_pid(unit)
+    ctx = ctx or CollectionContext()
+    options = options or {}
+    pid = _get_main_pid(unit, ctx)
+    cgroup, pids = _unit_pids(unit, pid, ctx)
+    ts = datetime.now(timezone.utc).isoformat()
+
+    table = proctable.snapshot(pids)
+    rows = table.pop("rows")
+    # Samples while the rest of this (and the other collectors) get written
+    sampler = _start_sampler(options, cgroup, rows, ctx)
+    write_text(
+        out_dir / "process/processes.txt",
+        f"# {table['count']} processes in {cgroup or unit} (main PID {pid or '-'})\n"
+        f"# Captured: {ts}  (%CPU is the average over each process's life, like ps)\n\n"
+        + proctable.format_table(rows),
+    )
+    write_json(out_dir / "process/processes.json",
+               dict(table, unit=unit, cgroup=cgroup, main_pid=pid, captured=ts,
+                    **proctable.to_columns(rows)),
+               indent=None)
+
+    if options.get("include_fd_list", False):
+        inv = fdlist.inventory([r["pid"] for r in rows],
+                               max_list=int(options.get("fd_list_max", 5000)))
+        write_text(out_dir / "process/fds.txt", fdlist.format_inventory(inv))
+        write_json(out_dir / "process/fds.json", inv, indent=None)
 
     if pid is None:
         write_text(
@@ -54,23 +148,19 @@ def collect_process(out_dir: Path, unit: str):
             f"No MainPID for {unit} - stopped or Type=oneshot?\n"
         )
         print(f"Note: No MainPID for '{unit}'", file=sys.stderr)
+        _finish_samples(out_dir, sampler, rows, table["count"], ctx)
         return
 
-    ts = datetime.now(timezone.utc).isoformat()
-
     lines = [
-        f"# Process snapshot for {unit} (PID {pid})",
-        f"# Captured: {ts}",
-        f"# Warning: data might be inconsistent if process restarted mid-collection\n",
+        f"# Process snapshot for {unit} (PID {pid})\n",
+        f"# Captured: {ts}\n",
+        "# Warning: data might be inconsistent if process restarted mid-collection\n\n",
     ]
 
-    # ps - basic info
-    ps_r = run_cmd(
-        ["ps", "-p", str(pid), "-o", "pid,ppid,user,%cpu,%mem,vsz,rss,stat,start,time,cmd"],
-        timeout_sec=5,
-    )
-    lines.append("## ps\n")
-    lines.append(ps_r.stdout or ps_r.stderr or "[failed]\n")
+    # Main PID's row - the rest of the cgroup is in processes.txt
+    main = [r for r in rows if r["pid"] == pid]
+    lines.append("## process\n")
+    lines.append(proctable.format_table(main, cmd_width=200) if main else "[process gone]\n")
     lines.append("\n")
 
     # /proc limits - for debugging "too many open files" etc
@@ -85,7 +175,7 @@ def collect_process(out_dir: Path, unit: str):
 
     # fd count - just the count, listing all would be huge
     try:
-        fd_count = len(list(Path(f"/proc/{pid}/fd").iterdir()))
+        fd_count = procfs.pid_fd_count(pid)
         lines.append(f"## Open fds: {fd_count}\n")
     except PermissionError:
         lines.append("## Open fds: [need root]\n")
@@ -93,3 +183,4 @@ def collect_process(out_dir: Path, unit: str):
         lines.append("## Open fds: [process gone]\n")
 
     write_text(out_dir / "process/snapshot.txt", "".join(lines))
+    _finish_samples(out_dir, sampler, rows, table["count"], ctx)
@@ -0,0 +1,54 @@
+"""Flight recorder history - what the box looked like before collect was run."""
+
+from __future__ import annotations
+
+import csv
+import io
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict
+
+from toolkit.core import recorder
+from toolkit.core.bundle import write_json, write_text
+from toolkit.core.context import CollectionContext
+
+
+def _csv(fields, rows) -> str:
+    buf = io.StringIO()
+    w = csv.writer(buf, lineterminator="\n")
+    w.writerow(fields)
+    for row in rows:
+        # ts as ISO so it lines up with journald.txt
+        ts = datetime.fromtimestamp(row[0], timezone.utc).isoformat(timespec="milliseconds")
+        w.writerow([ts] + ["" if v is None else v for v in row[1:]])
+    return buf.getvalue()
+
+
+def collect_recorder(out_dir: Path, socket_path: Path, minutes: float = 10,
+                     ctx: CollectionContext | None = None):
+    """Pull the last `minutes` of samples from a running `toolkit record`.
+
+    No recorder running is normal (it's opt-in) - nothing gets written
+    except a note in meta.json.
+    """
+    ctx = ctx or CollectionContext()
+    hist = recorder.fetch(socket_path, minutes)
+    if hist is None:
+        ctx.add_meta("recorder", {"available": False, "socket": str(socket_path)})
+        return
+
+    host = hist.pop("host")
+    units: Dict[str, Any] = hist.pop("units")
+    write_text(out_dir / "recorder/host.csv", _csv(host["fields"], host["rows"]))
+    for unit, data in units.items():
+        write_text(out_dir / f"recorder/units/{unit}.csv", _csv(data["fields"], data["rows"]))
+
+    info = dict(hist, available=True, minutes=minutes, rows=len(host["rows"]),
+                units={u: {"cgroup": d["cgroup"], "rows": len(d["rows"])}
+                       for u, d in units.items()})
+    write_json(out_dir / "recorder/recorder.json", info)
+    ctx.add_meta("recorder", info)
+    if hist.get("unreadable"):
+        print(f"Note: recorder couldn't read {', '.join(hist['unreadable'])} - run it as root",
+              file=sys.stderr)
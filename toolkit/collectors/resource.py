@@ -2,47 +2,269 @@
 
 from __future__ import annotations
 
+import os
+import socket
+import time
+from datetime import datetime
 from pathlib import Path
+from typing import Any, Dict
 
-from toolkit.core.runner import run_cmd
-from toolkit.core.bundle import write_text
+from toolkit.core import hostsample, procfs, socktable
+from toolkit.core.bundle import write_json, write_text
+from toolkit.core.context import CollectionContext
+from toolkit.core.engine import CommandEngine
 
+# /proc/vmstat counters worth a glance during an incident
+_VMSTAT_KEYS = [
+    "pgmajfault", "pswpin", "pswpout", "oom_kill",
+    "allocstall_normal", "compact_stall", "thp_fault_fallback",
+]
 
-def _capture(out_dir: Path, rel: str, cmd: list, timeout: int = 8):
-    """Run cmd, dump output to file."""
-    r = run_cmd(cmd, timeout_sec=timeout)
-    write_text(out_dir / rel, r.stdout + "\n\n" + r.stderr)
 
+# Time the sampler's reads take, on top of the interval schedule (a read is ~1ms)
+_READ_ALLOWANCE_SEC = 0.1
 
-def collect_resource(out_dir: Path):
-    """Grab basic system info - memory, disk, network.
 
-    Nothing fancy, just the stuff you'd run manually when SSH'd in.
-    """
+def _capture(engine: CommandEngine, out_dir: Path, rel: str, cmd: list, timeout: int = 8):
+    """Queue cmd, output streams to file. Returns the future."""
+    return engine.submit(cmd, out_dir / rel, timeout_sec=timeout)
+
+
+def _fmt_uptime(sec: float) -> str:
+    days, rem = divmod(int(sec), 86400)
+    hours, rem = divmod(rem, 3600)
+    mins = rem // 60
+    return f"{days} days, {hours:02d}:{mins:02d}" if days else f"{hours:02d}:{mins:02d}"
+
+
+def _host_info() -> tuple[str, Dict[str, Any]]:
+    u = os.uname()
+    data: Dict[str, Any] = {
+        "date": datetime.now().astimezone().isoformat(timespec="seconds"),
+        "hostname": socket.gethostname(),
+        "uname": {
+            "sysname": u.sysname, "release": u.release,
+            "version": u.version, "machine": u.machine,
+        },
+    }
+    lines = [
+        data["date"],
+        data["hostname"],
+        f"{u.sysname} {u.nodename} {u.release} {u.version} {u.machine}",
+    ]
+    try:
+        up = procfs.read_uptime()
+        load = procfs.read_loadavg()
+        data["uptime_sec"] = up
+        data["load"] = load
+        lines.append(
+            f"up {_fmt_uptime(up)}, load average: "
+            f"{load['load1']:.2f}, {load['load5']:.2f}, {load['load15']:.2f} "
+            f"({load['running']}/{load['tasks']} tasks)"
+        )
+    except (OSError, ValueError, IndexError) as e:
+        lines.append(f"[uptime/loadavg unavailable: {e}]")
+    return "\n".join(lines) + "\n", data
+
+
+def _mem_info() -> tuple[str, Dict[str, Any]]:
+    mi = procfs.read_meminfo()
+    total = mi.get("MemTotal", 0)
+    free = mi.get("MemFree", 0)
+    buff_cache = mi.get("Buffers", 0) + mi.get("Cached", 0) + mi.get("SReclaimable", 0)
+    # Same arithmetic as procps `free`
+    used = max(0, total - free - buff_cache)
+    avail = mi.get("MemAvailable", free)
+    swap_total = mi.get("SwapTotal", 0)
+    swap_free = mi.get("SwapFree", 0)
+
+    data: Dict[str, Any] = {
+        "total": total, "used": used, "free": free, "shared": mi.get("Shmem", 0),
+        "buff_cache": buff_cache, "available": avail,
+        "swap_total": swap_total, "swap_used": swap_total - swap_free, "swap_free": swap_free,
+        "meminfo": mi,
+    }
+
+    h = procfs.human_bytes
+    lines = [
+        f"{'':8}{'total':>12}{'used':>12}{'free':>12}{'shared':>12}{'buff/cache':>12}{'available':>12}",
+        f"{'Mem:':8}{h(total):>12}{h(used):>12}{h(free):>12}{h(data['shared']):>12}"
+        f"{h(buff_cache):>12}{h(avail):>12}",
+        f"{'Swap:':8}{h(swap_total):>12}{h(swap_total - swap_free):>12}{h(swap_free):>12}",
+        "",
+        "# Dirty / writeback",
+        f"Dirty: {h(mi.get('Dirty', 0))}  Writeback: {h(mi.get('Writeback', 0))}",
+    ]
+
+    try:
+        vm = procfs.read_vmstat()
+        data["vmstat"] = {k: vm[k] for k in _VMSTAT_KEYS if k in vm}
+        lines += ["", "# /proc/vmstat counters (since boot)"]
+        lines += [f"{k:<20} {v}" for k, v in data["vmstat"].items()]
+    except OSError as e:
+        lines.append(f"[/proc/vmstat unavailable: {e}]")
+
+    return "\n".join(lines) + "\n", data
+
+
+def _disk_info() -> tuple[str, Dict[str, Any]]:
+    h = procfs.human_bytes
+    filesystems = procfs.filesystem_usage(procfs.read_mounts())
+    lines = [f"{'Filesystem':<32}{'Type':<10}{'Size':>8}{'Used':>8}{'Avail':>8}{'Use%':>6}"
+             "  Mounted on"]
+    for fs in filesystems:
+        if "size" not in fs:
+            note = fs.get("skipped") or fs.get("error", "")
+            lines.append(f"{fs['device']:<32}{fs['fstype']:<10}{'-':>8}{'-':>8}{'-':>8}{'-':>6}"
+                         f"  {fs['mountpoint']}  [{note}]")
+            continue
+        denom = fs["used"] + fs["avail"]
+        pct = -(-fs["used"] * 100 // denom) if denom else 0  # df rounds up
+        lines.append(f"{fs['device']:<32}{fs['fstype']:<10}{h(fs['size']):>8}{h(fs['used']):>8}"
+                     f"{h(fs['avail']):>8}{pct:>5}%  {fs['mountpoint']}")
+
+    devices = procfs.block_devices()
+    lines += ["", f"{'NAME':<16}{'SIZE':>8}{'RO':>4}  {'TYPE':<6}{'ROTA':>5}  MODEL"]
+    for d in devices:
+        lines.append(f"{d['name']:<16}{h(d['size']):>8}{int(d['ro']):>4}  {'disk':<6}"
+                     f"{int(d['rotational']):>5}  {d['model']}")
+        for p in d["partitions"]:
+            lines.append(f"`-{p['name']:<14}{h(p['size']):>8}{int(p['ro']):>4}  {'part':<6}")
+
+    return "\n".join(lines) + "\n", {"filesystems": filesystems, "block_devices": devices}
+
+
+def _start_host_sampler(options: Dict[str, Any], engine: CommandEngine):
+    samples = int(options.get("vmstat_samples", 5) or 0)
+    interval = float(options.get("vmstat_interval_sec", 1.0) or 1.0)
+    left = engine.remaining()
+    if left is not None:
+        # Reads are on a fixed schedule, so the last one starts samples *
+        # interval in and the sampler is done once it's read. Leave a second
+        # to write it out, plus the reads' own time
+        samples = min(samples, int((left - 1 - _READ_ALLOWANCE_SEC) / interval))
+    if samples <= 0:
+        return None
+    return hostsample.HostSampler(samples, interval).start()
+
+
+def _write_host_samples(out_dir: Path, sampler: hostsample.HostSampler) -> None:
+    sampler.join()  # in the background - see _collect_native
+    info = sampler.summary()
+    rows, cpus = sampler.vmstat(), sampler.cpu_util()
+    disks, nics = sampler.disk_rates(), sampler.nic_rates()
+    head = f"# {info['samples']} x {info['interval_sec']}s from /proc (no since-boot row)\n"
+    if info["errors"]:
+        head += "".join(f"# [unreadable: {e}]\n" for e in info["errors"])
+    write_text(out_dir / "resource/vmstat.txt", head + "\n" + hostsample.format_vmstat(rows, cpus))
+    write_text(out_dir / "resource/iostat.txt",
+               f"# averages over {info['window_sec']}s, max = busiest interval\n\n"
+               + hostsample.format_iostat(disks, nics))
+    write_json(out_dir / "resource/vmstat.json",
+               dict(info, vmstat=rows, cpus=cpus, disks=disks, nics=nics))
+
+
+def _collect_native(out_dir: Path, ctx: CollectionContext, options: Dict[str, Any]) -> None:
+    """Host/mem/disk/sockets from /proc and /sys, no forks. Interfaces and routes still need ip."""
+    engine = ctx.engine
+    # vmstat/iostat samples on their own thread while the rest is read
+    sampler = _start_host_sampler(options, engine)
+    # Network - no login shell, each tool on its own so one hanging doesn't
+    # take the others down with it
+    net_cmds = [["ip", "a"], ["ip", "r"]]
+    net = [engine.submit(c, timeout_sec=10) for c in net_cmds]
+
+    started = time.monotonic()
+    structured: Dict[str, Any] = {}
+    for rel, key, fn in (
+        ("resource/host.txt", "host", _host_info),
+        ("resource/mem.txt", "memory", _mem_info),
+        ("resource/disk.txt", "disk", _disk_info),
+    ):
+        try:
+            text, data = fn()
+        except (OSError, ValueError) as e:
+            text, data = f"[Error reading {key} info: {e}]\n", {"error": str(e)}
+        write_text(out_dir / rel, text)
+        structured[key] = data
+    structured["native_read_ms"] = round((time.monotonic() - started) * 1000, 2)
+    write_json(out_dir / "resource/resource.json", structured)
+
+    # Instead of ss -tulpn - see core/socktable.py
+    try:
+        socks = socktable.summarize(top_n=int(options.get("sockets_top", socktable.TOP_N)))
+        write_text(out_dir / "resource/sockets.txt", socktable.format_summary(socks))
+        write_json(out_dir / "resource/sockets.json", socks)
+    except (OSError, ValueError) as e:
+        write_text(out_dir / "resource/sockets.txt", f"[Error reading socket tables: {e}]\n")
+
+    parts = []
+    for f in net:
+        r = f.result()
+        parts.append(f"$ {' '.join(r.cmd)}\n{r.stdout}{r.stderr}")
+    write_text(out_dir / "resource/net.txt", "\n".join(parts))
+
+    # Return now so the one-shot files above get bundled while they're
+    # fresh - vmstat.txt/iostat.txt follow when the sampler is done
+    if sampler is not None:
+        ctx.in_background(out_dir, lambda d, s=sampler: _write_host_samples(d, s),
+                          stop=sampler.stop)
+
+
+def _collect_commands(out_dir: Path, engine: CommandEngine, options: Dict[str, Any]) -> None:
+    """The old way - shell out for everything. Here for boxes where /proc is odd."""
+    pending = []
+
     # Host info - date is important for correlating with logs later
-    _capture(
-        out_dir, "resource/host.txt",
+    pending.append(_capture(
+        engine, out_dir, "resource/host.txt",
         ["bash", "-lc", "date -Is; hostname; uname -a; uptime"],
         timeout=5,
-    )
+    ))
 
     # Memory - free for current state, vmstat for recent history
-    _capture(
-        out_dir, "resource/mem.txt",
-        ["bash", "-lc", "free -h; echo; vmstat 1 5"],
-        timeout=10,
-    )
+    samples = max(1, int(options.get("vmstat_samples", 5) or 1))
+    interval = max(1, round(float(options.get("vmstat_interval_sec", 1.0) or 1)))
+    pending.append(_capture(
+        engine, out_dir, "resource/mem.txt",
+        ["bash", "-lc", f"free -h; echo; vmstat {interval} {samples}"],
+        timeout=samples * interval + 5,
+    ))
 
     # Disk
-    _capture(
-        out_dir, "resource/disk.txt",
+    pending.append(_capture(
+        engine, out_dir, "resource/disk.txt",
         ["bash", "-lc", "df -h; echo; lsblk"],
         timeout=10,
-    )
+    ))
 
     # Network - ss needs root for process names but partial output is fine
-    _capture(
-        out_dir, "resource/net.txt",
+    pending.append(_capture(
+        engine, out_dir, "resource/net.txt",
         ["bash", "-lc", "ip a; echo; ip r; echo; ss -tulpn"],
         timeout=10,
-    )
+    ))
+
+    for f in pending:
+        f.result()
+
+
+def collect_resource(out_dir: Path, options: Dict[str, Any] | None = None,
+                     ctx: CollectionContext | None = None):
+    """Grab basic system info - memory, disk, network.
+
+    Nothing fancy, just the stuff you'd run manually when SSH'd in.
+    By default host/mem/disk come straight from /proc and /sys (plus a
+    resource.json with the same data structured), and vmstat.txt/
+    iostat.txt come from vmstat_samples reads of /proc counters taken in
+    the background (core/hostsample.py). sockets.txt/.json summarize
+    every TCP/UDP socket by state, port and remote network
+    (core/socktable.py) in place of ss -tulpn. Set
+    collector_options.resource.backend: commands to shell out instead.
+    """
+    ctx = ctx or CollectionContext()
+    options = options or {}
+    if options.get("backend", "native") == "commands":
+        _collect_commands(out_dir, ctx.engine, options)
+    else:
+        _collect_native(out_dir, ctx, options)
@@ -5,24 +5,31 @@ from __future__ import annotations
 import sys
 from pathlib import Path
 
-from toolkit.core.runner import run_cmd
 from toolkit.core.bundle import write_text
+from toolkit.core.context import CollectionContext
 
 
-def collect_systemd(out_dir: Path, unit: str):
+def collect_systemd(out_dir: Path, unit: str, ctx: CollectionContext | None = None):
     """Grab systemd info for a unit - status, properties, unit file."""
+    ctx = ctx or CollectionContext()
+    engine = ctx.engine
+
+    # None of these depend on each other, so fire them all off at once
 
     # status - first thing everyone looks at
-    r = run_cmd(["systemctl", "status", unit, "--no-pager"], timeout_sec=8)
-    if r.returncode == 4:
+    status = engine.submit(
+        ["systemctl", "status", unit, "--no-pager"], out_dir / "systemd/status.txt", timeout_sec=8
+    )
+    # cat - the actual unit file (sometimes different from what you think)
+    cat = engine.submit(["systemctl", "cat", unit], out_dir / "systemd/unit.txt", timeout_sec=8)
+
+    if status.result().returncode == 4:
         # Common mistake: forgetting .service suffix
         print(f"Warning: '{unit}' not found. Did you forget .service?", file=sys.stderr)
-    write_text(out_dir / "systemd/status.txt", r.stdout + "\n\n" + r.stderr)
 
-    # show - all properties, good for debugging restart loops
-    r = run_cmd(["systemctl", "show", unit], timeout_sec=8)
-    write_text(out_dir / "systemd/show.txt", r.stdout + "\n\n" + r.stderr)
+    # show - all properties, good for debugging restart loops. Shared with
+    # the other collectors through the context, so it's one D-Bus call per run
+    show = ctx.unit_show(unit)
+    write_text(out_dir / "systemd/show.txt", show.stdout + "\n\n" + show.stderr)
 
-    # cat - the actual unit file (sometimes different from what you think)
-    r = run_cmd(["systemctl", "cat", unit], timeout_sec=8)
-    write_text(out_dir / "systemd/unit.txt", r.stdout + "\n\n" + r.stderr)
+    cat.result()
@@ -1,24 +1,32 @@
-"""Core utilities for the toolkit."""
+"""Core utilities for the toolkit.
 
-from toolkit.core.runner import CmdResult, run_cmd
-from toolkit.core.bundle import (
-    make_bundle_dir,
-    write_text,
-    write_json,
-    tar_gz,
-    utc_stamp,
-)
-from toolkit.core.config import load_config, deep_merge, DEFAULTS
+Names below are loaded on first access - importing one core module (say
+toolkit.core.procfs) shouldn't drag in asyncio, yaml and the compressors.
+"""
 
-__all__ = [
-    "CmdResult",
-    "run_cmd",
-    "make_bundle_dir",
-    "write_text",
-    "write_json",
-    "tar_gz",
-    "utc_stamp",
-    "load_config",
-    "deep_merge",
-    "DEFAULTS",
-]
+from __future__ import annotations
+
+import importlib
+
+_EXPORTS = {
+    "CmdResult": "toolkit.core.runner",
+    "run_cmd": "toolkit.core.runner",
+    "run_cmd_to_file": "toolkit.core.runner",
+    "make_bundle_dir": "toolkit.core.bundle",
+    "write_text": "toolkit.core.bundle",
+    "write_json": "toolkit.core.bundle",
+    "tar_gz": "toolkit.core.bundle",
+    "utc_stamp": "toolkit.core.bundle",
+    "load_config": "toolkit.core.config",
+    "deep_merge": "toolkit.core.config",
+    "DEFAULTS": "toolkit.core.config",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(module), name)
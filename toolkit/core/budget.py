@@ -0,0 +1,150 @@
+"""Bundle size budget, shared out across collectors.
+
+Size used to be controlled by logs.lines plus a fixed cap per command,
+so how big a bundle got depended on how chatty the box was that day.
+With output.max_bundle_mb set, the budget (uncompressed bytes) is split
+between the collectors in the run by weight. When a collector finishes,
+whatever it didn't use goes into a shared pool, and collectors that
+finish later can draw on it - journald is usually last and usually the
+one that needs it.
+
+A collector over its allowance gets its biggest text files cut from the
+front - keeping the newest lines - until it fits. JSON and other
+structured files are never cut (half a JSON document is useless).
+Every cut is recorded for meta.json.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List
+
+# Logs are most of the bundle and most of what people read
+DEFAULT_WEIGHTS = {
+    "journald": 6,
+    "process": 2,
+    "cgroup": 1,
+    "resource": 1,
+    "systemd": 1,
+    "hardening": 1,
+    "recorder": 1,
+}
+
+# Files we know how to cut (line-oriented text)
+TRUNCATABLE = (".txt", ".log")
+
+# Don't bother leaving less than this of a file
+MIN_KEEP_BYTES = 4096
+
+_MARKER = "[... {n} bytes of older output dropped to fit the bundle size budget ...]\n"
+
+
+def tail_truncate(path: Path, keep_bytes: int) -> int:
+    """Rewrite path keeping roughly its last keep_bytes, from a line start.
+
+    Returns the new size (including the one-line marker at the top).
+    """
+    size = path.stat().st_size
+    if size <= keep_bytes:
+        return size
+    with open(path, "rb") as f:
+        f.seek(size - keep_bytes)
+        data = f.read()
+    nl = data.find(b"\n")
+    if 0 <= nl < len(data) - 1:
+        data = data[nl + 1:]
+    marker = _MARKER.format(n=size - len(data)).encode()
+    tmp = path.with_name(f"{path.name}.trunc")
+    with open(tmp, "wb") as f:
+        f.write(marker)
+        f.write(data)
+    os.replace(tmp, path)
+    return len(marker) + len(data)
+
+
+class BudgetGovernor:
+    """Splits total_bytes across collectors by weight; unused share is pooled."""
+
+    def __init__(self, total_bytes: int, collectors: List[str],
+                 weights: Dict[str, float] | None = None):
+        w = dict(DEFAULT_WEIGHTS)
+        w.update(weights or {})
+        self.total = int(total_bytes)
+        # "nginx/journald" in multi-service runs weighs like "journald"
+        self.weights = {c: float(w.get(c, w.get(c.rsplit("/", 1)[-1], 1))) for c in collectors}
+        wsum = sum(self.weights.values()) or 1.0
+        self.shares = {c: int(self.total * self.weights[c] / wsum) for c in collectors}
+        self.pool = 0
+        self.settled: Dict[str, Dict[str, Any]] = {}
+        self.truncations: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def settle(self, name: str, spool: Path) -> Dict[str, Any]:
+        """Fit a finished collector's output into its share plus the pool.
+
+        Call once per collector, before its files are archived.
+        """
+        files = [p for p in spool.rglob("*") if p.is_file()] if spool.exists() else []
+        sizes = {p: p.stat().st_size for p in files}
+        want = sum(sizes.values())
+        with self._lock:
+            avail = max(0, self.shares.get(name, 0) + self.pool)
+            grant = min(want, avail)
+            # What it didn't need goes back for the collectors still running
+            # (or, if the pool was in debt, the debt shrinks by its share)
+            self.pool = self.shares.get(name, 0) + self.pool - grant
+
+        used = want
+        if want > grant:
+            used = self._shrink(name, spool, sizes, want - grant)
+            if used > grant:
+                # Couldn't cut enough (structured files, small files) - the
+                # overshoot is owed by whoever finishes later
+                with self._lock:
+                    self.pool -= used - grant
+
+        info = {"share": self.shares.get(name, 0), "granted": grant,
+                "wanted": want, "used": used}
+        with self._lock:
+            self.settled[name] = info
+        return info
+
+    def _shrink(self, name: str, spool: Path, sizes: Dict[Path, int], excess: int) -> int:
+        total = sum(sizes.values())
+        candidates = sorted((p for p in sizes if p.suffix in TRUNCATABLE),
+                            key=lambda p: sizes[p], reverse=True)
+        for path in candidates:
+            if excess <= 0:
+                break
+            size = sizes[path]
+            keep = max(MIN_KEEP_BYTES, size - excess)
+            if keep >= size:
+                continue
+            try:
+                new_size = tail_truncate(path, keep)
+            except OSError:
+                continue
+            excess -= size - new_size
+            total -= size - new_size
+            with self._lock:
+                self.truncations.append({
+                    "collector": name,
+                    "path": path.relative_to(spool).as_posix(),
+                    "kept": "newest",
+                    "original_bytes": size,
+                    "kept_bytes": new_size,
+                    "reason": "bundle size budget",
+                })
+        return total
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_bytes": self.total,
+                "weights": self.weights,
+                "collectors": dict(self.settled),
+                "unused_bytes": max(0, self.pool),
+                "over_budget_bytes": max(0, -self.pool),
+            }
@@ -2,23 +2,26 @@
 
 from __future__ import annotations
 
+import contextlib
+import io
 import json
-import re
+import os
+import queue
 import shutil
 import tarfile
+import threading
+import time
+from collections import Counter
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any, Dict, List
 
-# Regex patterns for redacting secrets
-# TODO: these probably have edge cases I haven't hit yet
-DEFAULT_REDACT_PATTERNS = [
-    r"(?i)(api[_-]?key|apikey)[=:\s]+['\"]?[\w\-]+['\"]?",
-    r"(?i)(secret|password|passwd|pwd)[=:\s]+['\"]?[^\s'\"]+['\"]?",
-    r"(?i)(token|bearer)[=:\s]+['\"]?[\w\-\.]+['\"]?",
-    r"(?i)(aws_secret|aws_access)[=:\s]+['\"]?[\w\-]+['\"]?",
-    r"://[^:]+:[^@]+@",  # basic auth in URLs
-]
+from toolkit.core.compress import BlockCompressor
+from toolkit.core.redact import (  # noqa: F401
+    DEFAULT_REDACT_PATTERNS,
+    get_redactor,
+    redact_parallel,
+)
 
 
 def utc_stamp() -> str:
@@ -41,47 +44,28 @@ def check_disk_space(path: str, min_mb: int = 500) -> tuple[bool, int]:
 def redact_text(
     text: str,
     patterns: List[str] | None = None,
-    whitelist: List[str] | None = None
+    whitelist: List[str] | None = None,
+    stats: Counter | None = None,
 ) -> str:
     """Redact sensitive data from text using regex patterns.
 
     Args:
         text: Input text to redact
         patterns: Extra patterns to redact (on top of defaults)
-        whitelist: Patterns to restore after redaction (false positive protection)
+        whitelist: Patterns to leave alone even if a redact pattern hits them
+            (false positive protection, e.g. "password_hash_algorithm=sha256")
+        stats: Optional Counter, gets per-pattern hit counts added to it
 
     Not bulletproof - always review output before sharing.
     """
-    all_patterns = DEFAULT_REDACT_PATTERNS + (patterns or [])
-    result = text
+    return get_redactor(patterns, whitelist).redact(text, stats)
 
-    # First pass: redact everything matching patterns
-    for pattern in all_patterns:
-        try:
-            result = re.sub(pattern, "***REDACTED***", result)
-        except re.error:
-            continue
-
-    # Second pass: restore whitelisted terms that got caught
-    # Use case: "password_hash_algorithm=sha256" shouldn't be redacted
-    if whitelist:
-        for wl_pattern in whitelist:
-            try:
-                # Find in original, restore in result
-                for match in re.finditer(wl_pattern, text):
-                    original = match.group(0)
-                    result = result.replace("***REDACTED***", original, 1)
-            except re.error:
-                continue
 
-    return result
-
-
-def make_bundle_dir(artifacts_dir: str, service_name: str) -> Path:
+def make_bundle_dir(artifacts_dir: str, service_name: str, incident_id: str | None = None) -> Path:
     """Create a new bundle directory."""
     base = Path(artifacts_dir).expanduser()
     base.mkdir(parents=True, exist_ok=True)
-    incident_id = f"{utc_stamp()}-{service_name}"
+    incident_id = incident_id or f"{utc_stamp()}-{service_name}"
     p = base / incident_id
     p.mkdir(parents=True, exist_ok=False)
     return p
@@ -101,15 +85,228 @@ def write_text(
     path.write_text(text, encoding="utf-8", errors="replace")
 
 
-def write_json(path: Path, obj: Dict[str, Any]) -> None:
-    """Write JSON to a file."""
+def redact_file(
+    path: Path,
+    patterns: List[str] | None = None,
+    whitelist: List[str] | None = None,
+    stats: Counter | None = None,
+    workers: int | None = 1,
+) -> None:
+    """Redact a file in place (for output that was streamed straight to disk).
+
+    workers > 1 (or 0 for auto) splits big files across processes - same
+    output as serial, just uses more than one core.
+    """
+    text = path.read_text(encoding="utf-8", errors="replace")
+    text = redact_parallel(text, patterns, whitelist, workers, stats)
+    path.write_text(text, encoding="utf-8", errors="replace")
+
+
+def write_json(path: Path, obj: Dict[str, Any], indent: int | None = 2) -> None:
+    """Write JSON to a file. indent=None for compact output (big indexes)."""
     path.parent.mkdir(parents=True, exist_ok=True)
     path.write_text(
-        json.dumps(obj, indent=2, ensure_ascii=False),
+        json.dumps(obj, indent=indent, ensure_ascii=False),
         encoding="utf-8",
     )
 
 
+def make_spool_dir(artifacts_dir: str, incident_id: str, output: Path | None = None) -> Path:
+    """Scratch space for a bundle in progress: <artifacts_dir>/.<id>.spool
+
+    Collectors write here, the BundleWriter moves files into the tarball
+    as each collector finishes. Fails (FileExistsError) if the bundle id is
+    already taken - `output` is where the bundle will end up (.tar.xz,
+    a store manifest...), <id>.tar.gz if not given.
+    """
+    base = Path(artifacts_dir).expanduser()
+    base.mkdir(parents=True, exist_ok=True)
+    output = output or base / f"{incident_id}.tar.gz"
+    if output.exists():
+        raise FileExistsError(f"bundle {incident_id} already exists ({output})")
+    p = base / f".{incident_id}.spool"
+    p.mkdir(exist_ok=False)
+    return p
+
+
+class BundleWriter:
+    """Appends files to the bundle tarball as collectors finish.
+
+    Used to be: every collector writes into the bundle dir, then tar_gz
+    reads the whole tree back and compresses it, leaving both on disk.
+    Now one thread owns the archive; when a collector returns, its spool
+    dir is handed over and each file is appended and deleted right away.
+    The tarball is written as <name>.partial and renamed on close, so
+    anything matching *.tar.gz is always complete.
+
+    With keep_dir set, files are moved there after archiving instead of
+    deleted (the old on-disk layout). `compression` is a resolved
+    compress.resolve() dict; the default is gzip level 6 on one thread.
+
+    Subclasses (store.StoreWriter) swap the archive by overriding the
+    _open/_archive_*/_flush/_finish hooks and stats().
+
+    Set `tracer` (core/trace.Tracer) before queueing anything to get a
+    span per archive write, flush and the finish.
+    """
+
+    tracer = None
+
+    def __init__(self, tar_path: Path, root: str, keep_dir: Path | None = None,
+                 compression: Dict[str, Any] | None = None):
+        self.tar_path = tar_path
+        self.root = root
+        self.keep_dir = keep_dir
+        self.members = 0
+        self.errors: List[str] = []
+        self._open(compression)
+        self._q: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="bundle-writer", daemon=True)
+        self._thread.start()
+
+    def add_tree(self, spool: Path, prefix: str = "") -> None:
+        """Queue everything under spool, placed under prefix/ in the bundle.
+
+        spool is removed after.
+        """
+        self._q.put(("tree", spool, prefix))
+
+    def add_bytes(self, rel: str, data: bytes) -> None:
+        """Queue an in-memory file (meta.json)."""
+        self._q.put(("bytes", rel, data))
+
+    def sync(self) -> None:
+        """Wait until everything queued so far is compressed and on disk."""
+        done = threading.Event()
+        self._q.put(("sync", done))
+        done.wait()
+
+    def close(self) -> Path:
+        """Flush the queue, finish the archive, return its final path."""
+        self._q.put(None)
+        self._thread.join()
+        with self._span("finish"):
+            return self._finish()
+
+    def stats(self) -> Dict[str, Any]:
+        """Goes into meta.json as "compression" - exact after sync()."""
+        return self.compressor.stats()
+
+    # -- archive hooks --
+
+    def _open(self, compression: Dict[str, Any] | None) -> None:
+        self._partial = self.tar_path.with_name(self.tar_path.name + ".partial")
+        self._raw = open(self._partial, "wb")
+        self.compressor = BlockCompressor(self._raw, **(compression or {}))
+        # Plain tar stream - the compressor does the compressing
+        self._tf = tarfile.open(fileobj=self.compressor, mode="w|")
+        self._dirs: set = set()
+        self._add_dir("")
+
+    def _archive_file(self, path: Path, rel: str) -> None:
+        self._add_dir(os.path.dirname(rel))
+        self._tf.add(path, arcname=f"{self.root}/{rel}", recursive=False)
+
+    def _archive_bytes(self, rel: str, data: bytes) -> None:
+        self._add_dir(os.path.dirname(rel))
+        ti = self._info(f"{self.root}/{rel}", 0o644)
+        ti.size = len(data)
+        self._tf.addfile(ti, io.BytesIO(data))
+
+    def _flush(self) -> None:
+        self.compressor.flush()
+
+    def _finish(self) -> Path:
+        self._tf.close()
+        self.compressor.close()
+        self._raw.close()
+        os.replace(self._partial, self.tar_path)
+        return self.tar_path
+
+    # -- writer thread --
+
+    def _span(self, name: str, **args):
+        if self.tracer is None:
+            return contextlib.nullcontext()
+        return self.tracer.span(name, "bundle", **args)
+
+    def _run(self) -> None:
+        while True:
+            item = self._q.get()
+            if item is None:
+                return
+            if item[0] == "sync":
+                try:
+                    with self._span("flush"):
+                        self._flush()
+                finally:
+                    item[1].set()
+                continue
+            try:
+                if item[0] == "tree":
+                    with self._span("write", spool=item[1].name):
+                        self._write_tree(item[1], item[2])
+                else:
+                    with self._span("write", file=item[1]):
+                        self._write_bytes(item[1], item[2])
+            except Exception as e:  # keep going - one bad file shouldn't lose the bundle
+                self.errors.append(f"{item[1]}: {e}")
+
+    def _add_dir(self, rel: str) -> None:
+        if rel in self._dirs:
+            return
+        parent = os.path.dirname(rel)
+        if rel and parent not in self._dirs:
+            self._add_dir(parent)
+        self._dirs.add(rel)
+        ti = self._info(f"{self.root}/{rel}".rstrip("/"), 0o755)
+        ti.type = tarfile.DIRTYPE
+        self._tf.addfile(ti)
+
+    @staticmethod
+    def _info(name: str, mode: int) -> tarfile.TarInfo:
+        """Header for members that aren't real files - owned by us, like the rest."""
+        ti = tarfile.TarInfo(name)
+        ti.mode = mode
+        ti.mtime = int(time.time())
+        ti.uid, ti.gid = os.getuid(), os.getgid()
+        return ti
+
+    def _write_tree(self, spool: Path, prefix: str = "") -> None:
+        files = sorted(p for p in spool.rglob("*") if p.is_file())
+        for path in files:
+            rel = path.relative_to(spool).as_posix()
+            if prefix:
+                rel = f"{prefix}/{rel}"
+            try:
+                self._archive_file(path, rel)
+                self.members += 1
+            except OSError as e:
+                self.errors.append(f"{rel}: {e}")
+            self._release(path, rel)
+        shutil.rmtree(spool, ignore_errors=True)
+
+    def _write_bytes(self, rel: str, data: bytes) -> None:
+        self._archive_bytes(rel, data)
+        self.members += 1
+        if self.keep_dir is not None:
+            dest = self.keep_dir / rel
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            dest.write_bytes(data)
+
+    def _release(self, path: Path, rel: str) -> None:
+        """Archived - move into keep_dir or drop it."""
+        try:
+            if self.keep_dir is not None:
+                dest = self.keep_dir / rel
+                dest.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(path, dest)
+            else:
+                path.unlink()
+        except OSError:
+            pass
+
+
 def tar_gz(dir_path: Path) -> Path:
     """Create a tar.gz archive of a directory."""
     tar_path = dir_path.with_suffix(".tar.gz")
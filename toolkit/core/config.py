@@ -4,12 +4,19 @@ from __future__ import annotations
 
 from typing import Any, Dict
 
-import yaml
-
 DEFAULTS: Dict[str, Any] = {
     "output": {
         "artifacts_dir": "/var/tmp/incident-bundles",
         "min_disk_mb": 500,  # warn if less than this
+        "compression": {
+            "codec": "gzip",  # gzip | xz | zstd (needs zstandard) | none
+            "level": None,    # number, or "fast" / "best"; None = codec default
+            "threads": 0,     # 0 = one per core, up to 8
+        },
+        "max_bundle_mb": None,  # uncompressed size budget for the whole bundle, e.g. 20
+        "budget_weights": {},   # per-collector share of it, defaults in core/budget.py
+        "seekable": True,  # gzip only: per-file members + index, for `toolkit bundle cat`
+        "store": False,  # dedup store under artifacts_dir/store instead of tarballs
     },
     "logs": {"since": "60 min ago", "lines": 5000},
     "collect": {
@@ -17,22 +24,53 @@ DEFAULTS: Dict[str, Any] = {
         "journald": True,
         "resource": True,
         "process": True,
+        "cgroup": True,    # limits, throttling, OOM kills, PSI for the unit's cgroup
         "hardening": False,
+        "recorder": True,  # history from `toolkit record`, if one is running
+    },
+    "runtime": {
+        "max_concurrency": 8,  # commands in flight at once, across all collectors
+        "deadline_sec": None,  # whole-run budget, e.g. 20 - unfinished commands get killed
+    },
+    "recorder": {
+        "interval_sec": 1.0,  # `toolkit record` sample interval
+        "history_min": 30,    # how much history it keeps in memory
+        "bundle_min": 10,     # how much of it goes into each bundle
+        "socket": None,       # default: <artifacts_dir>/.recorder.sock
+    },
+    "watch": {
+        "debounce_sec": 60,      # after a collection, more events for the unit just get noted
+        "max_per_hour": 6,       # collections per unit
+        "restart_burst": 3,      # this many automatic restarts...
+        "burst_window_sec": 60,  # ...within this window count as a restart loop
+        "poll_sec": 2,           # --poll mode only
     },
     "redact": {
-        "enabled": False,  # opt-in, can slow things down
+        "enabled": False,  # opt-in (cheap now - prefiltered, one pass)
         "patterns": [],    # extra patterns on top of defaults
         "whitelist": [],   # patterns to NOT redact (false positive protection)
+        "workers": 0,      # processes for big logs; 0 = auto (up to 8, only above 64MB), 1 = serial
     },
     "collector_options": {
         "journald": {
-            "output_format": "short-iso",
+            "output_format": "short-iso",  # journald.txt rendering: short-iso, short, cat, json
+            "incremental": False,  # only pull entries newer than the last bundle's cursor
         },
         "resource": {
-            "vmstat_samples": 5,
+            "backend": "native",  # read /proc + /sys directly; "commands" shells out
+            "vmstat_samples": 5,        # vmstat.txt/iostat.txt intervals; 0 = skip
+            "vmstat_interval_sec": 1.0,
+            "sockets_top": 20,          # rows per table in sockets.txt
         },
         "process": {
-            "include_fd_list": False,
+            "include_fd_list": False,  # every open fd, classified, sockets resolved
+            "fd_list_max": 5000,       # cap on the per-fd rows (aggregates always cover all)
+            "sample_hz": 10,          # per-process rate sampling while the run goes on; 0 = off
+            "sample_sec": 5,          # how long to sample (cut short by --deadline)
+            "sample_max_pids": 200,   # busiest by CPU time first
+        },
+        "cgroup": {
+            "sample_interval_sec": 1.0,  # two reads this far apart for rates; 0 = one read
         },
         "hardening": {
             "fail_on_warn": False,
@@ -54,6 +92,8 @@ def deep_merge(base: Dict[str, Any], override: Dict[str, Any]) -> Dict[str, Any]
 
 def load_config(path: str) -> Dict[str, Any]:
     """Load config from YAML, merged with defaults."""
+    import yaml  # ~15ms - only paths that read a config pay for it
+
     with open(path, "r", encoding="utf-8") as f:
         raw = yaml.safe_load(f) or {}
 
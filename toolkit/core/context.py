@@ -0,0 +1,156 @@
+"""Per-collection context shared by all collectors in a run."""
+
+from __future__ import annotations
+
+import sys
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+from toolkit.core.engine import CommandEngine, default_engine
+from toolkit.core.runner import CmdResult
+from toolkit.core.trace import Tracer
+
+
+def parse_systemctl_show(output: str) -> Dict[str, str]:
+    """Parse `systemctl show` KEY=value lines into a dict."""
+    props = {}
+    for line in output.splitlines():
+        if "=" in line:
+            key, _, value = line.partition("=")
+            props[key.strip()] = value.strip()
+    return props
+
+
+class CollectionContext:
+    """State for one collection run, handed to every collector.
+
+    Right now that's the command engine plus a memoized `systemctl show`
+    per unit. systemd, hardening and process all need unit properties, and
+    each `systemctl show` is a D-Bus round trip to PID 1 - which can take
+    seconds when PID 1 is busy during an incident. The first caller starts
+    the fetch, everyone else (including concurrent collectors) waits on
+    the same in-flight future.
+
+    Collectors can also drop small bits of info into `meta` (via add_meta)
+    that end up in the bundle's meta.json. `tracer`, when set, gets a
+    span per collector from the scheduler (see core/trace.py).
+
+    With `background` set (the CLI does), a collector can leave slow work
+    running after it returns via in_background() - its other files get
+    bundled right away, and the CLI collects the rest with
+    join_background() before closing the bundle.
+
+    State that should only move forward once the bundle is safely on disk
+    (journal cursors) goes through on_commit(); the CLI calls commit()
+    after the bundle is closed without errors.
+    """
+
+    def __init__(
+        self,
+        engine: CommandEngine | None = None,
+        bundle_id: str = "",
+        state_dir: Path | None = None,
+        tracer: Tracer | None = None,
+        background: bool = False,
+    ):
+        self.engine = engine or default_engine()
+        self.bundle_id = bundle_id
+        self.state_dir = state_dir  # where cross-run state lives (artifacts_dir)
+        self.tracer = tracer
+        self.background = background
+        self.meta: Dict[str, Any] = {}
+        self._on_commit: List[Callable[[], None]] = []
+        self._late: List[Tuple[Path, Path, threading.Thread, Callable[[], None] | None]] = []
+        self._show: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def add_meta(self, section: str, value: Any, key: str | None = None) -> None:
+        """Record something for meta.json. With `key`, nests under section
+        (e.g. per-unit info when several units share a run)."""
+        with self._lock:
+            if key is None:
+                self.meta[section] = value
+            else:
+                self.meta.setdefault(section, {})[key] = value
+
+    def on_commit(self, fn: Callable[[], None]) -> None:
+        """Run fn once the bundle has been written (see commit())."""
+        with self._lock:
+            self._on_commit.append(fn)
+
+    def commit(self) -> None:
+        """The bundle made it to disk - run the on_commit() callbacks."""
+        with self._lock:
+            fns, self._on_commit = self._on_commit, []
+        for fn in fns:
+            try:
+                fn()
+            except OSError as e:
+                print(f"Warning: couldn't save state after the bundle: {e}", file=sys.stderr)
+
+    def _show_future(self, unit: str) -> Future:
+        with self._lock:
+            fut = self._show.get(unit)
+            if fut is None:
+                fut = self.engine.submit(["systemctl", "show", unit], timeout_sec=8)
+                self._show[unit] = fut
+        return fut
+
+    def prefetch_unit(self, unit: str) -> None:
+        """Start the `systemctl show` now (at the caller's priority), don't wait."""
+        self._show_future(unit)
+
+    def unit_show(self, unit: str) -> CmdResult:
+        """Raw `systemctl show <unit>` result, fetched at most once per run."""
+        return self._show_future(unit).result()
+
+    def unit_properties(self, unit: str) -> Dict[str, str]:
+        """Parsed unit properties. Empty dict if systemctl failed."""
+        r = self.unit_show(unit)
+        if r.returncode != 0:
+            return {}
+        return parse_systemctl_show(r.stdout)
+
+    def in_background(self, out_dir: Path, fn: Callable[[Path], None],
+                      stop: Callable[[], None] | None = None) -> None:
+        """Run fn(dir) after the collector returns, writing into a dir of its own
+        (out_dir gets archived and removed as soon as the collector is done).
+
+        `stop` should make fn wrap up early - called if it's still going at
+        join time. Without background support, fn(out_dir) just runs now.
+        """
+        if not self.background:
+            fn(out_dir)
+            return
+        late = out_dir.with_name(out_dir.name + ".late")
+
+        def _run() -> None:
+            try:
+                fn(late)
+            except Exception as e:  # same as a failing collector - note it, keep the rest
+                print(f"'{out_dir.name}' background work failed: {e}", file=sys.stderr)
+
+        t = threading.Thread(target=_run, name=f"late-{out_dir.name}", daemon=True)
+        with self._lock:
+            self._late.append((out_dir, late, t, stop))
+        t.start()
+
+    def join_background(self, timeout: float | None) -> List[Tuple[Path, Path, bool]]:
+        """Wait for in_background() work: [(out_dir, its late dir, finished?)].
+
+        Whatever is still running after timeout is told to stop and gets a
+        couple more seconds to write what it has.
+        """
+        with self._lock:
+            late = list(self._late)
+            self._late.clear()
+        out = []
+        for out_dir, late_dir, t, stop in late:
+            t.join(timeout)
+            if t.is_alive() and stop is not None:
+                stop()
+                t.join(2)
+            out.append((out_dir, late_dir, not t.is_alive()))
+        return out
@@ -0,0 +1,319 @@
+"""Asyncio command engine shared by all collectors in a run.
+
+Collectors used to run their commands one after another, so wall-clock
+time was set by the longest serial chain (three systemctl calls, four
+resource pipelines...). Here every command goes onto one event loop with
+a single concurrency limit for the whole run and an optional global
+deadline. Collectors stay plain blocking functions - they submit commands
+and wait on the returned futures.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import List, Sequence
+
+from toolkit import startup
+from toolkit.core import trace
+from toolkit.core.runner import _CHUNK, CmdResult, _CappedSink, _kill_group, check_environment
+
+# Priority for commands submitted from the current thread/context - lower
+# runs first when every slot is busy. The scheduler sets it per collector
+# so volatile collectors' commands don't queue behind journalctl.
+command_priority: contextvars.ContextVar[int] = contextvars.ContextVar(
+    "command_priority", default=1
+)
+
+
+class _Slots:
+    """asyncio.Semaphore where waiters get in lowest priority first (FIFO within one).
+
+    Only touched from the loop thread, so no locking.
+    """
+
+    def __init__(self, n: int):
+        self._free = n
+        self._waiters: List[tuple] = []
+        self._seq = itertools.count()
+
+    async def acquire(self, priority: int) -> None:
+        if self._free > 0 and not self._waiters:
+            self._free -= 1
+            return
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), fut))
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self.release()  # got the slot just as we were cancelled - pass it on
+            raise
+
+    def release(self) -> None:
+        while self._waiters:
+            _, _, fut = heapq.heappop(self._waiters)
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self._free += 1
+
+
+class CommandEngine:
+    """Runs commands on a background asyncio loop.
+
+    Args:
+        max_concurrency: Max commands running at once across all collectors
+        deadline_sec: Whole-run budget. Commands still running when it hits
+            are killed (partial output kept), commands not started yet are
+            skipped. None means no deadline.
+    """
+
+    def __init__(self, max_concurrency: int = 8, deadline_sec: float | None = None):
+        self.max_concurrency = max(1, max_concurrency)
+        self.deadline = time.monotonic() + deadline_sec if deadline_sec else None
+        self.deadline_hits = 0
+        self.truncations: list = []  # capped outputs, for meta.json
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._slots: _Slots | None = None
+        self._procs: set = set()
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "CommandEngine":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def start(self) -> "CommandEngine":
+        with self._lock:
+            if self._loop is not None:
+                return self
+            ready = threading.Event()
+
+            def _run_loop():
+                loop = asyncio.new_event_loop()
+                asyncio.set_event_loop(loop)
+                self._loop = loop
+                self._slots = _Slots(self.max_concurrency)
+                ready.set()
+                loop.run_forever()
+                loop.close()
+
+            self._thread = threading.Thread(target=_run_loop, name="cmd-engine", daemon=True)
+            self._thread.start()
+            ready.wait()
+        return self
+
+    def close(self) -> None:
+        if self._loop is None:
+            return
+        self.cancel_all()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop = None
+
+    def remaining(self) -> float | None:
+        """Seconds left until the deadline, None if there isn't one."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def submit(
+        self,
+        cmd: Sequence[str],
+        path: Path | None = None,
+        timeout_sec: float = 10,
+        max_bytes: int = 2_000_000,
+        sink=None,
+        priority: int | None = None,
+    ) -> Future:
+        """Queue a command. Returns a concurrent Future resolving to CmdResult.
+
+        With `path` set, stdout is streamed into that file (stderr appended
+        after a blank line, like run_cmd_to_file). Otherwise it's captured
+        in memory up to max_bytes. A custom `sink` (same interface as
+        runner._CappedSink, e.g. journal.JournalSink) replaces both.
+        priority defaults to the caller's command_priority. The command is
+        traced under the caller's open span (see core/trace.py), if any.
+        """
+        if self._loop is None:
+            self.start()
+        check_environment()
+        if priority is None:
+            priority = command_priority.get()
+        return asyncio.run_coroutine_threadsafe(
+            self._run(list(cmd), path, timeout_sec, max_bytes, sink, priority,
+                      trace.current(), time.monotonic()),
+            self._loop,
+        )
+
+    def run(
+        self,
+        cmd: Sequence[str],
+        path: Path | None = None,
+        timeout_sec: float = 10,
+        max_bytes: int = 2_000_000,
+        sink=None,
+    ) -> CmdResult:
+        """Blocking shortcut for submit().result()."""
+        return self.submit(cmd, path, timeout_sec, max_bytes, sink).result()
+
+    def cancel_all(self) -> None:
+        """Kill everything currently running (used when bailing out early)."""
+        for p in list(self._procs):
+            _kill_group(p.pid)
+
+    async def _run(
+        self,
+        cmd: list,
+        path: Path | None,
+        timeout_sec: float,
+        max_bytes: int,
+        sink=None,
+        priority: int = 1,
+        parent: trace.Span | None = None,
+        queued: float = 0.0,
+    ) -> CmdResult:
+        await self._slots.acquire(priority)
+        started = time.monotonic()
+        try:
+            budget = timeout_sec
+            left = self.remaining()
+            deadline_bound = left is not None and left < timeout_sec
+            if deadline_bound:
+                budget = left
+
+            out = sink if sink is not None else _CappedSink(max_bytes, path)
+            try:
+                if budget <= 0:
+                    self.deadline_hits += 1
+                    r = CmdResult(
+                        cmd=cmd,
+                        returncode=124,
+                        stdout="",
+                        stderr="Skipped: collection deadline reached before this command ran",
+                        timed_out=True,
+                    )
+                else:
+                    r = await self._exec(cmd, out, budget, max_bytes)
+                    if r.timed_out and deadline_bound:
+                        self.deadline_hits += 1
+                        r.stderr += "\n[killed: collection deadline reached]"
+                    if r.truncated:
+                        self.truncations.append({
+                            "cmd": " ".join(cmd),
+                            "path": str(out.path) if out.path is not None else None,
+                            "kept": "newest" if getattr(out, "tail", False) else "oldest",
+                            "kept_bytes": r.stdout_bytes,
+                            "read_bytes": getattr(out, "seen", None),
+                            "reason": "command output cap",
+                        })
+                if out.path is not None:
+                    out.append_raw(b"\n\n" + r.stderr.encode("utf-8", errors="replace"))
+                    r.path = out.path
+                else:
+                    r.stdout = out.text()
+                if parent is not None:
+                    parent.tracer.command(parent, cmd, queued or started, started,
+                                          time.monotonic(), r)
+                return r
+            finally:
+                out.close()
+        finally:
+            self._slots.release()
+
+    async def _exec(
+        self,
+        cmd: list,
+        out: _CappedSink,
+        budget: float,
+        max_bytes: int,
+    ) -> CmdResult:
+        startup.command_started(cmd)
+        try:
+            p = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                start_new_session=True,
+            )
+        except FileNotFoundError:
+            return CmdResult(
+                cmd=cmd,
+                returncode=127,
+                stdout="",
+                stderr=f"Command not found: {cmd[0]}. Check your PATH or install it.",
+            )
+
+        self._procs.add(p)
+        err = _CappedSink(max_bytes)
+        # Sinks that parse (journal JSON) would stall every other command's
+        # pipes if they ran on the loop - push their work to a thread
+        offload = getattr(out, "cpu_heavy", False)
+        loop = asyncio.get_running_loop()
+
+        async def _pump_out():
+            while True:
+                chunk = await p.stdout.read(_CHUNK)
+                if not chunk:
+                    return
+                if offload:
+                    ok = await loop.run_in_executor(None, out.write, chunk)
+                else:
+                    ok = out.write(chunk)
+                if not ok:
+                    _kill_group(p.pid)
+                    return
+
+        async def _pump_err():
+            while True:
+                chunk = await p.stderr.read(_CHUNK)
+                if not chunk:
+                    return
+                err.write(chunk)
+
+        timed_out = False
+        try:
+            await asyncio.wait_for(asyncio.gather(_pump_out(), _pump_err()), budget)
+        except asyncio.TimeoutError:
+            timed_out = True
+            _kill_group(p.pid)
+        finally:
+            returncode = await p.wait()
+            self._procs.discard(p)
+
+        # Tail-keeping sinks only know what they kept once the stream is over
+        settle = getattr(out, "settle", None)
+        if settle is not None:
+            settle()
+        return CmdResult(
+            cmd=cmd,
+            returncode=124 if timed_out else returncode,
+            stdout="",
+            stderr=err.text(),
+            timed_out=timed_out,
+            truncated=out.truncated,
+            stdout_bytes=out.written,
+        )
+
+
+_default: CommandEngine | None = None
+_default_lock = threading.Lock()
+
+
+def default_engine() -> CommandEngine:
+    """Process-wide engine for collectors called outside a CLI run."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = CommandEngine().start()
+        return _default
@@ -0,0 +1,320 @@
+"""Host counters over a few seconds - vmstat/iostat/sar -n DEV without the forks.
+
+`vmstat 1 5` in a login shell holds an engine slot for five seconds and
+only covers CPU and memory. This reads /proc/stat (every CPU),
+/proc/vmstat, /proc/meminfo, /proc/diskstats and /proc/net/dev
+`samples` times, interval_sec apart, on its own thread while the rest
+of the resource collector runs.
+
+Each counter is one `array` column (one entry per read), keyed
+"group/name/field": "cpu/cpu0/user", "sys//ctxt", "disk/sda/rd_ios",
+"net/eth0/rx_bytes". Rates are worked out a column at a time - diff
+the column, divide by the time deltas - so adding a field is one entry in
+a tuple, not a new formula. A device that disappears mid-window keeps its
+last value, so it reads as zero activity.
+
+Unlike vmstat there's no "since boot" first row. samples=5 means five
+intervals (six reads).
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Any, Dict, List, Sequence
+
+from toolkit.core import procfs
+from toolkit.core.procfs import PROC
+
+_PAGE_KB = os.sysconf("SC_PAGE_SIZE") // 1024
+
+# /proc/vmstat counters sampled (pgpgin/out are already KiB)
+VM_FIELDS = ("pgpgin", "pgpgout", "pswpin", "pswpout", "pgfault", "pgmajfault")
+MEM_FIELDS = ("MemFree", "Buffers", "Cached", "SReclaimable", "SwapTotal", "SwapFree")
+SYS_FIELDS = ("ctxt", "intr", "processes", "procs_running", "procs_blocked")
+
+# Whole disks only (/sys/block), minus these
+_SKIP_DISKS = ("loop", "ram")
+
+
+def _diff(col: Sequence[float]) -> List[float]:
+    return [b - a for a, b in zip(col, col[1:], strict=False)]
+
+
+def _per_sec(col: Sequence[float], dts: Sequence[float]) -> List[float]:
+    return [d / dt if dt > 0 else 0.0 for d, dt in zip(_diff(col), dts, strict=True)]
+
+
+class HostSampler:
+    """Reads the host counters samples+1 times. run() blocks; start()/join() for a thread."""
+
+    def __init__(self, samples: int = 5, interval_sec: float = 1.0, proc: Path = PROC,
+                 sys_block: Path = procfs.SYS_BLOCK):
+        self.samples = max(1, samples)
+        self.interval = max(0.05, interval_sec)
+        self.proc = proc
+        self.sys_block = sys_block
+        self.t = array("d")
+        self.cols: Dict[str, array] = {}
+        self.cpus: List[str] = []
+        self.disks: List[str] = []
+        self.nics: List[str] = []
+        self.read_ms_max = 0.0
+        self.errors: List[str] = []
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> "HostSampler":
+        self._thread = threading.Thread(target=self.run, name="host-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def join(self) -> None:
+        if self._thread is not None:
+            self._thread.join()
+
+    def run(self) -> None:
+        next_read = time.monotonic()
+        for i in range(self.samples + 1):
+            started = time.monotonic()
+            self._read(started)
+            self.read_ms_max = max(self.read_ms_max, (time.monotonic() - started) * 1000)
+            if i == self.samples:
+                break  # that was the last read - nothing to wait for
+            next_read += self.interval
+            if self._stop.wait(max(0.0, next_read - time.monotonic())):
+                break
+
+    def _put(self, key: str, val: int) -> None:
+        col = self.cols.get(key)
+        if col is None:
+            col = self.cols[key] = array("q", [val] * len(self.t))  # appeared late - no history
+        col.append(val)
+
+    def _read(self, now: float) -> None:
+        first = not self.t
+        values: Dict[str, int] = {}
+        try:
+            cpus, counters = procfs.read_stat(self.proc)
+            if first:
+                self.cpus = sorted(cpus, key=lambda c: (c != "cpu", len(c), c))
+            for cpu in self.cpus:
+                for name, v in zip(procfs.CPU_FIELDS, cpus.get(cpu, ()), strict=False):
+                    values[f"cpu/{cpu}/{name}"] = v
+            for name in SYS_FIELDS:
+                if name in counters:
+                    values[f"sys//{name}"] = counters[name]
+        except (OSError, ValueError) as e:
+            self._error(f"/proc/stat: {e}")
+        try:
+            vm = procfs.read_vmstat(self.proc)
+            values.update((f"vm//{k}", vm[k]) for k in VM_FIELDS if k in vm)
+            mi = procfs.read_meminfo(self.proc)
+            values.update((f"mem//{k}", mi[k] // 1024) for k in MEM_FIELDS if k in mi)
+        except (OSError, ValueError) as e:
+            self._error(f"/proc/vmstat, meminfo: {e}")
+        try:
+            disks = procfs.read_diskstats(self.proc)
+            if first:
+                self.disks = [d for d in disks if not d.startswith(_SKIP_DISKS)
+                              and (self.sys_block / d).is_dir()]
+            for d in self.disks:
+                for name, v in zip(procfs.DISK_FIELDS, disks.get(d, ()), strict=False):
+                    values[f"disk/{d}/{name}"] = v
+        except (OSError, ValueError) as e:
+            self._error(f"/proc/diskstats: {e}")
+        try:
+            nics = procfs.read_net_dev(self.proc)
+            if first:
+                self.nics = list(nics)
+            for n in self.nics:
+                for name, v in zip(procfs.NET_FIELDS, nics.get(n, ()), strict=False):
+                    values[f"net/{n}/{name}"] = v
+        except (OSError, ValueError) as e:
+            self._error(f"/proc/net/dev: {e}")
+
+        # Anything missing this time (device gone) repeats its last value
+        for key, col in self.cols.items():
+            if key not in values:
+                col.append(col[-1])
+        for key, v in values.items():
+            self._put(key, v)
+        self.t.append(now)
+
+    def _error(self, msg: str) -> None:
+        if msg not in self.errors:
+            self.errors.append(msg)
+
+    # -- results --
+
+    def _col(self, key: str) -> Sequence[int]:
+        return self.cols.get(key) or [0] * len(self.t)
+
+    def _dts(self) -> List[float]:
+        return _diff(self.t)
+
+    def vmstat(self) -> List[Dict[str, Any]]:
+        """One vmstat row per interval. Memory in KiB, si/so/bi/bo in KiB/s like vmstat."""
+        dts = self._dts()
+        if not dts:
+            return []
+        c = self._col
+        ticks = {f: _diff(c(f"cpu/cpu/{f}")) for f in procfs.CPU_FIELDS}
+        total = [sum(v) for v in zip(*ticks.values(), strict=True)]
+
+        def _pct(*fields: str) -> List[int]:
+            return [round(sum(ticks[f][i] for f in fields) * 100 / tot) if tot else 0
+                    for i, tot in enumerate(total)]
+
+        si = [v * _PAGE_KB for v in _per_sec(c("vm//pswpin"), dts)]
+        so = [v * _PAGE_KB for v in _per_sec(c("vm//pswpout"), dts)]
+        swpd = [t - f for t, f in zip(c("mem//SwapTotal"), c("mem//SwapFree"), strict=True)]
+        cache = [a + b for a, b in zip(c("mem//Cached"), c("mem//SReclaimable"), strict=True)]
+        cols = {
+            "r": c("sys//procs_running")[1:],
+            "b": c("sys//procs_blocked")[1:],
+            "swpd": swpd[1:],
+            "free": c("mem//MemFree")[1:],
+            "buff": c("mem//Buffers")[1:],
+            "cache": cache[1:],
+            "si": si,
+            "so": so,
+            "bi": _per_sec(c("vm//pgpgin"), dts),
+            "bo": _per_sec(c("vm//pgpgout"), dts),
+            "in": _per_sec(c("sys//intr"), dts),
+            "cs": _per_sec(c("sys//ctxt"), dts),
+            "forks": _per_sec(c("sys//processes"), dts),
+            "majflt": _per_sec(c("vm//pgmajfault"), dts),
+            "us": _pct("user", "nice"),
+            "sy": _pct("system", "irq", "softirq"),
+            "id": _pct("idle"),
+            "wa": _pct("iowait"),
+            "st": _pct("steal"),
+        }
+        rows = []
+        for i, dt in enumerate(dts):
+            row = {"sec": round(dt, 3)}
+            row.update((k, round(v[i])) for k, v in cols.items())
+            rows.append(row)
+        return rows
+
+    def cpu_util(self) -> Dict[str, Dict[str, float]]:
+        """Per CPU ("cpu" = all of them): % of the window in each state, and busy_max -
+        the busiest interval (not idle, not iowait)."""
+        out: Dict[str, Dict[str, float]] = {}
+        for cpu in self.cpus:
+            cols = {f: self._col(f"cpu/{cpu}/{f}") for f in procfs.CPU_FIELDS}
+            total = sum(col[-1] - col[0] for col in cols.values())
+            row = {f: round((col[-1] - col[0]) * 100 / total, 1) if total else 0.0
+                   for f, col in cols.items()}
+            steps = [sum(v) for v in zip(*(_diff(col) for col in cols.values()), strict=True)]
+            idle = [a + b for a, b in zip(_diff(cols["idle"]), _diff(cols["iowait"]),
+                                          strict=True)]
+            row["busy"] = round(100 - row["idle"] - row["iowait"], 1)
+            row["busy_max"] = round(max(((s - i) * 100 / s
+                                         for s, i in zip(steps, idle, strict=True) if s),
+                                        default=0.0), 1)
+            out[cpu] = row
+        return out
+
+    def disk_rates(self) -> Dict[str, Dict[str, float]]:
+        """iostat -x style, averaged over the window, plus util_max for the busiest interval.
+        await is ms per completed I/O, aqu_sz the average queue depth."""
+        dts = self._dts()
+        span = sum(dts)
+        out: Dict[str, Dict[str, float]] = {}
+        if span <= 0:
+            return out
+        for d in self.disks:
+            delta = {f: self._col(f"disk/{d}/{f}")[-1] - self._col(f"disk/{d}/{f}")[0]
+                     for f in procfs.DISK_FIELDS}
+            util = _per_sec(self._col(f"disk/{d}/io_ticks"), dts)  # ms busy per second
+            rd, wr = delta["rd_ios"], delta["wr_ios"]
+            out[d] = {
+                "r_s": round(rd / span, 1),
+                "w_s": round(wr / span, 1),
+                "rkb_s": round(delta["rd_sectors"] / 2 / span, 1),
+                "wkb_s": round(delta["wr_sectors"] / 2 / span, 1),
+                "r_await": round(delta["rd_ticks"] / rd, 2) if rd else 0.0,
+                "w_await": round(delta["wr_ticks"] / wr, 2) if wr else 0.0,
+                "aqu_sz": round(delta["time_in_queue"] / 1000 / span, 2),
+                "util": round(min(100.0, delta["io_ticks"] / 10 / span), 1),
+                "util_max": round(min(100.0, max(util, default=0.0) / 10), 1),
+                "in_flight": self._col(f"disk/{d}/in_flight")[-1],
+            }
+        return out
+
+    def nic_rates(self) -> Dict[str, Dict[str, float]]:
+        """Per interface: bytes and packets per second over the window, errors/drops as counts."""
+        span = sum(self._dts())
+        out: Dict[str, Dict[str, float]] = {}
+        if span <= 0:
+            return out
+        for n in self.nics:
+            delta = {f: self._col(f"net/{n}/{f}")[-1] - self._col(f"net/{n}/{f}")[0]
+                     for f in ("rx_bytes", "tx_bytes", "rx_packets", "tx_packets",
+                               "rx_errs", "tx_errs", "rx_drop", "tx_drop")}
+            row = {k: round(v / span, 1) for k, v in delta.items()
+                   if k.endswith(("bytes", "packets"))}
+            row.update((k, v) for k, v in delta.items() if k.endswith(("errs", "drop")))
+            out[n] = row
+        return out
+
+    def summary(self) -> Dict[str, Any]:
+        dts = self._dts()
+        return {
+            "samples": len(dts),
+            "interval_sec": self.interval,
+            "window_sec": round(sum(dts), 3),
+            "read_ms_max": round(self.read_ms_max, 2),
+            "errors": self.errors,
+        }
+
+
+def format_vmstat(rows: List[Dict[str, Any]], cpus: Dict[str, Dict[str, float]]) -> str:
+    """vmstat.txt - vmstat's columns (plus forks/s and majflt/s), then per-CPU %."""
+    lines = [
+        "procs -----------memory (KiB)---------- ---swap-- -----io---- ----system---- "
+        "-faults- ------cpu-----",
+        f"{'r':>3}{'b':>3}{'swpd':>9}{'free':>9}{'buff':>9}{'cache':>9}{'si':>5}{'so':>5}"
+        f"{'bi':>6}{'bo':>6}{'in':>6}{'cs':>7}{'fork':>5}{'majflt':>8}"
+        f"{'us':>4}{'sy':>3}{'id':>4}{'wa':>3}{'st':>3}",
+    ]
+    for r in rows:
+        lines.append(
+            f"{r['r']:>3}{r['b']:>3}{r['swpd']:>9}{r['free']:>9}{r['buff']:>9}{r['cache']:>9}"
+            f"{r['si']:>5}{r['so']:>5}{r['bi']:>6}{r['bo']:>6}{r['in']:>6}{r['cs']:>7}"
+            f"{r['forks']:>5}{r['majflt']:>8}{r['us']:>4}{r['sy']:>3}{r['id']:>4}{r['wa']:>3}{r['st']:>3}"
+        )
+    if cpus:
+        lines += ["", "# % of the window per CPU (busy max = busiest interval)",
+                  f"{'CPU':<7}{'%usr':>7}{'%nice':>7}{'%sys':>7}{'%iowait':>8}{'%irq':>6}"
+                  f"{'%soft':>7}{'%steal':>7}{'%idle':>7}{'busy max':>10}"]
+        for name, c in cpus.items():
+            lines.append(f"{'all' if name == 'cpu' else name[3:]:<7}{c['user']:>7}{c['nice']:>7}"
+                         f"{c['system']:>7}{c['iowait']:>8}{c['irq']:>6}{c['softirq']:>7}"
+                         f"{c['steal']:>7}{c['idle']:>7}{c['busy_max']:>10}")
+    return "\n".join(lines) + "\n"
+
+
+def format_iostat(disks: Dict[str, Dict[str, float]], nics: Dict[str, Dict[str, float]]) -> str:
+    """iostat.txt - iostat -x per disk, then per-NIC throughput (sar -n DEV-ish)."""
+    h = procfs.human_bytes
+    lines = [f"{'Device':<12}{'r/s':>8}{'w/s':>8}{'rkB/s':>10}{'wkB/s':>10}{'r_await':>9}"
+             f"{'w_await':>9}{'aqu-sz':>8}{'%util':>7}{'max':>7}"]
+    for d, r in disks.items():
+        lines.append(f"{d:<12}{r['r_s']:>8}{r['w_s']:>8}{r['rkb_s']:>10}{r['wkb_s']:>10}"
+                     f"{r['r_await']:>9}{r['w_await']:>9}{r['aqu_sz']:>8}{r['util']:>7}{r['util_max']:>7}")
+    lines += ["", f"{'IFACE':<12}{'rx/s':>9}{'tx/s':>9}{'rxpck/s':>9}{'txpck/s':>9}"
+                  f"{'rxerr':>7}{'txerr':>7}{'rxdrop':>8}{'txdrop':>8}"]
+    for n, r in nics.items():
+        lines.append(f"{n:<12}{h(r['rx_bytes']):>9}{h(r['tx_bytes']):>9}{r['rx_packets']:>9}"
+                     f"{r['tx_packets']:>9}{r['rx_errs']:>7}{r['tx_errs']:>7}{r['rx_drop']:>8}"
+                     f"{r['tx_drop']:>8}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,284 @@
+"""Streaming parser for `journalctl -o json` output.
+
+Entries are parsed as the pipe delivers them. Each one is rendered into
+the text log and folded into a small index in the same pass, so nothing
+has to re-read a multi-MB log afterwards.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List
+
+from toolkit.core.runner import _CappedSink
+
+# Text renderings we do ourselves. Anything else falls back to short-iso.
+TEXT_FORMATS = ("short-iso", "short", "cat", "json")
+
+PRIORITY_NAMES = ["emerg", "alert", "crit", "err", "warning", "notice", "info", "debug"]
+
+# Bounds so a weird journal can't blow up the index
+MAX_LINE_BYTES = 1_000_000
+MAX_SIGNATURES = 10_000
+MAX_PID_EVENTS = 500
+TOP_SIGNATURES = 50
+
+# Things that vary between otherwise identical messages
+_SIG_SUBS = [
+    (re.compile(r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}"),
+     "<uuid>"),
+    (re.compile(r"\b0x[0-9a-fA-F]+\b"), "<hex>"),
+    (re.compile(r"\b\d+(?:\.\d+)*\b"), "<n>"),
+    (re.compile(r"\"[^\"]*\"|'[^']*'"), "<str>"),
+]
+
+
+def message_signature(msg: str) -> str:
+    """Collapse numbers, ids and quoted strings so similar messages group together."""
+    sig = msg[:300]
+    for rx, repl in _SIG_SUBS:
+        sig = rx.sub(repl, sig)
+    return sig
+
+
+def entry_message(entry: Dict[str, Any]) -> str:
+    """MESSAGE as text. journald sends non-UTF8 messages as a list of byte values."""
+    msg = entry.get("MESSAGE")
+    if msg is None:
+        return ""
+    if isinstance(msg, list):
+        try:
+            return bytes(msg).decode("utf-8", errors="replace")
+        except (ValueError, TypeError):
+            return ""
+    return str(msg)
+
+
+def _field(entry: Dict[str, Any], key: str) -> str:
+    v = entry.get(key)
+    return v if isinstance(v, str) else ""
+
+
+class JournalIndex:
+    """Per-minute priority counts, new PIDs, top message signatures, time range."""
+
+    def __init__(self):
+        self.entries = 0
+        self.first_us = 0
+        self.last_us = 0
+        self.first_error_us = 0
+        self.by_minute: Dict[str, List[int]] = {}
+        self.priority_totals = [0] * 8
+        self.pids: Dict[str, int] = {}
+        self.pid_events: List[Dict[str, Any]] = []
+        self.signatures: Counter = Counter()
+        self.sig_info: Dict[str, Dict[str, Any]] = {}
+        self.signatures_dropped = 0
+        self.last_cursor = ""
+
+    def add(self, entry: Dict[str, Any], ts_us: int, msg: str) -> None:
+        self.entries += 1
+        if not self.first_us or ts_us < self.first_us:
+            self.first_us = ts_us
+        if ts_us > self.last_us:
+            self.last_us = ts_us
+
+        prio_s = _field(entry, "PRIORITY")
+        prio = int(prio_s) if prio_s.isdigit() and int(prio_s) < 8 else 6
+        self.priority_totals[prio] += 1
+        if prio <= 3 and (not self.first_error_us or ts_us < self.first_error_us):
+            self.first_error_us = ts_us
+
+        minute = _iso(ts_us)[:16] if ts_us else "unknown"
+        counts = self.by_minute.get(minute)
+        if counts is None:
+            counts = self.by_minute[minute] = [0] * 8
+        counts[prio] += 1
+
+        pid = _field(entry, "_PID")
+        if pid and pid not in self.pids:
+            self.pids[pid] = ts_us
+            if len(self.pid_events) < MAX_PID_EVENTS:
+                self.pid_events.append({
+                    "at": _iso(ts_us),
+                    "pid": int(pid) if pid.isdigit() else pid,
+                    "comm": _field(entry, "_COMM"),
+                })
+
+        sig = message_signature(msg)
+        if sig in self.signatures or len(self.signatures) < MAX_SIGNATURES:
+            self.signatures[sig] += 1
+            info = self.sig_info.get(sig)
+            if info is None:
+                self.sig_info[sig] = {"first_us": ts_us, "last_us": ts_us,
+                                      "min_priority": prio, "example": msg[:500]}
+            else:
+                info["last_us"] = ts_us
+                if prio < info["min_priority"]:
+                    info["min_priority"] = prio
+        else:
+            self.signatures_dropped += 1
+
+        cursor = _field(entry, "__CURSOR")
+        if cursor:
+            self.last_cursor = cursor
+
+    def to_dict(self) -> Dict[str, Any]:
+        top = []
+        for sig, count in self.signatures.most_common(TOP_SIGNATURES):
+            info = self.sig_info[sig]
+            top.append({
+                "signature": sig,
+                "count": count,
+                "first": _iso(info["first_us"]),
+                "last": _iso(info["last_us"]),
+                "priority": PRIORITY_NAMES[info["min_priority"]],
+                "example": info["example"],
+            })
+        return {
+            "entries": self.entries,
+            "first": _iso(self.first_us) if self.first_us else None,
+            "last": _iso(self.last_us) if self.last_us else None,
+            "first_error": _iso(self.first_error_us) if self.first_error_us else None,
+            "priority_totals": dict(zip(PRIORITY_NAMES, self.priority_totals, strict=True)),
+            # minute -> counts in PRIORITY order (emerg..debug)
+            "priority_columns": PRIORITY_NAMES,
+            "by_minute": self.by_minute,
+            "new_pids": self.pid_events,
+            "distinct_pids": len(self.pids),
+            "top_messages": top,
+            "distinct_signatures": len(self.signatures),
+            "signatures_not_tracked": self.signatures_dropped,
+        }
+
+
+_iso_cache: Dict[int, str] = {}
+_local_cache: Dict[int, str] = {}
+
+
+def _iso(ts_us: int) -> str:
+    """UTC ISO timestamp, cached per second (logs come in bursts). For the index."""
+    sec = ts_us // 1_000_000
+    s = _iso_cache.get(sec)
+    if s is None:
+        if len(_iso_cache) > 4096:
+            _iso_cache.clear()
+        s = datetime.fromtimestamp(sec, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S+0000")
+        _iso_cache[sec] = s
+    return s
+
+
+def _local_iso(ts_us: int) -> str:
+    """Host-local ISO timestamp with its offset, like `journalctl -o short-iso`."""
+    sec = ts_us // 1_000_000
+    s = _local_cache.get(sec)
+    if s is None:
+        if len(_local_cache) > 4096:
+            _local_cache.clear()
+        s = datetime.fromtimestamp(sec).astimezone().strftime("%Y-%m-%dT%H:%M:%S%z")
+        _local_cache[sec] = s
+    return s
+
+
+def _short(ts_us: int) -> str:
+    return datetime.fromtimestamp(ts_us / 1_000_000).strftime("%b %d %H:%M:%S")
+
+
+def render_entry(entry: Dict[str, Any], ts_us: int, msg: str, fmt: str) -> str:
+    """Render one entry roughly the way `journalctl -o <fmt>` would (host-local
+    times, as journalctl prints them)."""
+    if fmt == "cat":
+        return msg + "\n"
+    ident = _field(entry, "SYSLOG_IDENTIFIER") or _field(entry, "_COMM") or "unknown"
+    pid = _field(entry, "_PID") or _field(entry, "SYSLOG_PID")
+    stamp = _short(ts_us) if fmt == "short" else _local_iso(ts_us)
+    prefix = f"{stamp} {_field(entry, '_HOSTNAME')} {ident}{f'[{pid}]' if pid else ''}: "
+    if "\n" in msg:
+        msg = msg.replace("\n", "\n" + " " * len(prefix))
+    return prefix + msg + "\n"
+
+
+class JournalSink:
+    """Engine sink that parses `journalctl -o json` as it streams in.
+
+    Writes the rendered log and feeds the index. The text keeps the
+    newest max_bytes (journalctl -n already picked the newest N entries,
+    so cutting the end would throw away exactly the lines that matter);
+    the index counts every entry. journalctl's own -n bounds how much
+    there is to read.
+    """
+
+    cpu_heavy = True  # tells the engine to parse off the event loop
+
+    def __init__(self, path: Path, max_bytes: int, fmt: str = "short-iso"):
+        self.fmt = fmt if fmt in TEXT_FORMATS else "short-iso"
+        self.text = _CappedSink(max_bytes, path, tail=True)
+        self.path = path
+        self.index = JournalIndex()
+        self.bad_lines = 0
+        self.written_cursor = ""  # cursor of the newest entry in the text
+        self._partial = bytearray()
+
+    @property
+    def truncated(self) -> bool:
+        return self.text.truncated
+
+    @property
+    def written(self) -> int:
+        return self.text.written
+
+    @property
+    def seen(self) -> int:
+        return self.text.seen
+
+    @property
+    def tail(self) -> bool:
+        return True
+
+    def settle(self) -> None:
+        self.text.settle()
+
+    def write(self, data: bytes) -> bool:
+        buf = self._partial
+        buf += data
+        start = 0
+        while True:
+            nl = buf.find(b"\n", start)
+            if nl < 0:
+                break
+            self._line(bytes(buf[start:nl]))
+            start = nl + 1
+        del buf[:start]
+        if len(buf) > MAX_LINE_BYTES:
+            self.bad_lines += 1
+            buf.clear()
+        return True
+
+    def _line(self, raw: bytes) -> None:
+        if not raw.strip() or raw.startswith(b"-- "):
+            return  # blank, or a "-- No entries --" style marker
+        try:
+            entry = json.loads(raw)
+        except ValueError:
+            self.bad_lines += 1
+            return
+        ts = _field(entry, "__REALTIME_TIMESTAMP")
+        ts_us = int(ts) if ts.isdigit() else 0
+        msg = entry_message(entry)
+        self.index.add(entry, ts_us, msg)
+        if self.fmt == "json":
+            out = raw + b"\n"
+        else:
+            out = render_entry(entry, ts_us, msg, self.fmt).encode("utf-8", errors="replace")
+        if self.text.write(out):
+            self.written_cursor = _field(entry, "__CURSOR") or self.written_cursor
+
+    def append_raw(self, data: bytes) -> None:
+        self.text.append_raw(data)
+
+    def close(self) -> None:
+        self.text.close()
@@ -0,0 +1,131 @@
+"""/proc/net socket tables, parsed without ss.
+
+Each line of /proc/net/{tcp,tcp6,udp,udp6} is one socket: hex local and
+remote address, state, queue sizes, uid and inode. /proc/net/unix has
+the inode and bound path for unix sockets. These are streamed line by
+line and addresses are only decoded for the sockets we keep, so a table
+with hundreds of thousands of entries costs one pass and not much memory.
+
+Read /proc/<pid>/net/... to see the tables in a process's network
+namespace. Containers and PrivateNetwork= units have their own.
+"""
+
+from __future__ import annotations
+
+import socket
+import struct
+from pathlib import Path
+from typing import Any, Collection, Dict, Iterator, Tuple
+
+from toolkit.core.procfs import PROC
+
+TCP_STATES = {
+    "01": "ESTABLISHED", "02": "SYN_SENT", "03": "SYN_RECV", "04": "FIN_WAIT1",
+    "05": "FIN_WAIT2", "06": "TIME_WAIT", "07": "CLOSE", "08": "CLOSE_WAIT",
+    "09": "LAST_ACK", "0A": "LISTEN", "0B": "CLOSING", "0C": "NEW_SYN_RECV",
+}
+
+# udp sockets reuse the tcp state numbers: 07 unconnected, 01 connected
+UDP_STATES = {"07": "UNCONN", "01": "ESTAB"}
+
+UNIX_TYPES = {"0001": "stream", "0002": "dgram", "0005": "seqpacket"}
+_SO_ACCEPTCON = 0x10000  # unix Flags bit for a listening socket
+
+INET_TABLES = ("tcp", "tcp6", "udp", "udp6")
+
+
+def decode_addr(hexaddr: str) -> Tuple[str, int]:
+    """"0100007F:0050" -> ("127.0.0.1", 80). v6 too - each 32-bit word is host-endian."""
+    ip_hex, _, port_hex = hexaddr.partition(":")
+    raw = bytes.fromhex(ip_hex)
+    if len(raw) == 4:
+        ip = socket.inet_ntop(socket.AF_INET, struct.pack("=I", struct.unpack(">I", raw)[0]))
+    else:
+        words = struct.unpack(">4I", raw)
+        ip = socket.inet_ntop(socket.AF_INET6, struct.pack("=4I", *words))
+    return ip, int(port_hex, 16)
+
+
+def fmt_endpoint(ip: str, port: int) -> str:
+    return f"[{ip}]:{port}" if ":" in ip else f"{ip}:{port}"
+
+
+def iter_inet(table: str, proc: Path = PROC) -> Iterator[Tuple[str, ...]]:
+    """Raw rows of /proc/net/<table>: (local, remote, state, tx_queue, rx_queue, uid, inode).
+
+    All still hex/str - decode what you keep. Missing table (no IPv6) = nothing.
+    """
+    try:
+        f = open(proc / "net" / table, "rb")
+    except OSError:
+        return
+    with f:
+        f.readline()  # header
+        for line in f:
+            parts = line.split()
+            if len(parts) < 10:
+                continue
+            tx, _, rx = parts[4].partition(b":")
+            yield (parts[1].decode(), parts[2].decode(), parts[3].decode(),
+                   tx.decode(), rx.decode(), parts[7].decode(), parts[9].decode())
+
+
+def iter_unix(proc: Path = PROC) -> Iterator[Tuple[str, str, str, str]]:
+    """(inode, type, state, path) per line of /proc/net/unix. path "" if unbound.
+
+    state is LISTEN, CONNECTED or UNCONN.
+    """
+    try:
+        f = open(proc / "net" / "unix", "rb")
+    except OSError:
+        return
+    with f:
+        f.readline()
+        for line in f:
+            parts = line.split(None, 7)
+            if len(parts) < 7:
+                continue
+            path = parts[7].decode(errors="replace").strip() if len(parts) > 7 else ""
+            if int(parts[3], 16) & _SO_ACCEPTCON:
+                state = "LISTEN"
+            else:
+                state = "CONNECTED" if parts[5] == b"03" else "UNCONN"
+            yield parts[6].decode(), parts[4].decode(), state, path
+
+
+def socket_index(inodes: Collection[str], proc: Path = PROC) -> Dict[str, Dict[str, Any]]:
+    """inode -> socket details, for just the inodes asked for.
+
+    One pass over each table per call, however many fds point at it -
+    build it once per collection, not per fd.
+    """
+    want = set(inodes)
+    out: Dict[str, Dict[str, Any]] = {}
+    if not want:
+        return out
+    for table in INET_TABLES:
+        states = UDP_STATES if table.startswith("udp") else TCP_STATES
+        for local, remote, st, tx, rx, _uid, inode in iter_inet(table, proc):
+            if inode not in want or inode == "0":
+                continue
+            lip, lport = decode_addr(local)
+            rip, rport = decode_addr(remote)
+            out[inode] = {
+                "proto": table,
+                "local": fmt_endpoint(lip, lport),
+                "remote": fmt_endpoint(rip, rport) if rport else None,
+                "state": states.get(st, st),
+                "rx_queue": int(rx, 16),
+                "tx_queue": int(tx, 16),
+            }
+        if len(out) == len(want):
+            return out
+    for inode, stype, st, path in iter_unix(proc):
+        if inode in want and inode not in out:
+            out[inode] = {
+                "proto": "unix",
+                "type": UNIX_TYPES.get(stype, stype),
+                "state": st,
+                "path": path or None,
+            }
+    return out
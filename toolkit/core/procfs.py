@@ -0,0 +1,394 @@
+"""Native readers for /proc and /sys.
+
+Plain file reads, no forks. When a box is under fork pressure or the PID
+table is full, `free`/`df`/`uptime` are exactly the things that hang -
+reading the kernel's own files still works.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from pathlib import Path
+from typing import Any, Dict, List
+
+PROC = Path("/proc")
+SYS_BLOCK = Path("/sys/block")
+
+# Filesystems where statvfs can block for a long time if the server is gone.
+# df hangs on these too - better to list them than to hang.
+NETWORK_FS = {"nfs", "nfs4", "cifs", "smb3", "smbfs", "ceph", "glusterfs", "fuse.sshfs", "9p"}
+
+_OCTAL_ESC = re.compile(r"\\([0-7]{3})")
+
+
+def read_meminfo(proc: Path = PROC) -> Dict[str, int]:
+    """Parse /proc/meminfo. Values in bytes (kernel reports kB)."""
+    out = {}
+    for line in (proc / "meminfo").read_text().splitlines():
+        key, _, rest = line.partition(":")
+        parts = rest.split()
+        if not parts:
+            continue
+        val = int(parts[0])
+        if len(parts) > 1 and parts[1] == "kB":
+            val *= 1024
+        out[key.strip()] = val
+    return out
+
+
+def read_loadavg(proc: Path = PROC) -> Dict[str, Any]:
+    """Parse /proc/loadavg."""
+    parts = (proc / "loadavg").read_text().split()
+    running, _, total = parts[3].partition("/")
+    return {
+        "load1": float(parts[0]),
+        "load5": float(parts[1]),
+        "load15": float(parts[2]),
+        "running": int(running),
+        "tasks": int(total),
+    }
+
+
+def read_uptime(proc: Path = PROC) -> float:
+    """Seconds since boot."""
+    return float((proc / "uptime").read_text().split()[0])
+
+
+def read_vmstat(proc: Path = PROC) -> Dict[str, int]:
+    """Parse /proc/vmstat counters."""
+    out = {}
+    for line in (proc / "vmstat").read_text().splitlines():
+        key, _, val = line.partition(" ")
+        if val:
+            out[key] = int(val)
+    return out
+
+
+# First eight columns of the "cpu" line in /proc/stat
+CPU_FIELDS = ("user", "nice", "system", "idle", "iowait", "irq", "softirq", "steal")
+
+
+def read_stat(proc: Path = PROC,
+              per_cpu: bool = True) -> tuple[Dict[str, List[int]], Dict[str, int]]:
+    """/proc/stat: ({"cpu": [CPU_FIELDS jiffies], "cpu0": [...]}, {ctxt, intr, ...}).
+
+    per_cpu=False keeps just the aggregate "cpu" line (the recorder's case).
+    """
+    cpus: Dict[str, List[int]] = {}
+    counters: Dict[str, int] = {}
+    with open(proc / "stat", "rb") as f:
+        for line in f.read().decode().splitlines():
+            parts = line.split(None, 9)
+            if not parts:
+                continue
+            if parts[0].startswith("cpu"):
+                if per_cpu or parts[0] == "cpu":
+                    cpus[parts[0]] = [int(v) for v in parts[1:len(CPU_FIELDS) + 1]]
+            elif parts[0] in ("ctxt", "intr", "processes", "procs_running", "procs_blocked"):
+                counters[parts[0]] = int(parts[1])  # intr: just the total
+    return cpus, counters
+
+
+# /proc/diskstats columns after major, minor, name (the first 11 - all kernels have them)
+DISK_FIELDS = ("rd_ios", "rd_merges", "rd_sectors", "rd_ticks", "wr_ios", "wr_merges",
+               "wr_sectors", "wr_ticks", "in_flight", "io_ticks", "time_in_queue")
+
+
+def read_diskstats(proc: Path = PROC) -> Dict[str, List[int]]:
+    """device name -> DISK_FIELDS values, every line (partitions, loop... included)."""
+    out = {}
+    with open(proc / "diskstats", "rb") as f:
+        for line in f.read().decode().splitlines():
+            parts = line.split()
+            if len(parts) >= 3 + len(DISK_FIELDS):
+                out[parts[2]] = [int(v) for v in parts[3:3 + len(DISK_FIELDS)]]
+    return out
+
+
+NET_FIELDS = ("rx_bytes", "rx_packets", "rx_errs", "rx_drop", "rx_fifo", "rx_frame",
+              "rx_compressed", "rx_multicast", "tx_bytes", "tx_packets", "tx_errs", "tx_drop",
+              "tx_fifo", "tx_colls", "tx_carrier", "tx_compressed")
+
+
+def read_net_dev(proc: Path = PROC) -> Dict[str, List[int]]:
+    """interface -> NET_FIELDS counters from /proc/net/dev."""
+    out = {}
+    with open(proc / "net" / "dev", "rb") as f:
+        for line in f.read().decode().splitlines()[2:]:
+            name, _, rest = line.partition(":")
+            vals = rest.split()
+            if len(vals) >= len(NET_FIELDS):
+                out[name.strip()] = [int(v) for v in vals[:len(NET_FIELDS)]]
+    return out
+
+
+def read_pressure(resource: str, proc: Path = PROC) -> Dict[str, Dict[str, float]]:
+    """Parse /proc/pressure/<cpu|memory|io>. Empty dict without PSI (pre-4.20, psi=0).
+
+    {"some": {"avg10": .., "avg60": .., "avg300": .., "total": usec}, "full": {...}}
+    """
+    return read_pressure_file(proc / "pressure" / resource)
+
+
+def read_pressure_file(path: Path) -> Dict[str, Dict[str, float]]:
+    """Same as read_pressure, any PSI file (cgroup v2 <cgroup>/cpu.pressure etc)."""
+    out: Dict[str, Dict[str, float]] = {}
+    try:
+        with open(path, "rb") as f:
+            text = f.read().decode()
+    except OSError:
+        return out
+    for line in text.splitlines():
+        kind, _, rest = line.partition(" ")
+        vals = {}
+        for kv in rest.split():
+            k, _, v = kv.partition("=")
+            vals[k] = float(v)
+        out[kind] = vals
+    return out
+
+
+def read_keyed(path: Path) -> Dict[str, int]:
+    """"key value" per line (memory.stat, cpu.stat, memory.events...). Empty if unreadable."""
+    out = {}
+    try:
+        with open(path, "rb") as f:
+            text = f.read().decode()
+    except OSError:
+        return out
+    for line in text.splitlines():
+        key, _, val = line.partition(" ")
+        try:
+            out[key] = int(val)
+        except ValueError:
+            continue
+    return out
+
+
+def read_value(path: Path) -> int | None:
+    """Single-number file (memory.current, pids.max...). "max" and unreadable -> None."""
+    try:
+        with open(path, "rb") as f:
+            return int(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def read_pid_stat(pid: int, proc: Path = PROC) -> Dict[str, Any]:
+    """The useful fields of /proc/<pid>/stat.
+
+    utime/stime/starttime are clock ticks (starttime since boot), rss is pages.
+    """
+    with open(proc / str(pid) / "stat", "rb") as f:
+        raw = f.read()
+    # comm is in parens and can contain anything, including spaces and ')'
+    end = raw.rindex(b")")
+    fields = raw[end + 2:].split()
+    return {
+        "comm": raw[raw.index(b"(") + 1:end].decode(errors="replace"),
+        "state": fields[0].decode(),
+        "ppid": int(fields[1]),
+        "utime": int(fields[11]),
+        "stime": int(fields[12]),
+        "threads": int(fields[17]),
+        "starttime": int(fields[19]),
+        "rss_pages": int(fields[21]),
+    }
+
+
+# /proc/<pid>/status lines worth keeping - the rest is in stat or smaps_rollup
+_STATUS_KEYS = {
+    b"Uid": "uid", b"VmHWM": "rss_peak", b"VmSwap": "swap",
+    b"voluntary_ctxt_switches": "ctxt_vol", b"nonvoluntary_ctxt_switches": "ctxt_invol",
+}
+
+
+def read_pid_status(pid: int, proc: Path = PROC) -> Dict[str, int]:
+    """Real uid, peak RSS and swap (bytes), context switches from /proc/<pid>/status."""
+    out = {}
+    with open(proc / str(pid) / "status", "rb") as f:
+        for line in f.read().splitlines():
+            key, _, rest = line.partition(b":")
+            name = _STATUS_KEYS.get(key)
+            if name is None:
+                continue
+            parts = rest.split()
+            val = int(parts[0])
+            if len(parts) > 1 and parts[1] == b"kB":
+                val *= 1024
+            out[name] = val
+    return out
+
+
+def read_smaps_rollup(pid: int, proc: Path = PROC) -> Dict[str, int]:
+    """/proc/<pid>/smaps_rollup (4.14+) in bytes - Rss, Pss, Private_*, Swap...
+
+    Needs ptrace access to the process (same uid or root).
+    """
+    out = {}
+    with open(proc / str(pid) / "smaps_rollup", "rb") as f:
+        for line in f.read().splitlines()[1:]:  # first line is the address range
+            key, _, rest = line.partition(b":")
+            parts = rest.split()
+            if parts:
+                out[key.decode()] = int(parts[0]) * 1024
+    return out
+
+
+def read_pid_cmdline(pid: int, proc: Path = PROC, max_len: int = 4096) -> str:
+    """Command line with spaces for NULs. Empty for kernel threads and zombies."""
+    with open(proc / str(pid) / "cmdline", "rb") as f:
+        raw = f.read(max_len)
+    return raw.rstrip(b"\0").replace(b"\0", b" ").decode(errors="replace")
+
+
+def pid_fd_count(pid: int, proc: Path = PROC) -> int:
+    """Open fds - one getdents, no readlinks."""
+    return len(os.listdir(proc / str(pid) / "fd"))
+
+
+def read_pid_io(pid: int, proc: Path = PROC) -> Dict[str, int]:
+    """/proc/<pid>/io counters. Needs same uid or CAP_SYS_PTRACE."""
+    out = {}
+    with open(proc / str(pid) / "io", "rb") as f:
+        for line in f.read().decode().splitlines():
+            key, _, val = line.partition(":")
+            if val:
+                out[key] = int(val)
+    return out
+
+
+def cgroup_pids(cgroup: str, sys_fs: Path = Path("/sys/fs/cgroup")) -> List[int]:
+    """PIDs in a cgroup (path as systemd's ControlGroup, e.g. /system.slice/nginx.service).
+
+    cgroup v2 first, then the v1 name=systemd hierarchy. Includes child cgroups.
+    """
+    for base in (sys_fs, sys_fs / "systemd", sys_fs / "unified"):
+        root = base / cgroup.lstrip("/")
+        if not (root / "cgroup.procs").exists():
+            continue
+        pids = []
+        for procs in root.glob("**/cgroup.procs"):  # ** includes root itself
+            try:
+                pids += [int(x) for x in procs.read_text().split()]
+            except (OSError, ValueError):
+                continue
+        return sorted(set(pids))
+    return []
+
+
+def _unescape(s: str) -> str:
+    """Mount paths in /proc/mounts escape spaces etc as \\040."""
+    return _OCTAL_ESC.sub(lambda m: chr(int(m.group(1), 8)), s)
+
+
+def read_mounts(proc: Path = PROC) -> List[Dict[str, str]]:
+    """Parse /proc/mounts."""
+    mounts = []
+    for line in (proc / "mounts").read_text().splitlines():
+        parts = line.split()
+        if len(parts) < 4:
+            continue
+        mounts.append({
+            "device": _unescape(parts[0]),
+            "mountpoint": _unescape(parts[1]),
+            "fstype": parts[2],
+            "options": parts[3],
+        })
+    return mounts
+
+
+def filesystem_usage(mounts: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+    """statvfs every real filesystem, roughly what `df` shows.
+
+    Pseudo filesystems (zero blocks) are dropped like df does. Network
+    filesystems are listed but not statvfs'd - see NETWORK_FS.
+    """
+    out = []
+    seen = set()
+    for m in mounts:
+        mp = m["mountpoint"]
+        if mp in seen:
+            continue
+        seen.add(mp)
+        entry: Dict[str, Any] = dict(m)
+        if m["fstype"] in NETWORK_FS:
+            entry["skipped"] = "network filesystem"
+            out.append(entry)
+            continue
+        try:
+            st = os.statvfs(mp)
+        except OSError as e:
+            entry["error"] = str(e)
+            out.append(entry)
+            continue
+        if st.f_blocks == 0:
+            continue
+        size = st.f_blocks * st.f_frsize
+        free = st.f_bfree * st.f_frsize
+        avail = st.f_bavail * st.f_frsize
+        entry.update({
+            "size": size,
+            "used": size - free,
+            "avail": avail,
+            "inodes": st.f_files,
+            "inodes_free": st.f_ffree,
+        })
+        out.append(entry)
+    return out
+
+
+def _read_sys(path: Path, default: str = "") -> str:
+    try:
+        return path.read_text().strip()
+    except OSError:
+        return default
+
+
+def block_devices(sys_block: Path = SYS_BLOCK) -> List[Dict[str, Any]]:
+    """Block devices and their partitions from /sys/block, like a tiny lsblk."""
+    devices = []
+    try:
+        names = sorted(p.name for p in sys_block.iterdir())
+    except OSError:
+        return devices
+    for name in names:
+        d = sys_block / name
+        size = int(_read_sys(d / "size", "0") or 0) * 512
+        if size == 0:
+            continue  # empty loop/ram devices, lsblk hides these too
+        dev = {
+            "name": name,
+            "type": "disk",
+            "size": size,
+            "ro": _read_sys(d / "ro") == "1",
+            "rotational": _read_sys(d / "queue/rotational") == "1",
+            "removable": _read_sys(d / "removable") == "1",
+            "model": _read_sys(d / "device/model"),
+            "partitions": [],
+        }
+        try:
+            children = sorted(c for c in d.iterdir() if (c / "partition").exists())
+        except OSError:
+            children = []
+        for part in children:
+            dev["partitions"].append({
+                "name": part.name,
+                "type": "part",
+                "size": int(_read_sys(part / "size", "0") or 0) * 512,
+                "ro": _read_sys(part / "ro") == "1",
+            })
+        devices.append(dev)
+    return devices
+
+
+def human_bytes(n: float) -> str:
+    """Format like `free -h` / `df -h` (Ki, Mi, Gi...)."""
+    if abs(n) < 1024:
+        return f"{int(n)}B"
+    for unit in ("Ki", "Mi", "Gi", "Ti"):
+        n /= 1024
+        if abs(n) < 1024 or unit == "Ti":
+            break
+    return f"{n:.1f}{unit}" if abs(n) < 10 else f"{n:.0f}{unit}"
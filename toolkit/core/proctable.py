@@ -0,0 +1,163 @@
+"""Per-process table for everything in a unit's cgroup.
+
+MainPID is rarely the interesting process - nginx workers, postgres
+backends and gunicorn children are all somewhere else in the cgroup. This
+reads every PID in it straight from /proc: stat, status, io,
+smaps_rollup, cmdline and the fd count. No `ps` - a fork per process (or
+one `ps` walking all of /proc) is exactly what's slow when the box is in
+trouble.
+
+One pass reads around six small files per process - about 0.2ms each,
+so ~0.5s for 2,000 postgres backends. Past POOL_THRESHOLD PIDs (with more
+than one CPU) the reads are spread over a few threads. smaps_rollup is
+the expensive one since the kernel walks the page tables, and reads
+release the GIL.
+"""
+
+from __future__ import annotations
+
+import os
+import pwd
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Sequence
+
+from toolkit.core import procfs
+
+POOL_THRESHOLD = 1000
+POOL_WORKERS = 4
+
+_CLK_TCK = os.sysconf("SC_CLK_TCK")
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+# Column order for processes.json rows and the text table
+COLUMNS = (
+    "pid", "ppid", "user", "state", "threads", "cpu_pct", "cpu_sec", "rss", "pss",
+    "private", "swap", "read_bytes", "write_bytes", "fds", "started_sec_ago", "comm", "cmdline",
+)
+
+_users: Dict[int, str] = {}
+
+
+def _user(uid: int | None) -> str:
+    if uid is None:
+        return "?"
+    name = _users.get(uid)
+    if name is None:
+        try:
+            name = pwd.getpwuid(uid).pw_name
+        except KeyError:
+            name = str(uid)
+        _users[uid] = name
+    return name
+
+
+def read_process(pid: int, uptime: float, proc: Path = procfs.PROC) -> Dict[str, Any] | None:
+    """One table row. None if the process is gone. Fields we aren't
+    allowed to read (io, smaps_rollup, fd without root) are None."""
+    try:
+        st = procfs.read_pid_stat(pid, proc)
+        status = procfs.read_pid_status(pid, proc)
+        cmdline = procfs.read_pid_cmdline(pid, proc)
+    except (OSError, ValueError, IndexError):
+        return None  # gone, or exited halfway through a read
+
+    cpu_sec = (st["utime"] + st["stime"]) / _CLK_TCK
+    age = max(uptime - st["starttime"] / _CLK_TCK, 0.0)
+    row: Dict[str, Any] = {
+        "pid": pid,
+        "ppid": st["ppid"],
+        "user": _user(status.get("uid")),
+        "state": st["state"],
+        "threads": st["threads"],
+        # Like ps: average over the process's life, not right now
+        "cpu_pct": round(cpu_sec * 100 / age, 1) if age > 0 else 0.0,
+        "cpu_sec": round(cpu_sec, 2),
+        "rss": st["rss_pages"] * _PAGE_SIZE,
+        "pss": None,
+        "private": None,
+        "swap": status.get("swap"),
+        "read_bytes": None,
+        "write_bytes": None,
+        "fds": None,
+        "started_sec_ago": round(age),
+        "comm": st["comm"],
+        "cmdline": cmdline,
+    }
+    try:
+        sm = procfs.read_smaps_rollup(pid, proc)
+        row["pss"] = sm.get("Pss")
+        row["private"] = sm.get("Private_Clean", 0) + sm.get("Private_Dirty", 0)
+        row["swap"] = sm.get("Swap", row["swap"])
+    except OSError:
+        pass
+    try:
+        io = procfs.read_pid_io(pid, proc)
+        row["read_bytes"] = io.get("read_bytes")
+        row["write_bytes"] = io.get("write_bytes")
+    except OSError:
+        pass
+    try:
+        row["fds"] = procfs.pid_fd_count(pid, proc)
+    except OSError:
+        pass
+    return row
+
+
+def snapshot(pids: Sequence[int], proc: Path = procfs.PROC) -> Dict[str, Any]:
+    """Read every pid. Rows sorted by RSS, then CPU time, biggest first."""
+    started = time.monotonic()
+    try:
+        uptime = procfs.read_uptime(proc)
+    except (OSError, ValueError):
+        uptime = 0.0
+    workers = min(POOL_WORKERS, os.cpu_count() or 1)
+    if len(pids) > POOL_THRESHOLD and workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            rows = list(pool.map(lambda p: read_process(p, uptime, proc), pids, chunksize=64))
+    else:
+        rows = [read_process(p, uptime, proc) for p in pids]
+    live = [r for r in rows if r is not None]
+    live.sort(key=lambda r: (r["rss"], r["cpu_sec"]), reverse=True)
+
+    def _total(col: str) -> float | None:
+        vals = [r[col] for r in live if r[col] is not None]
+        return round(sum(vals), 2) if vals else None
+
+    return {
+        "count": len(live),
+        "vanished": len(rows) - len(live),
+        "read_ms": round((time.monotonic() - started) * 1000, 1),
+        "totals": {c: _total(c) for c in ("threads", "cpu_sec", "rss", "pss", "private", "swap",
+                                          "read_bytes", "write_bytes", "fds")},
+        "rows": live,
+    }
+
+
+def _h(n: int | None) -> str:
+    return "-" if n is None else procfs.human_bytes(n)
+
+
+def format_table(rows: List[Dict[str, Any]], cmd_width: int = 80) -> str:
+    """ps-ish text table. Sizes human readable, unreadable fields as '-'."""
+    head = (f"{'PID':>8} {'PPID':>8} {'USER':<10} S {'THR':>4} {'%CPU':>6} {'TIME':>9} "
+            f"{'RSS':>7} {'PSS':>7} {'PRIV':>7} {'SWAP':>7} {'READ':>7} {'WRITE':>7} "
+            f"{'FDS':>6}  COMMAND")
+    lines = [head]
+    for r in rows:
+        mins, secs = divmod(int(r["cpu_sec"]), 60)
+        cmd = " ".join(r["cmdline"].split()) or f"[{r['comm']}]"  # argv can hold newlines
+        lines.append(
+            f"{r['pid']:>8} {r['ppid']:>8} {r['user'][:10]:<10} {r['state']} {r['threads']:>4} "
+            f"{r['cpu_pct']:>6.1f} {mins:>6}:{secs:02d} {_h(r['rss']):>7} {_h(r['pss']):>7} "
+            f"{_h(r['private']):>7} {_h(r['swap']):>7} {_h(r['read_bytes']):>7} "
+            f"{_h(r['write_bytes']):>7} {'-' if r['fds'] is None else r['fds']:>6}  "
+            f"{cmd[:cmd_width]}"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def to_columns(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Rows as {"columns": [...], "rows": [[...]]} - a third the size of a list of dicts."""
+    return {"columns": list(COLUMNS), "rows": [[r[c] for c in COLUMNS] for r in rows]}
@@ -0,0 +1,362 @@
+"""Flight recorder - the last N minutes of host and unit samples, in memory.
+
+By the time someone runs `incident collect` the spike is usually over,
+and vmstat/ps only show what things look like now. `toolkit record`
+runs all the time and samples a handful of cheap /proc files every
+interval_sec into fixed-size rings:
+
+  * host: /proc/stat CPU jiffies, ctxt, procs_running/blocked,
+    /proc/meminfo, /proc/pressure/{cpu,memory,io}
+  * per unit: every PID in the unit's cgroup - /proc/<pid>/stat and io
+
+Rings are flat array('d') buffers sized up front (history_min worth of
+rows), so memory is fixed no matter how long it runs - 30 min at 1s is
+~150KB for the host plus ~60KB per unit. A sample is a few small file
+reads and no forks; cost is tracked and shows up in the dump.
+
+Counters are stored raw; rates (CPU %, stall %, bytes/s) are worked
+out when the history is dumped. Collections fetch it over a unix socket
+(see serve/fetch), so a bundle gets the minutes before it was asked for.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import socket
+import socketserver
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Sequence
+
+from toolkit.core import procfs
+from toolkit.core.runner import run_cmd
+
+SOCKET_NAME = ".recorder.sock"
+
+HOST_FIELDS = (
+    "ts", *procfs.CPU_FIELDS, "ctxt", "procs_running", "procs_blocked",
+    "mem_available", "swap_used", "dirty",
+    "psi_cpu_some", "psi_memory_some", "psi_memory_full", "psi_io_some", "psi_io_full",
+)
+UNIT_FIELDS = ("ts", "pids", "threads", "utime", "stime", "rss_bytes", "read_bytes", "write_bytes")
+
+# Don't ask systemd for a unit's cgroup more often than this while it's missing
+CGROUP_RETRY_SEC = 60
+
+_NAN = math.nan
+_CLK_TCK = os.sysconf("SC_CLK_TCK")
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+class Ring:
+    """Fixed number of float rows in one flat array. Oldest rows get overwritten."""
+
+    def __init__(self, fields: Sequence[str], capacity: int):
+        self.fields = tuple(fields)
+        self.width = len(self.fields)
+        self.capacity = capacity
+        self.count = 0
+        self._next = 0
+        self._data = array("d", bytes(8 * self.width * capacity))
+
+    @property
+    def nbytes(self) -> int:
+        return self._data.itemsize * len(self._data)
+
+    def append(self, row: Sequence[float]) -> None:
+        off = self._next * self.width
+        self._data[off:off + self.width] = array("d", row)
+        self._next = (self._next + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def rows(self, since: float = 0.0) -> List[List[float]]:
+        """Rows oldest first, those with ts >= since."""
+        out = []
+        start = (self._next - self.count) % self.capacity
+        for i in range(self.count):
+            off = ((start + i) % self.capacity) * self.width
+            if self._data[off] >= since:
+                out.append(self._data[off:off + self.width].tolist())
+        return out
+
+
+def _pct(delta: float, whole: float) -> float:
+    return round(100.0 * delta / whole, 2) if whole > 0 else _NAN
+
+
+def _per_sec(delta: float, dt: float) -> float:
+    # Sums over a unit's PIDs drop when a process exits - never report < 0
+    return round(max(0.0, delta) / dt) if dt > 0 and not math.isnan(delta) else _NAN
+
+
+def _host_rates(prev: Dict[str, float], cur: Dict[str, float]) -> List[float]:
+    d = {k: cur[k] - prev[k] for k in cur}
+    dt = d["ts"]
+    jiffies = sum(d[k] for k in procfs.CPU_FIELDS)
+    row = [
+        round(cur["ts"], 3),
+        _pct(d["user"] + d["nice"], jiffies),
+        _pct(d["system"] + d["irq"] + d["softirq"], jiffies),
+        _pct(d["iowait"], jiffies),
+        _pct(d["steal"], jiffies),
+        _pct(d["idle"], jiffies),
+        _per_sec(d["ctxt"], dt),
+        cur["procs_running"], cur["procs_blocked"],
+        cur["mem_available"], cur["swap_used"], cur["dirty"],
+    ]
+    # PSI totals are microseconds stalled
+    row += [_pct(d[k], dt * 1e6) for k in HOST_FIELDS if k.startswith("psi_")]
+    return row
+
+
+HOST_RATE_FIELDS = (
+    "ts", "cpu_user_pct", "cpu_system_pct", "cpu_iowait_pct", "cpu_steal_pct", "cpu_idle_pct",
+    "ctxt_per_sec", "procs_running", "procs_blocked", "mem_available", "swap_used", "dirty",
+    *(f"{k}_pct" for k in HOST_FIELDS if k.startswith("psi_")),
+)
+
+
+def _unit_rates(prev: Dict[str, float], cur: Dict[str, float]) -> List[float]:
+    dt = cur["ts"] - prev["ts"]
+    ticks = max(0.0, cur["utime"] + cur["stime"] - prev["utime"] - prev["stime"])
+    return [
+        round(cur["ts"], 3), cur["pids"], cur["threads"],
+        _pct(ticks / _CLK_TCK, dt),
+        cur["rss_bytes"],
+        _per_sec(cur["read_bytes"] - prev["read_bytes"], dt),
+        _per_sec(cur["write_bytes"] - prev["write_bytes"], dt),
+    ]
+
+
+UNIT_RATE_FIELDS = ("ts", "pids", "threads", "cpu_pct", "rss_bytes",
+                    "read_bytes_per_sec", "write_bytes_per_sec")
+
+
+def _rated(ring_rows: List[List[float]], fields: Sequence[str], fn) -> List[List[Any]]:
+    out = []
+    for prev, cur in zip(ring_rows, ring_rows[1:], strict=False):
+        # ring rows are always len(fields) wide
+        row = fn(dict(zip(fields, prev, strict=True)), dict(zip(fields, cur, strict=True)))
+        # NaN = couldn't read it - null in JSON, empty in CSV
+        out.append([None if math.isnan(v) else int(v) if float(v).is_integer() else v
+                    for v in row])
+    return out
+
+
+class Recorder:
+    """Samples host + units into rings. run() blocks; stop() ends it."""
+
+    def __init__(self, units: List[str], interval_sec: float = 1.0, history_min: float = 30):
+        self.interval = max(0.1, float(interval_sec))
+        capacity = max(2, int(history_min * 60 / self.interval) + 1)
+        self.history_min = history_min
+        self.host = Ring(HOST_FIELDS, capacity)
+        self.units = {u: Ring(UNIT_FIELDS, capacity) for u in units}
+        self.started = time.time()
+        self.samples = 0
+        self.missed = 0  # intervals skipped because a sample ran late
+        self.cpu_sec = 0.0
+        self.unreadable: Dict[str, str] = {}  # what we couldn't read and why (first error)
+        self._cgroups: Dict[str, str] = {}
+        self._cg_tried: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def run(self) -> None:
+        next_t = time.monotonic()
+        while not self._stop.is_set():
+            self.sample()
+            next_t += self.interval
+            now = time.monotonic()
+            if next_t < now:
+                # Box is too busy to keep up - skip rather than burst
+                skipped = int((now - next_t) / self.interval) + 1
+                self.missed += skipped
+                next_t += skipped * self.interval
+            self._stop.wait(next_t - now)
+
+    def sample(self) -> None:
+        t0 = time.thread_time()
+        ts = time.time()
+        host = [ts] + self._host_values()
+        units = {u: [ts] + self._unit_values(u) for u in self.units}
+        with self._lock:
+            self.host.append(host)
+            for u, row in units.items():
+                self.units[u].append(row)
+            self.samples += 1
+            self.cpu_sec += time.thread_time() - t0
+
+    def _note(self, what: str, err: Exception) -> None:
+        self.unreadable.setdefault(what, str(err))
+
+    def _host_values(self) -> List[float]:
+        vals: List[float] = []
+        try:
+            cpus, counters = procfs.read_stat(per_cpu=False)
+            cpu = cpus.get("cpu", [])[:len(procfs.CPU_FIELDS)]
+            vals += cpu + [_NAN] * (len(procfs.CPU_FIELDS) - len(cpu))  # old kernels: no steal
+            vals += [counters.get(k, _NAN) for k in ("ctxt", "procs_running", "procs_blocked")]
+        except (OSError, ValueError, IndexError) as e:
+            self._note("/proc/stat", e)
+            vals += [_NAN] * (len(procfs.CPU_FIELDS) + 3)
+        try:
+            mi = procfs.read_meminfo()
+            vals += [mi.get("MemAvailable", _NAN),
+                     mi.get("SwapTotal", 0) - mi.get("SwapFree", 0), mi.get("Dirty", _NAN)]
+        except (OSError, ValueError) as e:
+            self._note("/proc/meminfo", e)
+            vals += [_NAN] * 3
+        for res, kinds in (("cpu", ("some",)), ("memory", ("some", "full")),
+                           ("io", ("some", "full"))):
+            psi = procfs.read_pressure(res)
+            vals += [psi.get(k, {}).get("total", _NAN) for k in kinds]
+        return vals
+
+    def _cgroup(self, unit: str) -> str:
+        cg = self._cgroups.get(unit, "")
+        last = self._cg_tried.get(unit, 0.0)
+        if not cg and time.monotonic() - last >= CGROUP_RETRY_SEC:
+            self._cg_tried[unit] = time.monotonic()
+            r = run_cmd(["systemctl", "show", "-p", "ControlGroup", "--value", unit], timeout_sec=5)
+            cg = r.stdout.strip() if r.returncode == 0 else ""
+            self._cgroups[unit] = cg
+        return cg
+
+    def _unit_values(self, unit: str) -> List[float]:
+        cg = self._cgroup(unit)
+        pids = procfs.cgroup_pids(cg) if cg else []
+        if cg and not pids:
+            self._cgroups[unit] = ""  # stopped, or moved - look it up again later
+        threads = utime = stime = rss = rd = wr = 0
+        io_ok = True
+        for pid in pids:
+            try:
+                st = procfs.read_pid_stat(pid)
+            except (OSError, ValueError, IndexError):
+                continue  # exited between listing and reading
+            threads += st["threads"]
+            utime += st["utime"]
+            stime += st["stime"]
+            rss += st["rss_pages"] * _PAGE_SIZE
+            if io_ok:
+                try:
+                    io = procfs.read_pid_io(pid)
+                    rd += io.get("read_bytes", 0)
+                    wr += io.get("write_bytes", 0)
+                except PermissionError as e:
+                    self._note(f"/proc/<pid>/io ({unit})", e)
+                    io_ok = False
+                except OSError:
+                    pass
+        if not io_ok:
+            rd = wr = _NAN
+        return [len(pids), threads, utime, stime, rss, rd, wr]
+
+    def dump(self, minutes: float | None = None) -> Dict[str, Any]:
+        """Last `minutes` of history (all of it by default), as rates."""
+        since = time.time() - minutes * 60 if minutes else 0.0
+        with self._lock:
+            host_rows = self.host.rows(since)
+            unit_rows = {u: r.rows(since) for u, r in self.units.items()}
+            info = {
+                "started": self.started,
+                "interval_sec": self.interval,
+                "history_min": self.history_min,
+                "samples": self.samples,
+                "missed_intervals": self.missed,
+                "sampler_cpu_sec": round(self.cpu_sec, 3),
+                "avg_sample_ms": (round(1000 * self.cpu_sec / self.samples, 3)
+                                  if self.samples else None),
+                "ring_bytes": self.host.nbytes + sum(r.nbytes for r in self.units.values()),
+                "unreadable": dict(self.unreadable),
+            }
+        info["host"] = {"fields": list(HOST_RATE_FIELDS),
+                        "rows": _rated(host_rows, HOST_FIELDS, _host_rates)}
+        info["units"] = {
+            u: {"cgroup": self._cgroups.get(u, ""), "fields": list(UNIT_RATE_FIELDS),
+                "rows": _rated(rows, UNIT_FIELDS, _unit_rates)}
+            for u, rows in unit_rows.items()
+        }
+        return info
+
+
+# -- socket --
+#
+# One JSON object per line in, one JSON document back, then close:
+#   {"cmd": "dump", "minutes": 10}  -> Recorder.dump()
+#   {"cmd": "collect"}              -> starts a collection, {"ok": true/false}
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        srv = self.server
+        try:
+            req = json.loads(self.rfile.readline(4096) or b"{}")
+        except ValueError:
+            req = {}
+        cmd = req.get("cmd")
+        if cmd == "dump":
+            resp = srv.recorder.dump(req.get("minutes"))
+        elif cmd == "collect" and srv.on_collect is not None:
+            resp = {"ok": srv.on_collect()}
+        else:
+            resp = {"error": f"unknown command {cmd!r}"}
+        self.wfile.write(json.dumps(resp, separators=(",", ":")).encode("utf-8"))
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(recorder: Recorder, path: Path,
+          on_collect: Callable[[], bool] | None = None) -> socketserver.BaseServer:
+    """Answer dump/collect requests on a unix socket (owner-only), in a thread."""
+    path = Path(path)
+    if path.exists():
+        if fetch(path, minutes=0.01, timeout=1) is not None:
+            raise RuntimeError(f"a recorder is already listening on {path}")
+        path.unlink()  # left over from a recorder that died
+    old = os.umask(0o177)
+    try:
+        srv = _Server(str(path), _Handler)
+    finally:
+        os.umask(old)
+    srv.recorder = recorder
+    srv.on_collect = on_collect
+    threading.Thread(target=srv.serve_forever, name="recorder-socket", daemon=True).start()
+    return srv
+
+
+def _request(path: Path, req: Dict[str, Any], timeout: float) -> Dict[str, Any] | None:
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.settimeout(timeout)
+            s.connect(str(path))
+            s.sendall(json.dumps(req).encode("utf-8") + b"\n")
+            buf = bytearray()
+            while True:
+                piece = s.recv(65536)
+                if not piece:
+                    break
+                buf += piece
+        return json.loads(buf)
+    except (OSError, ValueError):
+        return None
+
+
+def fetch(path: Path, minutes: float | None = None, timeout: float = 5) -> Dict[str, Any] | None:
+    """History from a running recorder, None if there isn't one."""
+    return _request(path, {"cmd": "dump", "minutes": minutes}, timeout)
+
+
+def trigger(path: Path, timeout: float = 5) -> bool:
+    """Ask a running recorder to start a collection."""
+    resp = _request(path, {"cmd": "collect"}, timeout)
+    return bool(resp and resp.get("ok"))
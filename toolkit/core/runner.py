@@ -2,12 +2,24 @@
 
 from __future__ import annotations
 
+import os
 import shutil
+import signal
 import subprocess
 import sys
+import threading
+import time
 from dataclasses import dataclass
+from pathlib import Path
 from typing import Sequence
 
+from toolkit import startup
+from toolkit.core import trace
+
+# Read size for pipes - big enough to keep syscalls down, small enough
+# that a runaway command never costs us more than this per read
+_CHUNK = 64 * 1024
+
 
 @dataclass
 class CmdResult:
@@ -18,15 +30,225 @@ class CmdResult:
     stdout: str
     stderr: str
     timed_out: bool = False
+    truncated: bool = False   # hit max_bytes, child was killed
+    stdout_bytes: int = 0     # bytes of stdout actually kept
+    path: Path | None = None  # set when stdout was streamed to a file
 
 _REQUIRED_CMDS = ["systemctl", "journalctl", "bash"]
 
-_missing = [c for c in _REQUIRED_CMDS if shutil.which(c) is None]
-if _missing:
-    print(
-        f"Missing required commands: {', '.join(_missing)}\n"
-        f"Are you on a systemd-based distro? This won't work on Alpine/WSL1.",
-        file=sys.stderr,
+_env_checked = False
+
+
+def check_environment() -> None:
+    """Warn (once per process) if the commands we depend on aren't there.
+
+    Done on first command rather than at import - three PATH walks on
+    every `toolkit` invocation, even ones that never run a command.
+    """
+    global _env_checked
+    if _env_checked:
+        return
+    _env_checked = True
+    missing = [c for c in _REQUIRED_CMDS if shutil.which(c) is None]
+    if missing:
+        print(
+            f"Missing required commands: {', '.join(missing)}\n"
+            f"Are you on a systemd-based distro? This won't work on Alpine/WSL1.",
+            file=sys.stderr,
+        )
+
+
+class _CappedSink:
+    """Keeps up to max_bytes of a stream, either in memory or in a file.
+
+    write() returns False once the cap is hit so the reader can stop.
+
+    With tail=True it keeps the *last* max_bytes instead (starting at a line
+    boundary) - for logs, where the newest lines are the ones you want. It
+    has to read the whole stream for that, so the data is held in memory
+    (up to 2x max_bytes) and only written to `path` on close.
+    """
+
+    def __init__(self, max_bytes: int, path: Path | None = None, tail: bool = False):
+        self.max_bytes = max_bytes
+        self.written = 0
+        self.seen = 0  # bytes offered, kept or not
+        self.truncated = False
+        self.tail = tail
+        self.path = path
+        self._buf = bytearray()
+        self._trailer = bytearray()
+        self._f = None
+        self._final = False
+        if path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._f = open(path, "wb")
+
+    def write(self, data: bytes) -> bool:
+        self.seen += len(data)
+        if self.tail:
+            self._buf += data
+            if len(self._buf) > 2 * self.max_bytes:
+                # Trim in big steps so this stays amortized O(n)
+                del self._buf[:len(self._buf) - self.max_bytes]
+                self.truncated = True
+            self.written = min(len(self._buf), self.max_bytes)
+            return True
+        room = self.max_bytes - self.written
+        if len(data) > room:
+            data = data[:room]
+            self.truncated = True
+        if data:
+            if self._f is not None:
+                self._f.write(data)
+            else:
+                self._buf += data
+            self.written += len(data)
+        return not self.truncated
+
+    def append_raw(self, data: bytes) -> None:
+        """Append trailer bytes (stderr etc) without counting against the cap."""
+        if self.tail and not self._final:
+            self._trailer += data
+        elif self._f is not None:
+            self._f.write(data)
+        else:
+            self._buf += data
+
+    def settle(self) -> None:
+        """Tail mode: pick the final tail and flush it. Called once the stream ends."""
+        if not self.tail or self._final:
+            return
+        self._final = True
+        if len(self._buf) > self.max_bytes:
+            cut = len(self._buf) - self.max_bytes
+            nl = self._buf.find(b"\n", cut)
+            del self._buf[:nl + 1 if nl != -1 else cut]
+            self.truncated = True
+        self.written = len(self._buf)
+        self._buf += self._trailer
+        if self._f is not None:
+            self._f.write(self._buf)
+            self._buf = bytearray()
+
+    def text(self) -> str:
+        self.settle()
+        return self._buf.decode("utf-8", errors="replace")
+
+    def close(self) -> None:
+        self.settle()
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+
+def _kill_group(pid: int) -> None:
+    """Kill the child and anything it spawned (bash pipelines etc).
+
+    Children are started with start_new_session, so pid is also the group.
+    """
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _drain(stream, sink: _CappedSink) -> None:
+    """Read a pipe to EOF, keeping only what fits in the sink."""
+    while True:
+        chunk = stream.read1(_CHUNK)
+        if not chunk:
+            break
+        sink.write(chunk)
+
+
+def _stream(
+    cmd: Sequence[str],
+    out: _CappedSink,
+    timeout_sec: float,
+    max_bytes: int,
+) -> CmdResult:
+    """Run cmd, feeding stdout into `out` as it arrives.
+
+    The child runs in its own session so a timeout or a hit cap kills the
+    whole group - `bash -lc` pipelines included, not just the shell.
+    """
+    check_environment()
+    startup.command_started(cmd)
+    parent = trace.current()
+    started = time.monotonic()
+    r = _spawn(cmd, out, timeout_sec, max_bytes)
+    if parent is not None:
+        parent.tracer.command(parent, cmd, started, started, time.monotonic(), r)
+    return r
+
+
+def _spawn(
+    cmd: Sequence[str],
+    out: _CappedSink,
+    timeout_sec: float,
+    max_bytes: int,
+) -> CmdResult:
+    try:
+        p = subprocess.Popen(
+            list(cmd),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            start_new_session=True,
+        )
+    except FileNotFoundError:
+        return CmdResult(
+            cmd=cmd,
+            returncode=127,
+            stdout="",
+            stderr=f"Command not found: {cmd[0]}. Check your PATH or install it.",
+            timed_out=False,
+        )
+
+    err = _CappedSink(max_bytes)
+    err_thread = threading.Thread(target=_drain, args=(p.stderr, err), daemon=True)
+    err_thread.start()
+
+    timed_out = threading.Event()
+
+    def _on_timeout():
+        timed_out.set()
+        _kill_group(p.pid)
+
+    timer = threading.Timer(timeout_sec, _on_timeout)
+    timer.daemon = True
+    timer.start()
+    try:
+        while True:
+            chunk = p.stdout.read1(_CHUNK)
+            if not chunk:
+                break
+            if not out.write(chunk):
+                # Got what we came for - don't let it keep producing
+                _kill_group(p.pid)
+                break
+        p.stdout.close()
+        err_thread.join()
+        p.stderr.close()
+        returncode = p.wait()
+    except BaseException:
+        _kill_group(p.pid)
+        raise
+    finally:
+        timer.cancel()
+
+    if timed_out.is_set():
+        returncode = 124  # Same as GNU timeout
+
+    return CmdResult(
+        cmd=cmd,
+        returncode=returncode,
+        stdout="",
+        stderr=err.text(),
+        timed_out=timed_out.is_set(),
+        truncated=out.truncated,
+        stdout_bytes=out.written,
     )
 
 
@@ -45,48 +267,31 @@ def run_cmd(
     Returns:
         CmdResult with output and status
     """
+    out = _CappedSink(max_bytes)
+    r = _stream(cmd, out, timeout_sec, max_bytes)
+    r.stdout = out.text()
+    return r
+
+
+def run_cmd_to_file(
+    cmd: Sequence[str],
+    path: Path,
+    timeout_sec: int = 10,
+    max_bytes: int = 2_000_000,
+) -> CmdResult:
+    """Run a command and stream its stdout straight into `path`.
+
+    Nothing bigger than one pipe read is ever held in memory, so a
+    journalctl that wants to emit 400MB costs the same as one that emits
+    4KB. Once max_bytes is written the child is killed and the result is
+    marked truncated. stderr is appended after a blank line, same layout
+    the collectors have always written.
+    """
+    out = _CappedSink(max_bytes, path)
     try:
-        p = subprocess.run(
-            list(cmd),
-            capture_output=True,
-            text=True,
-            timeout=timeout_sec,
-            check=False,
-            errors="replace",
-        )
-        out = (p.stdout or "")[:max_bytes]
-        err = (p.stderr or "")[:max_bytes]
-        return CmdResult(
-            cmd=cmd,
-            returncode=p.returncode,
-            stdout=out,
-            stderr=err,
-            timed_out=False,
-        )
-    except subprocess.TimeoutExpired as e:
-        # Partial output is still useful for debugging hangs
-        out = (
-            e.stdout.decode(errors="replace")
-            if isinstance(e.stdout, (bytes, bytearray))
-            else (e.stdout or "")
-        )
-        err = (
-            e.stderr.decode(errors="replace")
-            if isinstance(e.stderr, (bytes, bytearray))
-            else (e.stderr or "")
-        )
-        return CmdResult(
-            cmd=cmd,
-            returncode=124,  # Same as GNU timeout
-            stdout=out[:max_bytes],
-            stderr=err[:max_bytes],
-            timed_out=True,
-        )
-    except FileNotFoundError:
-        return CmdResult(
-            cmd=cmd,
-            returncode=127,
-            stdout="",
-            stderr=f"Command not found: {cmd[0]}. Check your PATH or install it.",
-            timed_out=False,
-        )
+        r = _stream(cmd, out, timeout_sec, max_bytes)
+        out.append_raw(b"\n\n" + r.stderr.encode("utf-8", errors="replace"))
+    finally:
+        out.close()
+    r.path = path
+    return r
@@ -0,0 +1,221 @@
+"""Collector scheduling - volatile data first, and a record of when each ran.
+
+Some of what goes in a bundle changes second to second (the process
+snapshot, socket tables, memory, recorder history) and some barely
+changes at all (journal history, unit file, hardening report). With
+every collector started at once in whatever order, the volatile ones
+could sit behind journalctl at the engine's concurrency limit - and by
+the time they ran, the thing they were meant to catch was gone.
+
+Each collector kind has a CollectorSpec: a volatility class, a rough
+cost, and whether it needs the unit's `systemctl show` properties. The
+scheduler
+
+  * runs each job with priority = its volatility class, which the engine
+    uses as the command priority - when all slots are busy, volatile
+    commands get the next free one. In parallel mode every job starts
+    right away, so that priority is what actually orders the work
+  * orders jobs volatile -> stable, cheap -> expensive. That's the
+    submission order, and the run order with --serial
+  * prefetches `systemctl show` for units whose collectors need unit
+    properties, before any job starts, at the priority of the most
+    volatile of them
+  * records queue/start/end per collector (seconds since the run started)
+    for meta.json, so you can tell how far apart in time two files are
+
+With a deadline the engine still kills whatever is running when it
+hits - the ordering just makes sure that's the stable stuff. Nothing is
+skipped to fit the deadline (a cut-off journal still beats none); a job
+that starts with less time left than its estimate is just marked
+`expect_cut` in the timeline.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import sys
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeout
+from concurrent.futures import wait as futures_wait
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+from toolkit.core.context import CollectionContext
+from toolkit.core.engine import command_priority
+
+VOLATILE, NORMAL, STABLE = 0, 1, 2
+CLASS_NAMES = {VOLATILE: "volatile", NORMAL: "normal", STABLE: "stable"}
+
+# The memoized `systemctl show` in CollectionContext, prefetched for jobs
+# that list it in `needs`
+UNIT_PROPERTIES = "unit_properties"
+
+
+@dataclass(frozen=True)
+class CollectorSpec:
+    volatility: int
+    cost_sec: float  # rough wall time on a healthy box - only used for ordering
+    needs: Tuple[str, ...] = ()
+
+
+SPECS: Dict[str, CollectorSpec] = {
+    "recorder": CollectorSpec(VOLATILE, 0.1),
+    "process": CollectorSpec(VOLATILE, 0.3, needs=(UNIT_PROPERTIES,)),
+    "resource": CollectorSpec(VOLATILE, 1.0),
+    "cgroup": CollectorSpec(VOLATILE, 1.0, needs=(UNIT_PROPERTIES,)),
+    "systemd": CollectorSpec(NORMAL, 0.5),
+    "hardening": CollectorSpec(STABLE, 0.5, needs=(UNIT_PROPERTIES,)),
+    "journald": CollectorSpec(STABLE, 3.0),
+}
+
+_DEFAULT_SPEC = CollectorSpec(NORMAL, 1.0)
+
+
+@dataclass
+class Job:
+    name: str                        # "journald", or "nginx/journald" with several services
+    kind: str                        # key into SPECS
+    fn: Callable[[Path], None]
+    out_dir: Path
+    unit: str | None = None
+    priority: int = field(default=NORMAL, init=False)
+
+    @property
+    def spec(self) -> CollectorSpec:
+        return SPECS.get(self.kind, _DEFAULT_SPEC)
+
+
+def plan(jobs: List[Job]) -> List[Job]:
+    """Run order, and each job's priority (its volatility class)."""
+    for j in jobs:
+        j.priority = j.spec.volatility
+    return sorted(jobs, key=lambda j: (j.priority, j.spec.cost_sec, j.name))
+
+
+class Scheduler:
+    """Runs collector jobs in plan() order and keeps their timeline."""
+
+    def __init__(self, ctx: CollectionContext):
+        self.ctx = ctx
+        self.engine = ctx.engine
+        self.started = datetime.now(timezone.utc)
+        self._t0 = time.monotonic()
+        self.deadline_left_sec = self.engine.remaining()
+        self.order: List[Job] = []
+        self.timeline: Dict[str, Dict[str, Any]] = {}
+        self._futures: Dict[str, Future] = {}
+
+    def _now(self) -> float:
+        return round(time.monotonic() - self._t0, 3)
+
+    def run(self, jobs: List[Job], on_finish: Callable[[str], None],
+            serial: bool = False) -> Tuple[List[str], List[str], List[str]]:
+        """Run everything. on_finish(name) is called from this thread as
+        each job returns (or fails). Returns (done, failed, stuck) names -
+        stuck ones were still running at the deadline; on_finish isn't
+        called for them, and they may still be writing (see join())."""
+        self.order = plan(jobs)
+        for j in self.order:
+            s = j.spec
+            self.timeline[j.name] = {
+                "class": CLASS_NAMES.get(s.volatility, str(s.volatility)),
+                "priority": j.priority,
+                "est_sec": s.cost_sec,
+                "queued": self._now(),
+            }
+        self._prefetch(self.order)
+
+        done: List[str] = []
+        failed: List[str] = []
+        stuck: List[str] = []
+
+        def _result(name: str, exc: BaseException | None) -> None:
+            if exc is None:
+                done.append(name)
+            else:
+                print(f"'{name}' failed: {exc}", file=sys.stderr)
+                failed.append(name)
+            # Whatever it managed to write still goes in the bundle
+            on_finish(name)
+
+        if serial or len(self.order) <= 1:
+            for j in self.order:
+                try:
+                    self._call(j)
+                    _result(j.name, None)
+                except Exception as e:
+                    _result(j.name, e)
+            return done, failed, stuck
+
+        # Collector threads mostly just wait on the engine, so give every
+        # collector its own thread - the engine limits the actual work
+        pool = ThreadPoolExecutor(max_workers=len(self.order))
+        futures = {pool.submit(self._call, j): j.name
+                   for j in self.order}
+        self._futures = {name: f for f, name in futures.items()}
+        # The engine kills commands at the deadline, so collectors should
+        # return right after it. Small grace for writing files, then give up.
+        left = self.engine.remaining()
+        wait_for = left + 5 if left is not None else None
+        try:
+            for f in as_completed(futures, timeout=wait_for):
+                _result(futures[f], f.exception())
+        except FuturesTimeout:
+            for f, name in futures.items():
+                if not f.done():
+                    print(f"'{name}' still running at deadline, skipping", file=sys.stderr)
+                    failed.append(name)
+                    stuck.append(name)
+        pool.shutdown(wait=False, cancel_futures=True)
+        return done, failed, stuck
+
+    def join(self, names: List[str], timeout: float | None) -> List[str]:
+        """Wait up to timeout for (stuck) jobs to return. Returns the ones still running."""
+        futures = [self._futures[n] for n in names if n in self._futures]
+        if futures:
+            futures_wait(futures, timeout=timeout)
+        return [n for n in names if n in self._futures and not self._futures[n].done()]
+
+    def _prefetch(self, order: List[Job]) -> None:
+        units: Dict[str, int] = {}
+        for j in order:
+            if j.unit and UNIT_PROPERTIES in j.spec.needs:
+                units[j.unit] = min(units.get(j.unit, j.priority), j.priority)
+        for unit, prio in units.items():
+            token = command_priority.set(prio)
+            try:
+                with self._span("prefetch", "phase", unit=unit):
+                    self.ctx.prefetch_unit(unit)
+            finally:
+                command_priority.reset(token)
+
+    def _span(self, name: str, cat: str, **args):
+        tracer = self.ctx.tracer
+        return tracer.span(name, cat, **args) if tracer else contextlib.nullcontext()
+
+    def _call(self, job: Job) -> None:
+        rec = self.timeline[job.name]
+        rec["start"] = self._now()
+        left = self.engine.remaining()
+        if left is not None and left < job.spec.cost_sec:
+            rec["expect_cut"] = True  # runs anyway, whatever it gets is kept
+        token = command_priority.set(job.priority)
+        try:
+            with self._span(job.name, "collector", kind=job.kind, priority=job.priority):
+                job.fn(job.out_dir)
+        finally:
+            command_priority.reset(token)
+            rec["end"] = self._now()
+            rec["wall_sec"] = round(rec["end"] - rec["start"], 3)
+
+    def summary(self) -> Dict[str, Any]:
+        """For meta.json. Times are seconds since `started`."""
+        return {
+            "started": self.started.isoformat(),
+            "deadline_left_sec": self.deadline_left_sec,
+            "order": [j.name for j in self.order],
+            "collectors": self.timeline,
+        }
@@ -0,0 +1,243 @@
+"""Seekable .tar.gz bundles - read one file without gunzipping the lot.
+
+A normal .tar.gz is one compressed stream, so getting at one member
+means decompressing everything before it. Here every tar entry (header +
+data + padding) is compressed as its own gzip member. Concatenated gzip
+members are still a valid gzip file, so `tar xzf` works as always.
+
+On top of that the bundle ends with:
+
+  * `<root>/.bundle-index.json` - a normal tar entry listing every member:
+    path, compressed offset/length, where the data starts inside the
+    member once decompressed, size, sha256
+  * the tar end-of-archive blocks
+  * a fixed-size footer: an empty gzip member whose FEXTRA field holds the
+    index location. It decompresses to nothing, so tar never sees it.
+
+A reader seeks to the end, reads FOOTER_SIZE bytes, reads the index
+member, and from then on fetches exactly the bytes of the member it
+wants. Bundles without a footer (older ones, xz/zstd) fall back to
+reading through the tar stream.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import io
+import json
+import os
+import struct
+import tarfile
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+
+from toolkit.core.bundle import BundleWriter
+from toolkit.core.compress import BlockCompressor
+
+INDEX_NAME = ".bundle-index.json"
+INDEX_VERSION = 1
+
+_MAGIC = b"TKIDX1"
+_SUBFIELD = b"TK"
+# magic, index offset, index compressed length, data offset in member, data size
+_PAYLOAD = struct.Struct("<6sQQIQ")
+# gzip header with FEXTRA: magic, CM=8, FLG=FEXTRA, MTIME=0, XFL=0, OS=255, XLEN
+_GZ_HEAD = b"\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff"
+_EMPTY_DEFLATE = b"\x03\x00"
+FOOTER_SIZE = len(_GZ_HEAD) + 2 + 4 + _PAYLOAD.size + len(_EMPTY_DEFLATE) + 8
+
+_READ_CHUNK = 1 << 20
+
+
+def _footer(index_off: int, index_len: int, data_off: int, data_size: int) -> bytes:
+    payload = _PAYLOAD.pack(_MAGIC, index_off, index_len, data_off, data_size)
+    extra = _SUBFIELD + struct.pack("<H", len(payload)) + payload
+    # empty deflate stream, then CRC32=0 and ISIZE=0
+    return (_GZ_HEAD + struct.pack("<H", len(extra)) + extra + _EMPTY_DEFLATE
+            + struct.pack("<II", 0, 0))
+
+
+def _parse_footer(buf: bytes) -> Tuple[int, int, int, int] | None:
+    if len(buf) != FOOTER_SIZE or not buf.startswith(_GZ_HEAD):
+        return None
+    extra = buf[len(_GZ_HEAD) + 2:len(_GZ_HEAD) + 2 + 4 + _PAYLOAD.size]
+    if extra[:2] != _SUBFIELD:
+        return None
+    magic, index_off, index_len, data_off, data_size = _PAYLOAD.unpack(extra[4:])
+    if magic != _MAGIC:
+        return None
+    return index_off, index_len, data_off, data_size
+
+
+class SeekableWriter(BundleWriter):
+    """BundleWriter that writes one gzip member per tar entry plus an index."""
+
+    def _open(self, compression: Dict[str, Any] | None) -> None:
+        comp = dict(compression or {})
+        comp["codec"] = "gzip"  # the footer trick is gzip-specific
+        self._partial = self.tar_path.with_name(self.tar_path.name + ".partial")
+        self._raw = open(self._partial, "wb")
+        self.compressor = BlockCompressor(self._raw, **comp)
+        self._index: List[Dict[str, Any]] = []
+        self._dirs: set = set()
+        self._add_dir("")
+
+    def _member(self, ti: tarfile.TarInfo, fileobj=None) -> Dict[str, Any]:
+        """Write one tar entry as its own gzip member(s), return its index entry."""
+        comp = self.compressor
+        offset = comp.compressed_bytes
+        header = ti.tobuf(tarfile.PAX_FORMAT, "utf-8", "surrogateescape")
+        comp.write(header)
+        h = hashlib.sha256()
+        size = 0
+        if fileobj is not None:
+            # The header already promised ti.size bytes - never write more or
+            # less, even if a cut-off collector is still writing to the file
+            while size < ti.size:
+                piece = fileobj.read(min(_READ_CHUNK, ti.size - size))
+                if not piece:
+                    self.errors.append(f"{ti.name}: shrank while archiving, zero-filled")
+                    comp.write(b"\0" * (ti.size - size))
+                    break
+                h.update(piece)
+                comp.write(piece)
+                size += len(piece)
+            pad = -ti.size % tarfile.BLOCKSIZE
+            if pad:
+                comp.write(b"\0" * pad)
+        comp.flush()
+        entry = {
+            "path": ti.name.split("/", 1)[1] if "/" in ti.name else "",
+            "type": "dir" if ti.isdir() else "file",
+            "offset": offset,
+            "length": comp.compressed_bytes - offset,
+            "data_offset": len(header),
+            "size": ti.size,
+            "mtime": int(ti.mtime),
+        }
+        if not ti.isdir():
+            entry["sha256"] = h.hexdigest()
+        self._index.append(entry)
+        return entry
+
+    def _add_dir(self, rel: str) -> None:
+        if rel in self._dirs:
+            return
+        parent = os.path.dirname(rel)
+        if rel and parent not in self._dirs:
+            self._add_dir(parent)
+        self._dirs.add(rel)
+        ti = self._info(f"{self.root}/{rel}".rstrip("/"), 0o755)
+        ti.type = tarfile.DIRTYPE
+        self._member(ti)
+
+    def _archive_file(self, path: Path, rel: str) -> None:
+        self._add_dir(os.path.dirname(rel))
+        with open(path, "rb") as f:
+            st = os.fstat(f.fileno())
+            ti = self._info(f"{self.root}/{rel}", st.st_mode & 0o777)
+            ti.size = st.st_size
+            ti.mtime = int(st.st_mtime)
+            self._member(ti, f)
+
+    def _archive_bytes(self, rel: str, data: bytes) -> None:
+        self._add_dir(os.path.dirname(rel))
+        ti = self._info(f"{self.root}/{rel}", 0o644)
+        ti.size = len(data)
+        self._member(ti, io.BytesIO(data))
+
+    def _flush(self) -> None:
+        self.compressor.flush()
+
+    def _finish(self) -> Path:
+        index = json.dumps({
+            "version": INDEX_VERSION,
+            "root": self.root,
+            "codec": "gzip",
+            "members": self._index,
+        }, separators=(",", ":")).encode("utf-8")
+        ti = self._info(f"{self.root}/{INDEX_NAME}", 0o644)
+        ti.size = len(index)
+        idx = self._member(ti, io.BytesIO(index))
+        self._index.pop()  # the index doesn't list itself
+
+        # End of archive: two zero blocks
+        comp = self.compressor
+        comp.write(b"\0" * (tarfile.BLOCKSIZE * 2))
+        comp.close()
+        self._raw.write(_footer(idx["offset"], idx["length"], idx["data_offset"], idx["size"]))
+        self._raw.close()
+        os.replace(self._partial, self.tar_path)
+        return self.tar_path
+
+
+# -- reading --
+
+def read_index(path: Path) -> Dict[str, Any] | None:
+    """The member index of a seekable bundle, None if it isn't one."""
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() < FOOTER_SIZE:
+                return None
+            f.seek(-FOOTER_SIZE, os.SEEK_END)
+            loc = _parse_footer(f.read(FOOTER_SIZE))
+            if loc is None:
+                return None
+            index_off, index_len, data_off, data_size = loc
+            f.seek(index_off)
+            raw = gzip.decompress(f.read(index_len))
+    except (OSError, EOFError, zlib.error):
+        return None
+    return json.loads(raw[data_off:data_off + data_size])
+
+
+def read_member(path: Path, entry: Dict[str, Any], verify: bool = True) -> bytes:
+    """Fetch one member's data using its index entry - reads only its bytes."""
+    with open(path, "rb") as f:
+        f.seek(entry["offset"])
+        raw = gzip.decompress(f.read(entry["length"]))
+    data = raw[entry["data_offset"]:entry["data_offset"] + entry["size"]]
+    if verify and entry.get("sha256") and hashlib.sha256(data).hexdigest() != entry["sha256"]:
+        raise ValueError(f"checksum mismatch for {entry['path']} in {path}")
+    return data
+
+
+def list_members(path: Path) -> Iterator[Dict[str, Any]]:
+    """path/size/mtime for every file in a bundle, seekable or not."""
+    index = read_index(path)
+    if index is not None:
+        for m in index["members"]:
+            if m["type"] == "file":
+                yield m
+        return
+    # Plain tarball - have to read through it
+    with tarfile.open(path, "r:*") as tf:
+        for ti in tf:
+            if ti.isfile():
+                rel = ti.name.split("/", 1)[1] if "/" in ti.name else ti.name
+                yield {"path": rel, "size": ti.size, "mtime": int(ti.mtime)}
+
+
+def read_file(path: Path, rel: str) -> bytes:
+    """One file from a bundle by its path inside the bundle (with or without the root dir)."""
+    rel = rel.strip("/")
+    index = read_index(path)
+    if index is not None:
+        root = index.get("root", "")
+        if root and rel.startswith(root + "/"):
+            rel = rel[len(root) + 1:]
+        for m in index["members"]:
+            if m["type"] == "file" and m["path"] == rel:
+                return read_member(path, m)
+        raise FileNotFoundError(f"{rel} not in {path}")
+    with tarfile.open(path, "r:*") as tf:
+        for ti in tf:
+            name = ti.name
+            short = name.split("/", 1)[1] if "/" in name else name
+            if ti.isfile() and rel in (name, short):
+                return tf.extractfile(ti).read()
+    raise FileNotFoundError(f"{rel} not in {path}")
+
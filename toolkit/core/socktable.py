@@ -0,0 +1,319 @@
+"""Host-wide socket summary from /proc/net, for boxes with a lot of connections.
+
+`ss -tulpn` only lists listeners, and `-p` walks every process's fds to
+name them - tens of seconds on a load balancer with a few hundred
+thousand connections. What you usually want to know there is how many
+connections are in which state, on which port and from where, and
+whether anything is backing up.
+
+This streams /proc/net/{tcp,tcp6,udp,udp6} once. Each line is split as
+bytes and counted by (local port, state) and (remote /24 or /64, state),
+with the hex kept as it is. Only the listeners and the top-N rows that
+make it into the output are decoded. Memory is bounded: ports are at most
+65536 per table, remote prefixes are capped at max_prefixes and anything
+past that is counted as "other", and the detail rows are a top-N heap.
+500k sockets take about a second.
+
+Flags: listeners with a non-empty accept queue (rx_queue on a LISTEN
+socket), TIME_WAIT and CLOSE_WAIT piling up, and the kernel's own
+ListenOverflows/ListenDrops counters from /proc/net/netstat. The listen
+backlog itself isn't in /proc/net/tcp (only ss, over netlink, sees it),
+so a queue is compared against net.core.somaxconn - the most any
+listener can have.
+"""
+
+from __future__ import annotations
+
+import heapq
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+from toolkit.core import netsock, procfs
+from toolkit.core.procfs import PROC
+
+TOP_N = 20
+MAX_PREFIXES = 100_000
+
+TIME_WAIT_WARN = 20_000  # host-wide; a few thousand is normal on a busy box
+CLOSE_WAIT_WARN = 100    # the app got a FIN and never closed - usually a leak
+
+_LISTEN = b"0A"
+_EMPTY_QUEUES = b"00000000:00000000"
+# ::ffff:a.b.c.d - a v4 client of a dual-stack listener, counted as v4
+_V4_MAPPED = b"0000000000000000FFFF0000"
+
+# The per-state columns in the port/prefix tables
+STATE_COLUMNS = ("ESTABLISHED", "SYN_RECV", "TIME_WAIT", "CLOSE_WAIT")
+
+_LE = sys.byteorder == "little"
+
+
+# Hex digits of a v4 address that make its /24 (the address is printed host-endian)
+_V4_NET = slice(2, 8) if _LE else slice(0, 6)
+_V4_MAPPED_NET = slice(24 + _V4_NET.start, 24 + _V4_NET.stop)
+
+
+def _fmt_prefix(key: bytes) -> str:
+    """Hex /24 (6 digits) or /64 (16) -> "10.1.2.0/24", "2001:db8::/64"."""
+    if len(key) == 16:
+        ip, _ = netsock.decode_addr((key + b"0" * 16).decode() + ":0000")
+        return f"{ip}/64"
+    full = b"00" + key if _LE else key + b"00"
+    ip, _ = netsock.decode_addr(full.decode() + ":0000")
+    return f"{ip}/24"
+
+
+def _states(table: str) -> Dict[bytes, str]:
+    states = netsock.UDP_STATES if table.startswith("udp") else netsock.TCP_STATES
+    return {k.encode(): v for k, v in states.items()}
+
+
+def _scan(table: str, proc: Path, top_n: int, max_prefixes: int, agg: Dict[str, Any]) -> None:
+    """One pass over /proc/net/<table>, adding into agg."""
+    try:
+        f = open(proc / "net" / table, "rb")
+    except OSError:
+        return
+    udp = table.startswith("udp")
+    v6 = table.endswith("6")
+    # Keys are hex + the 2-digit state: b"01BB" b"01" -> b"01BB01". Bytes
+    # concatenation and dict.get are the cheapest per-line ops there are
+    by_port = agg["ports"].setdefault("udp" if udp else "tcp", {})
+    by_prefix = agg["prefixes"].setdefault("udp" if udp else "tcp", {})
+    port_get, prefix_get = by_port.get, by_prefix.get
+    before = sum(by_port.values())
+    heap = agg["queues"]
+    listeners = agg["listeners"]
+    with f:
+        f.readline()
+        for line in f:
+            try:
+                _, local, remote, st, queues, _ = line.split(None, 5)
+            except ValueError:
+                continue
+            key = local[-4:] + st
+            by_port[key] = port_get(key, 0) + 1
+            if st == _LISTEN or (udp and remote[-4:] == b"0000"):
+                listeners.append((table, local, st, queues))
+                continue
+            if not v6:
+                key = remote[_V4_NET] + st
+            elif remote[:24] == _V4_MAPPED:
+                key = remote[_V4_MAPPED_NET] + st
+            else:
+                key = remote[:16] + st
+            n = prefix_get(key)
+            if n is not None:
+                by_prefix[key] = n + 1
+            elif len(by_prefix) < max_prefixes:
+                by_prefix[key] = 1
+            else:
+                agg["prefixes_dropped"] += 1
+            if queues != _EMPTY_QUEUES:
+                tx, _, rx = queues.partition(b":")
+                size = int(tx, 16) + int(rx, 16)
+                item = (size, agg["seq"], table, local, remote, st, int(tx, 16), int(rx, 16))
+                agg["seq"] += 1
+                if len(heap) < top_n:
+                    heapq.heappush(heap, item)
+                elif size > heap[0][0]:
+                    heapq.heapreplace(heap, item)
+    agg["tables"][table] = sum(by_port.values()) - before
+
+
+def _endpoint(hexaddr: bytes) -> str:
+    return netsock.fmt_endpoint(*netsock.decode_addr(hexaddr.decode()))
+
+
+def _read_netstat(proc: Path) -> Dict[str, int]:
+    """TcpExt listen overflow/drop counters (since boot) from /proc/net/netstat."""
+    try:
+        lines = (proc / "net" / "netstat").read_text().splitlines()
+    except OSError:
+        return {}
+    # Header line, then values line, per protocol
+    for names, values in zip(lines[::2], lines[1::2], strict=False):
+        if names.startswith("TcpExt:"):
+            row = dict(zip(names.split()[1:], values.split()[1:], strict=False))
+            return {k: int(row[k])
+                    for k in ("ListenOverflows", "ListenDrops", "TCPTimeWaitOverflow") if k in row}
+    return {}
+
+
+def _read_sockstat(proc: Path) -> Dict[str, Dict[str, int]]:
+    """/proc/net/sockstat{,6}: {"TCP": {"inuse": .., "tw": .., "orphan": ..}, ...}."""
+    out: Dict[str, Dict[str, int]] = {}
+    for name in ("sockstat", "sockstat6"):
+        try:
+            text = (proc / "net" / name).read_text()
+        except OSError:
+            continue
+        for line in text.splitlines():
+            label, _, rest = line.partition(":")
+            vals = rest.split()
+            pairs = zip(vals[::2], vals[1::2], strict=False)
+            out[label] = {k: int(v) for k, v in pairs if v.isdigit()}
+    return out
+
+
+def _group(counts: Dict[bytes, int], states: Dict[bytes, str]) -> Dict[bytes, Dict[str, int]]:
+    """{key + state: n} -> {key: {"total": n, "ESTABLISHED": n, ...}}."""
+    out: Dict[bytes, Dict[str, int]] = {}
+    for raw, n in counts.items():
+        key, st = raw[:-2], raw[-2:]
+        row = out.get(key)
+        if row is None:
+            row = out[key] = dict.fromkeys(("total",) + STATE_COLUMNS, 0)
+        row["total"] += n
+        name = states.get(st)
+        if name in row:
+            row[name] += n
+    return out
+
+
+def summarize(proc: Path = PROC, top_n: int = TOP_N,
+              max_prefixes: int = MAX_PREFIXES) -> Dict[str, Any]:
+    """Aggregate every inet socket in proc's network namespace. See the module doc."""
+    started = time.monotonic()
+    agg: Dict[str, Any] = {"ports": {}, "prefixes": {}, "queues": [], "listeners": [],
+                           "tables": {}, "seq": 0, "prefixes_dropped": 0}
+    for table in netsock.INET_TABLES:
+        _scan(table, proc, top_n, max_prefixes, agg)
+    scan_ms = (time.monotonic() - started) * 1000
+
+    tcp_states, udp_states = _states("tcp"), _states("udp")
+    by_state: Dict[str, int] = {}
+    ports = []
+    for proto, counts in agg["ports"].items():
+        states = udp_states if proto == "udp" else tcp_states
+        for key, n in counts.items():
+            st = key[-2:]
+            name = f"{proto} {states.get(st, st.decode())}"
+            by_state[name] = by_state.get(name, 0) + n
+        for port, row in _group(counts, states).items():
+            ports.append(dict(proto=proto, port=int(port, 16), **row))
+
+    listening: Dict[Tuple[str, int], int] = {}
+    listeners = []
+    for table, local, st, queues in agg["listeners"]:
+        tx, _, rx = queues.partition(b":")
+        port = int(local[-4:], 16)
+        proto = "udp" if table.startswith("udp") else "tcp"
+        listening[(proto, port)] = listening.get((proto, port), 0) + 1
+        listeners.append({"proto": table, "local": _endpoint(local), "rx_queue": int(rx, 16),
+                          "listen": st == _LISTEN})
+    listeners.sort(key=lambda r: (-r["rx_queue"], r["proto"], r["local"]))
+
+    # Busiest local ports: ones we listen on first - the rest are mostly
+    # one-off ephemeral ports of outgoing connections
+    for p in ports:
+        own = listening.get((p["proto"], p["port"]), 0)
+        p["listening"] = own > 0
+        p["connections"] = p["total"] - own
+    ports.sort(key=lambda p: (p["connections"], p["listening"]), reverse=True)
+    ports = [p for p in ports if p["connections"] > 0][:top_n]
+
+    remotes = []
+    for proto, counts in agg["prefixes"].items():
+        states = udp_states if proto == "udp" else tcp_states
+        for key, row in _group(counts, states).items():
+            remotes.append(dict(proto=proto, prefix=_fmt_prefix(key), **row))
+    remotes.sort(key=lambda r: r["total"], reverse=True)
+
+    queues = []
+    for _size, _, table, local, remote, st, tx, rx in sorted(agg["queues"], reverse=True):
+        states = udp_states if table.startswith("udp") else tcp_states
+        queues.append({"proto": table, "state": states.get(st, st.decode()),
+                       "local": _endpoint(local), "remote": _endpoint(remote),
+                       "rx_queue": rx, "tx_queue": tx})
+
+    netstat = _read_netstat(proc)
+    somaxconn = procfs.read_value(proc / "sys/net/core/somaxconn")
+    flags = []
+    for r in listeners:
+        if r["rx_queue"] and r["listen"]:
+            full = " - at somaxconn, it's full" if somaxconn and r["rx_queue"] >= somaxconn else ""
+            flags.append(f"{r['rx_queue']} connections waiting to be accepted on "
+                         f"{r['proto']} {r['local']}{full}")
+    tw, cw = by_state.get("tcp TIME_WAIT", 0), by_state.get("tcp CLOSE_WAIT", 0)
+    if tw >= TIME_WAIT_WARN:
+        worst = max(remotes, key=lambda r: r["TIME_WAIT"], default=None)
+        flags.append(f"{tw} sockets in TIME_WAIT (most to {worst['prefix']}: {worst['TIME_WAIT']})"
+                     if worst else f"{tw} sockets in TIME_WAIT")
+    if cw >= CLOSE_WAIT_WARN:
+        worst = max(ports, key=lambda p: p["CLOSE_WAIT"], default=None)
+        where = ""
+        if worst and worst["CLOSE_WAIT"]:
+            where = f" (most on local port {worst['port']}: {worst['CLOSE_WAIT']})"
+        flags.append(f"{cw} sockets in CLOSE_WAIT{where} - the app isn't closing them")
+    if netstat.get("ListenOverflows"):
+        flags.append(f"ListenOverflows {netstat['ListenOverflows']} since boot "
+                     f"(ListenDrops {netstat.get('ListenDrops', 0)})")
+
+    return {
+        "total": sum(agg["tables"].values()),
+        "tables": agg["tables"],
+        "by_state": dict(sorted(by_state.items(), key=lambda kv: -kv[1])),
+        "flags": flags,
+        "listeners": listeners[:top_n * 25],
+        "listeners_total": len(listeners),
+        "ports": ports,
+        "remotes": remotes[:top_n],
+        "remote_prefixes": len(remotes),
+        "remote_prefixes_dropped": agg["prefixes_dropped"],
+        "queues": queues,
+        "sockstat": _read_sockstat(proc),
+        "netstat": netstat,
+        "somaxconn": somaxconn,
+        "scan_ms": round(scan_ms, 1),
+        "total_ms": round((time.monotonic() - started) * 1000, 1),
+    }
+
+
+def format_summary(s: Dict[str, Any]) -> str:
+    """sockets.txt - flags first, then the tables."""
+    tables = ", ".join(f"{t} {n}" for t, n in s["tables"].items())
+    lines = [f"# {s['total']} sockets ({tables}), read in {s['total_ms']}ms"]
+    lines += ["", "## Flags"] + ([f"  ! {f}" for f in s["flags"]] or ["  (none)"])
+
+    lines += ["", "## By state"] + [f"{n:>10}  {k}" for k, n in s["by_state"].items()]
+
+    cols = "".join(f"{c:>13}" for c in STATE_COLUMNS)
+    lines += ["", "## Busiest local ports (* = listening)",
+              f"{'PORT':<12}{'CONNS':>10}{cols}"]
+    for p in s["ports"]:
+        label = f"{p['proto']} {p['port']}{'*' if p['listening'] else ''}"
+        lines.append(f"{label:<12}{p['connections']:>10}"
+                     + "".join(f"{p[c]:>13}" for c in STATE_COLUMNS))
+
+    dropped = s["remote_prefixes_dropped"]
+    more = f", {dropped} more past the cap" if dropped else ""
+    lines += ["", f"## Top remote networks ({s['remote_prefixes']} in all{more})",
+              f"{'NETWORK':<32}{'CONNS':>10}{cols}"]
+    for r in s["remotes"]:
+        lines.append(f"{r['proto'] + ' ' + r['prefix']:<32}{r['total']:>10}"
+                     + "".join(f"{r[c]:>13}" for c in STATE_COLUMNS))
+
+    lines += ["", f"## Listening ({s['listeners_total']})",
+              f"{'PROTO':<6}{'LOCAL':<48}{'RECV-Q':>8}"]
+    for r in s["listeners"]:
+        lines.append(f"{r['proto']:<6}{r['local']:<48}{r['rx_queue']:>8}")
+
+    if s["queues"]:
+        lines += ["", "## Biggest send/receive queues",
+                  f"{'PROTO':<6}{'STATE':<12}{'RECV-Q':>9}{'SEND-Q':>9}  LOCAL -> REMOTE"]
+        for q in s["queues"]:
+            lines.append(f"{q['proto']:<6}{q['state']:<12}{q['rx_queue']:>9}{q['tx_queue']:>9}  "
+                         f"{q['local']} -> {q['remote']}")
+
+    if s["sockstat"] or s["netstat"] or s["somaxconn"] is not None:
+        lines += ["", "## Kernel counters (/proc/net/sockstat, netstat)"]
+        lines += [f"  {k}: " + " ".join(f"{n} {v}" for n, v in vals.items())
+                  for k, vals in s["sockstat"].items() if vals]
+        if s["netstat"]:
+            lines.append("  TcpExt: " + " ".join(f"{k} {v}" for k, v in s["netstat"].items()))
+        if s["somaxconn"] is not None:
+            lines.append(f"  net.core.somaxconn: {s['somaxconn']}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,254 @@
+"""Content-addressed bundle store - identical data is kept once.
+
+Most of a bundle barely changes between runs (unit file, systemctl show,
+hardening report, host info, most of disk.txt and net.txt), and hourly
+cron plus pre/post deploy bundles were filling the artifacts volume with
+copies of it. In store mode files are cut into chunks, each chunk is
+stored once under its sha256, and a bundle is just a manifest listing
+the chunks of each file.
+
+Layout under <artifacts_dir>/store/:
+
+    blobs/ab/abcdef...     zlib-compressed chunk, named by sha256 of the raw bytes
+    bundles/<id>.json      manifest: files -> chunk hashes, plus stats
+
+Chunk boundaries are content-defined, on line ends: a chunk ends after a
+line whose crc32 has its low bits all zero (once the chunk is past a
+minimum size). A line inserted near the top of a log only changes the
+chunk it lands in - the boundaries after it fall on the same lines as
+before, so the rest still dedups.
+
+`toolkit bundle export <id>` turns a manifest back into a normal tarball.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import os
+import tarfile
+import time
+import zlib
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+from toolkit.core.bundle import BundleWriter
+from toolkit.core.compress import BlockCompressor
+
+STORE_DIR = "store"
+FORMAT_VERSION = 1
+
+CHUNK_MIN = 2 * 1024
+CHUNK_MAX = 64 * 1024
+_CUT_MASK = 0x1F  # ~1 in 32 lines past CHUNK_MIN ends a chunk
+
+# Blobs younger than this are left alone by gc - a collection that's still
+# running has written them but not its manifest yet
+GC_GRACE_SEC = 3600
+
+
+def chunks(data: bytes) -> Iterator[bytes]:
+    """Split data into content-defined chunks on line boundaries."""
+    n = len(data)
+    if n <= CHUNK_MIN * 2:
+        if n:
+            yield data
+        return
+    start = pos = 0
+    while pos < n:
+        nl = data.find(b"\n", pos, start + CHUNK_MAX)
+        if nl == -1:
+            if start + CHUNK_MAX >= n:
+                break  # tail without a newline, below the max
+            # No line end in reach (binary, or one enormous line) - hard cut
+            end = start + CHUNK_MAX
+            yield data[start:end]
+            start = pos = end
+            continue
+        end = nl + 1
+        size = end - start
+        if size >= CHUNK_MAX or (size >= CHUNK_MIN and not zlib.crc32(data[pos:end]) & _CUT_MASK):
+            yield data[start:end]
+            start = end
+        pos = end
+    if start < n:
+        yield data[start:]
+
+
+class Store:
+    """Blob + manifest store rooted at <artifacts_dir>/store."""
+
+    def __init__(self, artifacts_dir: str | Path):
+        self.root = Path(artifacts_dir).expanduser() / STORE_DIR
+        self.blobs = self.root / "blobs"
+        self.manifests = self.root / "bundles"
+
+    def init(self) -> "Store":
+        self.blobs.mkdir(parents=True, exist_ok=True)
+        self.manifests.mkdir(parents=True, exist_ok=True)
+        return self
+
+    def blob_path(self, digest: str) -> Path:
+        return self.blobs / digest[:2] / digest
+
+    def manifest_path(self, bundle_id: str) -> Path:
+        return self.manifests / f"{bundle_id}.json"
+
+    def put(self, chunk: bytes) -> tuple:
+        """Store a chunk if it's new. Returns (digest, bytes written to disk)."""
+        digest = hashlib.sha256(chunk).hexdigest()
+        path = self.blob_path(digest)
+        if path.exists():
+            try:
+                os.utime(path)  # referenced again - keeps gc's grace window honest
+            except OSError:
+                pass
+            return digest, 0
+        path.parent.mkdir(exist_ok=True)
+        data = zlib.compress(chunk, 6)
+        tmp = path.with_name(f"{digest}.{os.getpid()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+        return digest, len(data)
+
+    def get(self, digest: str) -> bytes:
+        return zlib.decompress(self.blob_path(digest).read_bytes())
+
+    def list_bundles(self) -> List[str]:
+        if not self.manifests.is_dir():
+            return []
+        return sorted(p.stem for p in self.manifests.glob("*.json"))
+
+    def load_manifest(self, bundle_id: str) -> Dict[str, Any]:
+        path = self.manifest_path(bundle_id)
+        if not path.exists():
+            raise FileNotFoundError(f"no bundle '{bundle_id}' in {self.root}")
+        return json.loads(path.read_text())
+
+    def read_file(self, entry: Dict[str, Any]) -> bytes:
+        return b"".join(self.get(d) for d in entry["chunks"])
+
+    def export(self, bundle_id: str, dest: Path, compression: Dict[str, Any] | None = None) -> Path:
+        """Rebuild a self-contained tarball from a manifest."""
+        manifest = self.load_manifest(bundle_id)
+        partial = dest.with_name(dest.name + ".partial")
+        with open(partial, "wb") as raw:
+            comp = BlockCompressor(raw, **(compression or {}))
+            with tarfile.open(fileobj=comp, mode="w|") as tf:
+                dirs = set()
+                for entry in manifest["files"]:
+                    rel = entry["path"]
+                    parts = rel.split("/")[:-1]
+                    for i in range(len(parts) + 1):
+                        d = "/".join(parts[:i])
+                        if d not in dirs:
+                            dirs.add(d)
+                            ti = tarfile.TarInfo(f"{bundle_id}/{d}".rstrip("/"))
+                            ti.type = tarfile.DIRTYPE
+                            ti.mode = 0o755
+                            ti.mtime = int(entry["mtime"])
+                            tf.addfile(ti)
+                    data = self.read_file(entry)
+                    ti = tarfile.TarInfo(f"{bundle_id}/{rel}")
+                    ti.size = len(data)
+                    ti.mode = entry.get("mode", 0o644)
+                    ti.mtime = int(entry["mtime"])
+                    tf.addfile(ti, io.BytesIO(data))
+            comp.close()
+        os.replace(partial, dest)
+        return dest
+
+    def gc(self) -> Dict[str, int]:
+        """Delete blobs no manifest points at. Returns counts."""
+        live = set()
+        for bid in self.list_bundles():
+            try:
+                for entry in self.load_manifest(bid)["files"]:
+                    live.update(entry["chunks"])
+            except (OSError, ValueError, KeyError):
+                # Can't tell what a broken manifest needs - don't delete anything
+                return {"removed": 0, "bytes": 0, "kept": -1}
+        removed = freed = kept = 0
+        cutoff = time.time() - GC_GRACE_SEC
+        for path in self.blobs.glob("*/*"):
+            if path.name in live:
+                kept += 1
+                continue
+            try:
+                st = path.stat()
+                if st.st_mtime > cutoff:
+                    kept += 1
+                    continue
+                path.unlink()
+                removed += 1
+                freed += st.st_size
+            except OSError:
+                pass
+        return {"removed": removed, "bytes": freed, "kept": kept}
+
+
+class StoreWriter(BundleWriter):
+    """BundleWriter that puts chunks into a Store instead of a tarball.
+
+    The manifest is written last (atomically), so a bundle either shows
+    up complete or not at all.
+    """
+
+    def __init__(self, store: Store, root: str, keep_dir: Path | None = None):
+        self.store = store.init()
+        if store.manifest_path(root).exists():
+            raise FileExistsError(f"bundle {root} already exists in the store")
+        super().__init__(store.manifest_path(root), root, keep_dir=keep_dir)
+
+    def stats(self) -> Dict[str, Any]:
+        s = dict(self._stats)
+        stored = s["stored_bytes"]
+        s["dedup_ratio"] = round(s["raw_bytes"] / stored, 2) if stored else None
+        return s
+
+    def _open(self, compression: Dict[str, Any] | None) -> None:
+        self._files: List[Dict[str, Any]] = []
+        self._stats = {"mode": "store", "files": 0, "chunks": 0, "new_chunks": 0,
+                       "raw_bytes": 0, "new_bytes": 0, "stored_bytes": 0}
+
+    def _archive_file(self, path: Path, rel: str) -> None:
+        st = path.stat()
+        self._add(rel, path.read_bytes(), st.st_mode & 0o777, st.st_mtime)
+
+    def _archive_bytes(self, rel: str, data: bytes) -> None:
+        self._add(rel, data, 0o644, time.time())
+
+    def _add(self, rel: str, data: bytes, mode: int, mtime: float) -> None:
+        digests = []
+        s = self._stats
+        for chunk in chunks(data):
+            digest, written = self.store.put(chunk)
+            digests.append(digest)
+            s["chunks"] += 1
+            if written:
+                s["new_chunks"] += 1
+                s["new_bytes"] += len(chunk)
+                s["stored_bytes"] += written
+        s["files"] += 1
+        s["raw_bytes"] += len(data)
+        self._files.append({"path": rel, "size": len(data), "mode": mode,
+                            "mtime": int(mtime), "chunks": digests})
+
+    def _flush(self) -> None:
+        pass  # blobs are written as they come
+
+    def _finish(self) -> Path:
+        manifest = {
+            "format": FORMAT_VERSION,
+            "id": self.root,
+            "created": datetime.now(timezone.utc).isoformat(),
+            "files": sorted(self._files, key=lambda e: e["path"]),
+            "stats": self.stats(),
+        }
+        path = self.tar_path
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(manifest, indent=1))
+        os.replace(tmp, path)
+        return path
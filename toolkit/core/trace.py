@@ -0,0 +1,221 @@
+"""Timing spans for a collection run - where the time (and bytes) went.
+
+The textfile metrics only ever had total duration, so when
+ToolkitCollectionSlow fired there was no telling whether it was
+journalctl, a wedged systemctl, redaction or compression. Every run now
+records:
+
+  * a span per collector (start/end, bytes it wrote)
+  * a record per command - wall time, time spent waiting for an engine
+    slot, bytes captured, exit code, timed out or not
+  * spans for the bundle phases (redaction, budget, archive writes, finish)
+
+Spans nest through a ContextVar: the scheduler opens the collector span
+in the collector's thread, and anything run under it (engine commands,
+run_cmd, redaction) is attributed to that collector. Nothing recorded
+when there's no span open, so collectors called on their own pay nothing.
+
+All of it goes into meta.json as "trace"; `--trace` also writes Chrome
+trace-event JSON (chrome://tracing, ui.perfetto.dev, speedscope).
+"""
+
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Sequence
+
+# Commands are kept whole in meta.json, argv this long gets cut
+_MAX_CMD_CHARS = 200
+
+
+@dataclass
+class Span:
+    name: str
+    cat: str                  # collector | phase | bundle
+    start: float              # seconds since the tracer started
+    tracer: "Tracer"
+    collector: str | None     # collector it counts towards, if any
+    end: float | None = None
+    thread: str = ""
+    args: Dict[str, Any] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        d = {"name": self.name, "cat": self.cat, "start": round(self.start, 4),
+             "end": round(self.end if self.end is not None else self.start, 4),
+             "thread": self.thread}
+        if self.collector and self.collector != self.name:
+            d["collector"] = self.collector
+        if self.args:
+            d["args"] = self.args
+        return d
+
+
+_current: contextvars.ContextVar[Span | None] = contextvars.ContextVar(
+    "trace_span", default=None
+)
+
+
+def current() -> Span | None:
+    """Innermost open span in this thread/context, if any."""
+    return _current.get()
+
+
+class Tracer:
+    """Collects spans and command records for one run. Thread-safe."""
+
+    def __init__(self):
+        self.wall_start = time.time()
+        self._t0 = time.monotonic()
+        self.spans: List[Span] = []
+        self.commands: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def now(self) -> float:
+        return time.monotonic() - self._t0
+
+    @contextlib.contextmanager
+    def span(self, name: str, cat: str = "phase", **args) -> Iterator[Span]:
+        """Time the with-block. cat="collector" starts a new attribution scope."""
+        parent = _current.get()
+        owner = name if cat == "collector" else (parent.collector if parent else None)
+        s = Span(name, cat, self.now(), self, owner,
+                 thread=threading.current_thread().name, args=dict(args))
+        token = _current.set(s)
+        try:
+            yield s
+        finally:
+            _current.reset(token)
+            s.end = self.now()
+            with self._lock:
+                self.spans.append(s)
+
+    def command(self, parent: Span | None, cmd: Sequence[str], queued: float,
+                start: float, end: float, result) -> None:
+        """Record one finished command (monotonic times, result a CmdResult)."""
+        text = " ".join(cmd)
+        if len(text) > _MAX_CMD_CHARS:
+            text = text[:_MAX_CMD_CHARS - 3] + "..."
+        rec = {
+            "cmd": text,
+            "collector": parent.collector if parent else None,
+            "start": round(start - self._t0, 4),
+            "end": round(end - self._t0, 4),
+            "wait_sec": round(start - queued, 4),
+            "wall_sec": round(end - start, 4),
+            "bytes": result.stdout_bytes,
+            "exit": result.returncode,
+            "timed_out": result.timed_out,
+        }
+        if result.truncated:
+            rec["truncated"] = True
+        with self._lock:
+            self.commands.append(rec)
+
+    def annotate(self, collector: str, **args) -> None:
+        """Add args to a finished collector span (e.g. bytes, once its output is known)."""
+        with self._lock:
+            for s in self.spans:
+                if s.cat == "collector" and s.name == collector:
+                    s.args.update(args)
+                    return
+
+    def collectors(self) -> Dict[str, Dict[str, Any]]:
+        """Per-collector totals - what goes into the textfile metrics."""
+        with self._lock:
+            spans = list(self.spans)
+            cmds = list(self.commands)
+        out: Dict[str, Dict[str, Any]] = {}
+        for s in spans:
+            if s.cat == "collector":
+                out[s.name] = {"duration_sec": round(s.end - s.start, 4),
+                               "bytes": s.args.get("bytes", 0),
+                               "commands": 0, "command_sec": 0.0,
+                               "commands_failed": 0, "commands_timed_out": 0}
+        for c in cmds:
+            agg = out.get(c["collector"])
+            if agg is None:
+                continue
+            agg["commands"] += 1
+            agg["command_sec"] = round(agg["command_sec"] + c["wall_sec"], 4)
+            agg["commands_failed"] += c["exit"] != 0
+            agg["commands_timed_out"] += c["timed_out"]
+        return out
+
+    def phases(self) -> Dict[str, float]:
+        """Total seconds per non-collector span name (redact, write, finish...)."""
+        out: Dict[str, float] = {}
+        with self._lock:
+            for s in self.spans:
+                if s.cat != "collector":
+                    out[s.name] = round(out.get(s.name, 0.0) + s.end - s.start, 4)
+        return out
+
+    def summary(self) -> Dict[str, Any]:
+        """For meta.json. Times are seconds since `started`."""
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start)
+            cmds = sorted(self.commands, key=lambda c: c["start"])
+        return {
+            "started": self.wall_start,
+            "collectors": self.collectors(),
+            "phases": self.phases(),
+            "spans": [s.to_dict() for s in spans],
+            "commands": cmds,
+        }
+
+    def chrome(self, name: str = "toolkit") -> Dict[str, Any]:
+        """Chrome trace-event JSON (the "X" complete-event flavour)."""
+        with self._lock:
+            events = [(s.collector or s.thread or s.cat, s.start, s.end, s.name, s.cat,
+                       s.args) for s in self.spans]
+            events += [((c["collector"] or "other") + " commands", c["start"], c["end"],
+                        c["cmd"], "command",
+                        {k: c[k] for k in ("wait_sec", "bytes", "exit", "timed_out")})
+                       for c in self.commands]
+
+        # One row per collector (+ one per overlapping command), so the
+        # profiler shows what ran alongside what. Events on a row have to
+        # nest or not overlap at all, so overlapping ones get extra rows.
+        rows: Dict[str, List[List[float]]] = {}  # group -> per row, stack of open ends
+        row_ids: Dict[tuple, int] = {}
+        trace_events: List[Dict[str, Any]] = []
+        for group, start, end, ev_name, cat, args in sorted(events, key=lambda e: (e[1], -e[2])):
+            stacks = rows.setdefault(group, [])
+            # first row whose open spans this one nests inside, else a new row
+            for i in range(len(stacks) + 1):
+                if i == len(stacks):
+                    stacks.append([])
+                    break
+                stack = stacks[i]
+                while stack and stack[-1] <= start:
+                    stack.pop()
+                if not stack or stack[-1] >= end:
+                    break
+            stacks[i].append(end)
+            key = (group, i)
+            if key not in row_ids:
+                row_ids[key] = len(row_ids) + 1
+                label = group if i == 0 else f"{group} ({i + 1})"
+                trace_events.append({"ph": "M", "name": "thread_name", "pid": 1,
+                                     "tid": row_ids[key], "args": {"name": label}})
+            trace_events.append({
+                "name": ev_name, "cat": cat, "ph": "X", "pid": 1, "tid": row_ids[key],
+                "ts": round(start * 1e6), "dur": max(1, round((end - start) * 1e6)),
+                "args": args,
+            })
+        trace_events.insert(0, {"ph": "M", "name": "process_name", "pid": 1,
+                                "args": {"name": name}})
+        return {"traceEvents": trace_events, "displayTimeUnit": "ms",
+                "otherData": {"started": self.wall_start}}
+
+
+def span(name: str, cat: str = "phase", **args):
+    """Span under whatever is open in this context - a no-op outside a traced run."""
+    parent = _current.get()
+    if parent is None:
+        return contextlib.nullcontext()
+    return parent.tracer.span(name, cat, **args)
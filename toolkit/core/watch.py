@@ -0,0 +1,247 @@
+"""Watch units and collect the moment one fails.
+
+Cron and humans collect after the fact - by then the crashed process is
+gone and so is its /proc (the race the FIXME in collectors/process.py
+talks about). `toolkit watch` follows the journal for the units and fires
+a collection as soon as systemd reports trouble:
+
+  * crash  - main process killed by a signal, dumped core, or exited non-zero
+  * oom    - the unit (or a process in it) was OOM killed
+  * failed - unit entered failed state (UNIT_RESULT=exit-code, timeout, ...)
+  * restart-burst - restart_burst automatic restarts within burst_window_sec
+
+The journal is followed with one `journalctl -f -o json` for all units.
+systemd's own messages about a unit carry UNIT= plus MESSAGE_ID /
+UNIT_RESULT / EXIT_CODE, which `-u` already matches. Without journalctl
+(or with --poll) it polls one batched `systemctl show` for every unit
+instead.
+
+The Gate keeps a crash loop from turning into a bundle per second.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List
+
+# systemd catalog ids - `journalctl --list-catalog` has the rest
+_MSG_FAILED = "be02cf6855d2428ba40df7e9d022f03d"
+_MSG_EXITED = "98e322203f7a4ed290d09fe03c09fe15"
+_MSG_RESTART = "5eb03494b6584870a536b337290809b3"
+_MSG_OOM = "fe6faa94e7774663a0da52717891d8ef"
+_MSG_COREDUMP = "fc2e22bc6ee647b6b90729ab34a250b1"
+
+# Older systemd doesn't set the structured fields - fall back to the text
+# status is "0/SUCCESS", "1/FAILURE", "11/SEGV" - the part before the / is the number
+_RE_EXITED = re.compile(r"Main process exited, code=(\w+), status=(\w+)")
+_RE_FAILED = re.compile(r"Failed with result '([\w-]+)'")
+_RE_RESTART = re.compile(r"Scheduled restart job")
+
+# Unit results that aren't a problem
+_OK_RESULTS = {"", "success"}
+
+# How long to wait before restarting a journalctl -f that died
+_FOLLOW_BACKOFF_SEC = 5
+
+
+@dataclass
+class Event:
+    unit: str
+    kind: str     # crash | oom | failed | restart | restart-burst
+    detail: str
+    ts: float = field(default_factory=time.time)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"unit": self.unit, "kind": self.kind, "detail": self.detail, "ts": self.ts}
+
+
+def classify(entry: Dict[str, Any], units) -> Event | None:
+    """Journal entry -> Event if it's systemd (or coredump) reporting trouble."""
+    unit = entry.get("UNIT") or entry.get("COREDUMP_UNIT") or entry.get("OBJECT_SYSTEMD_UNIT")
+    if unit not in units:
+        return None  # the service's own log lines, or someone else's unit
+    msg = entry.get("MESSAGE")
+    msg = msg if isinstance(msg, str) else ""  # binary messages come as byte lists
+    mid = entry.get("MESSAGE_ID", "")
+    result = entry.get("UNIT_RESULT", "")
+
+    if mid == _MSG_OOM or result == "oom-kill" or "OOM killer" in msg:
+        return Event(unit, "oom", msg or "oom-kill")
+    if mid == _MSG_COREDUMP:
+        return Event(unit, "crash", msg or "core dumped")
+
+    code, status = entry.get("EXIT_CODE", ""), entry.get("EXIT_STATUS", "")
+    m = _RE_EXITED.search(msg)
+    if m and not code:
+        code, status = m.group(1), m.group(2)
+    if (mid == _MSG_EXITED or code) and (code in ("killed", "dumped") or
+                                         (code == "exited" and status not in ("0", "SUCCESS"))):
+        return Event(unit, "crash", f"code={code} status={status}")
+
+    m = _RE_FAILED.search(msg)
+    if m and not result:
+        result = m.group(1)
+    if (mid == _MSG_FAILED or result) and result not in _OK_RESULTS:
+        return Event(unit, "failed", f"result={result}")
+
+    if mid == _MSG_RESTART or _RE_RESTART.search(msg):
+        return Event(unit, "restart", msg or "restart scheduled")
+    return None
+
+
+class Gate:
+    """Decides which events get a collection.
+
+    Leading edge: the first event collects straight away (beating the
+    process's exit is the point). After that the unit is quiet for
+    debounce_sec - events in that window are folded into the bundle
+    already on its way and reported with the next one. On top of that,
+    at most max_per_hour collections per unit.
+
+    Single restarts only count towards restart-burst.
+    """
+
+    def __init__(self, debounce_sec: float = 60, max_per_hour: int = 6,
+                 restart_burst: int = 3, burst_window_sec: float = 60):
+        self.debounce = debounce_sec
+        self.max_per_hour = max_per_hour
+        self.restart_burst = restart_burst
+        self.burst_window = burst_window_sec
+        self._fired: Dict[str, Deque[float]] = {}
+        self._restarts: Dict[str, Deque[float]] = {}
+        self._folded: Dict[str, List[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def offer(self, ev: Event) -> tuple:
+        """(event to collect for, or None; events folded since the last collection)."""
+        with self._lock:
+            if ev.kind == "restart":
+                q = self._restarts.setdefault(ev.unit, deque())
+                q.append(ev.ts)
+                while q and ev.ts - q[0] > self.burst_window:
+                    q.popleft()
+                if len(q) < self.restart_burst:
+                    return None, []
+                ev = Event(ev.unit, "restart-burst",
+                           f"{len(q)} restarts in {self.burst_window:.0f}s", ev.ts)
+                q.clear()
+
+            fired = self._fired.setdefault(ev.unit, deque())
+            while fired and ev.ts - fired[0] > 3600:
+                fired.popleft()
+            folded = self._folded.setdefault(ev.unit, [])
+            if fired and ev.ts - fired[-1] < self.debounce:
+                folded.append(ev.to_dict())
+                return None, []
+            if len(fired) >= self.max_per_hour:
+                folded.append(dict(ev.to_dict(), suppressed="max_per_hour"))
+                return None, []
+            fired.append(ev.ts)
+            self._folded[ev.unit] = []
+            return ev, folded
+
+
+def parse_show_batch(output: str) -> Dict[str, Dict[str, str]]:
+    """`systemctl show -p Id,... a b c` -> {Id: props}. Units are separated by blank lines."""
+    out: Dict[str, Dict[str, str]] = {}
+    for block in output.strip().split("\n\n"):
+        props = {}
+        for line in block.splitlines():
+            key, sep, value = line.partition("=")
+            if sep:
+                props[key] = value
+        if props.get("Id"):
+            out[props["Id"]] = props
+    return out
+
+
+class Watcher:
+    """Feeds Events for `units` to on_event until stop()."""
+
+    def __init__(self, units: List[str], on_event: Callable[[Event], None],
+                 poll: bool = False, poll_sec: float = 2.0):
+        self.units = list(units)
+        self.on_event = on_event
+        self.poll = poll
+        self.poll_sec = poll_sec
+        self._stop = threading.Event()
+        self._proc: subprocess.Popen | None = None
+
+    def stop(self) -> None:
+        self._stop.set()
+        proc = self._proc
+        if proc is not None and proc.poll() is None:
+            proc.terminate()
+
+    def run(self) -> None:
+        if not self.poll:
+            try:
+                self._follow()
+                return
+            except FileNotFoundError:
+                print("Note: no journalctl, polling systemctl instead", file=sys.stderr)
+        self._poll()
+
+    def _follow(self) -> None:
+        cmd = ["journalctl", "-f", "-n", "0", "-o", "json", "--no-pager"]
+        for u in self.units:
+            cmd += ["-u", u]
+        units = set(self.units)
+        while not self._stop.is_set():
+            self._proc = subprocess.Popen(cmd, stdout=subprocess.PIPE,
+                                          stderr=subprocess.DEVNULL, stdin=subprocess.DEVNULL)
+            for line in self._proc.stdout:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                ev = classify(entry, units)
+                if ev is not None:
+                    self.on_event(ev)
+            self._proc.wait()
+            if not self._stop.is_set():
+                print(f"Note: journalctl -f exited ({self._proc.returncode}), restarting",
+                      file=sys.stderr)
+                self._stop.wait(_FOLLOW_BACKOFF_SEC)
+
+    def _poll(self) -> None:
+        props = "Id,ActiveState,SubState,Result,NRestarts,MainPID"
+        prev: Dict[str, Dict[str, str]] = {}
+        while not self._stop.is_set():
+            try:
+                r = subprocess.run(["systemctl", "show", "-p", props, *self.units],
+                                   capture_output=True, text=True, timeout=10)
+                cur = parse_show_batch(r.stdout)
+            except (OSError, subprocess.SubprocessError) as e:
+                print(f"Note: systemctl show failed: {e}", file=sys.stderr)
+                cur = {}
+            for unit, now in cur.items():
+                before = prev.get(unit)
+                if before is not None:
+                    for ev in self._transitions(unit, before, now):
+                        self.on_event(ev)
+            prev.update(cur)
+            self._stop.wait(self.poll_sec)
+
+    @staticmethod
+    def _transitions(unit: str, before: Dict[str, str], now: Dict[str, str]) -> List[Event]:
+        evs = []
+        result = now.get("Result", "")
+        if result != before.get("Result") and result not in _OK_RESULTS:
+            kind = "oom" if result == "oom-kill" else "failed"
+            evs.append(Event(unit, kind, f"result={result}"))
+        elif now.get("ActiveState") == "failed" and before.get("ActiveState") != "failed":
+            evs.append(Event(unit, "failed", f"result={result or 'unknown'}"))
+        try:
+            restarts = int(now.get("NRestarts", 0)) - int(before.get("NRestarts", 0))
+        except ValueError:
+            restarts = 0
+        evs += [Event(unit, "restart", "NRestarts went up")] * max(0, restarts)
+        return evs
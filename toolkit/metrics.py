@@ -6,21 +6,124 @@ No extra dependencies needed - just write to /var/lib/node_exporter/textfile_col
 
 from __future__ import annotations
 
+import os
+import re
+import threading
 import time
 from pathlib import Path
+from typing import Dict, List
 
 # Default location for node_exporter textfile collector
 # Change this if your setup is different
 METRICS_DIR = Path("/var/lib/node_exporter/textfile_collector")
 METRICS_FILE = "toolkit.prom"
 
+# name, type, help, how to get the value from a record
+_FAMILIES = [
+    ("toolkit_collection_total", "counter", "Total bundle collections",
+     lambda r: "1"),
+    ("toolkit_collection_duration_seconds", "gauge", "Time to collect bundle",
+     lambda r: f"{r['duration_sec']:.2f}"),
+    ("toolkit_collectors_success", "gauge", "Number of collectors that succeeded",
+     lambda r: str(len(r["collectors_run"]))),
+    ("toolkit_collectors_failed", "gauge", "Number of collectors that failed",
+     lambda r: str(len(r["collectors_failed"]))),
+    ("toolkit_bundle_size_bytes", "gauge", "Size of generated bundle",
+     lambda r: str(r.get("bundle_size_bytes", 0))),
+    ("toolkit_compression_cpu_seconds", "gauge", "CPU time spent compressing the bundle",
+     lambda r: f"{r.get('compression_sec', 0.0):.3f}"),
+    ("toolkit_compression_ratio", "gauge", "Uncompressed / compressed bundle size",
+     lambda r: f"{r.get('compression_ratio') or 0:.2f}"),
+    ("toolkit_last_collection_timestamp_seconds", "gauge", "Last collection time",
+     lambda r: f"{r['timestamp']:.0f}"),
+]
+
+# Same, one sample per collector (label `collector`) - from the run's trace
+_COLLECTOR_FAMILIES = [
+    ("toolkit_collector_duration_seconds", "gauge", "Wall time of each collector",
+     lambda c: f"{c['duration_sec']:.3f}"),
+    ("toolkit_collector_bytes", "gauge", "Bytes each collector wrote (before the size budget)",
+     lambda c: str(c.get("bytes", 0))),
+    ("toolkit_collector_commands_timed_out", "gauge",
+     "Commands each collector had killed by timeout",
+     lambda c: str(c.get("commands_timed_out", 0))),
+]
+
+_PER_COLLECTOR = {f[0] for f in _COLLECTOR_FAMILIES}
+
+# And one per bundle phase (label `phase`: redact, budget, write, flush...)
+_PHASE_FAMILY = ("toolkit_phase_duration_seconds", "gauge",
+                 "Time spent in each bundle phase (summed over collectors)")
+
+# `toolkit watch` can finish two collections at once in one process
+_write_lock = threading.Lock()
+
+_SAMPLE = re.compile(r'^(\w+)\{service="([^"]*)"([^}]*)\} (\S+)$')
+
+
+def _existing_samples(path: Path) -> Dict[str, Dict[str, List[str]]]:
+    """metric -> {service: [sample lines]} from a previous run's file."""
+    out: Dict[str, Dict[str, List[str]]] = {}
+    try:
+        text = path.read_text()
+    except OSError:
+        return out
+    for line in text.splitlines():
+        m = _SAMPLE.match(line)
+        if m:
+            out.setdefault(m.group(1), {}).setdefault(m.group(2), []).append(line)
+    return out
+
+
+def _labelled(name: str, labels: Dict[str, str], value: str) -> str:
+    inner = ",".join(f'{k}="{v}"' for k, v in labels.items())
+    return f"{name}{{{inner}}} {value}"
+
+
+def _samples(name: str, r: dict, value) -> List[str]:
+    """This run's sample lines for one family and one service record."""
+    svc = {"service": r["service"]}
+    if name in _PER_COLLECTOR:
+        return [_labelled(name, dict(svc, collector=c), value(stats))
+                for c, stats in sorted(r.get("collectors", {}).items())]
+    if name == _PHASE_FAMILY[0]:
+        return [_labelled(name, dict(svc, phase=ph), f"{sec:.3f}")
+                for ph, sec in sorted(r.get("phases", {}).items())]
+    return [_labelled(name, svc, value(r))]
+
 
 def write_metrics(service: str, collectors_run: list, collectors_failed: list,
-                  duration_sec: float, bundle_size_bytes: int = 0):
-    """Write Prometheus-format metrics to textfile.
+                  duration_sec: float, bundle_size_bytes: int = 0,
+                  compression_sec: float = 0.0, compression_ratio: float | None = None,
+                  collectors: Dict[str, dict] | None = None,
+                  phases: Dict[str, float] | None = None):
+    """Write Prometheus-format metrics for one service to textfile.
 
     Uses node_exporter's textfile collector - no need to run a separate exporter.
     Just make sure node_exporter is configured with --collector.textfile.directory
+
+    `collectors` ({name: {"duration_sec", "bytes", ...}}) and `phases`
+    ({phase: seconds}) come from Tracer.collectors()/phases().
+    """
+    write_metrics_multi([{
+        "service": service,
+        "collectors_run": collectors_run,
+        "collectors_failed": collectors_failed,
+        "duration_sec": duration_sec,
+        "bundle_size_bytes": bundle_size_bytes,
+        "compression_sec": compression_sec,
+        "compression_ratio": compression_ratio,
+        "collectors": collectors or {},
+        "phases": phases or {},
+    }])
+
+
+def write_metrics_multi(records: List[dict]):
+    """Same as write_metrics, one record per service.
+
+    Every service shares the one toolkit.prom. Samples for services not in
+    this run are carried over from the existing file - before this, the
+    last cron job to finish wiped everyone else's metrics.
     """
     metrics_path = METRICS_DIR / METRICS_FILE
 
@@ -28,36 +131,35 @@ def write_metrics(service: str, collectors_run: list, collectors_failed: list,
     if not METRICS_DIR.exists():
         return
 
-    timestamp = int(time.time() * 1000)
-
-    lines = [
-        "# HELP toolkit_collection_total Total bundle collections",
-        "# TYPE toolkit_collection_total counter",
-        f'toolkit_collection_total{{service="{service}"}} 1',
-        "",
-        "# HELP toolkit_collection_duration_seconds Time to collect bundle",
-        "# TYPE toolkit_collection_duration_seconds gauge",
-        f'toolkit_collection_duration_seconds{{service="{service}"}} {duration_sec:.2f}',
-        "",
-        "# HELP toolkit_collectors_success Number of collectors that succeeded",
-        "# TYPE toolkit_collectors_success gauge",
-        f'toolkit_collectors_success{{service="{service}"}} {len(collectors_run)}',
-        "",
-        "# HELP toolkit_collectors_failed Number of collectors that failed",
-        "# TYPE toolkit_collectors_failed gauge",
-        f'toolkit_collectors_failed{{service="{service}"}} {len(collectors_failed)}',
-        "",
-        "# HELP toolkit_bundle_size_bytes Size of generated bundle",
-        "# TYPE toolkit_bundle_size_bytes gauge",
-        f'toolkit_bundle_size_bytes{{service="{service}"}} {bundle_size_bytes}',
-        "",
-        "# HELP toolkit_last_collection_timestamp_seconds Last collection time",
-        "# TYPE toolkit_last_collection_timestamp_seconds gauge",
-        f'toolkit_last_collection_timestamp_seconds{{service="{service}"}} {time.time():.0f}',
-    ]
+    with _write_lock:
+        _write(metrics_path, records)
+
+
+def _write(metrics_path: Path, records: List[dict]):
+    now = time.time()
+    ours = {r["service"] for r in records}
+    old = _existing_samples(metrics_path)
+
+    lines = []
+    families = _FAMILIES + _COLLECTOR_FAMILIES + [_PHASE_FAMILY + (None,)]
+    for name, mtype, help_text, value in families:
+        if lines:
+            lines.append("")
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {mtype}"]
+        samples = {svc: v for svc, v in old.get(name, {}).items() if svc not in ours}
+        for r in records:
+            samples[r["service"]] = _samples(name, {"timestamp": now, **r}, value)
+        for svc in sorted(samples):
+            lines += samples[svc]
 
+    # Write + rename so node_exporter never scrapes half a file
+    tmp = metrics_path.with_name(f".{METRICS_FILE}.{os.getpid()}.tmp")
     try:
-        metrics_path.write_text("\n".join(lines) + "\n")
+        tmp.write_text("\n".join(lines) + "\n")
+        os.replace(tmp, metrics_path)
     except (PermissionError, OSError):
         # Can't write metrics, not a big deal
-        pass
+        try:
+            tmp.unlink()
+        except OSError:
+            pass
@@ -0,0 +1,113 @@
+"""`toolkit --startup-profile` - where the time goes before the first command.
+
+For watch triggers and cron, time from exec to the first command is what
+decides whether we catch the failing process, so it's worth being able
+to see. With the flag on, this records:
+
+  * when the process started (from /proc/self/stat, 10ms resolution)
+  * named marks along the way (main entered, args parsed, config loaded...)
+  * how long every module imported after main() took (inclusive)
+  * when the first command was spawned
+
+and prints it to stderr when main() returns. Off, every hook is a
+single attribute check. Stdlib only - this is imported before anything.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import time
+from typing import Dict, List, Tuple
+
+enabled = False
+_t0 = 0.0  # perf_counter() at process start
+_marks: List[Tuple[str, float]] = []
+_imports: Dict[str, float] = {}
+_first_cmd: Tuple[str, float] | None = None
+
+
+def _process_age() -> float | None:
+    """Seconds since this process was exec'd, None if /proc isn't there."""
+    try:
+        with open("/proc/self/stat", "rb") as f:
+            raw = f.read()
+        with open("/proc/uptime", "rb") as f:
+            uptime = float(f.read().split()[0])
+        start_ticks = int(raw[raw.rindex(b")") + 2:].split()[19])
+        return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class _TimedLoader:
+    def __init__(self, loader, name: str):
+        self._loader = loader
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(self._loader, attr)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        t = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            _imports[self._name] = time.perf_counter() - t
+
+
+class _TimingFinder:
+    """Meta path finder that asks the real finders, then times exec_module."""
+
+    @classmethod
+    def find_spec(cls, name, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is cls or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                    spec.loader = _TimedLoader(spec.loader, name)
+                return spec
+        return None
+
+
+def enable() -> None:
+    global enabled, _t0
+    enabled = True
+    age = _process_age()
+    now = time.perf_counter()
+    _t0 = now - age if age is not None else now
+    _marks.append(("main() entered (interpreter + toolkit.cli import)", now))
+    sys.meta_path.insert(0, _TimingFinder)
+
+
+def mark(label: str) -> None:
+    if enabled:
+        _marks.append((label, time.perf_counter()))
+
+
+def command_started(cmd) -> None:
+    global _first_cmd
+    if enabled and _first_cmd is None:
+        _first_cmd = (" ".join(cmd)[:60], time.perf_counter())
+
+
+def report(top: int = 15) -> str:
+    def ms(t: float) -> str:
+        return f"{(t - _t0) * 1000:9.1f}"
+
+    lines = ["startup profile (ms since process start):"]
+    events = list(_marks)
+    if _first_cmd is not None:
+        events.append((f"first command spawned: {_first_cmd[0]}", _first_cmd[1]))
+    for label, t in sorted(events, key=lambda e: e[1]):
+        lines.append(f"{ms(t)}  {label}")
+    if _imports:
+        lines.append(f"imports after main() ({len(_imports)} modules, inclusive ms, top {top}):")
+        for name, sec in sorted(_imports.items(), key=lambda kv: -kv[1])[:top]:
+            lines.append(f"{sec * 1000:9.1f}  {name}")
+    return "\n".join(lines)
@@ -1,21 +1,83 @@
 """Version info for the toolkit."""
 
+from __future__ import annotations
+
+import functools
 import subprocess
+import sys
+from pathlib import Path
 
 __version__ = "0.3.0"
 
+# Written at build/install time by `python -m toolkit.version --stamp`
+# (the Dockerfile does this). Not checked in.
+_BUILD_INFO = Path(__file__).with_name("_build_info.py")
+
+
+def _read_git(root: Path) -> str | None:
+    """HEAD commit from the .git dir itself - no fork."""
+    git = root / ".git"
+    if git.is_file():
+        # worktrees/submodules: .git is a "gitdir: <path>" file
+        text = git.read_text().strip()
+        if not text.startswith("gitdir:"):
+            return None
+        git = (root / text[len("gitdir:"):].strip()).resolve()
+    head = (git / "HEAD").read_text().strip()
+    if not head.startswith("ref:"):
+        return head[:7]  # detached
+    ref = head[len("ref:"):].strip()
+    # linked worktrees keep refs in the main repo
+    common = git / "commondir"
+    if common.exists():
+        git = (git / common.read_text().strip()).resolve()
+    loose = git / ref
+    if loose.exists():
+        return loose.read_text().strip()[:7]
+    packed = git / "packed-refs"
+    if packed.exists():
+        for line in packed.read_text().splitlines():
+            sha, _, name = line.partition(" ")
+            if name == ref:
+                return sha[:7]
+    return None
 
+
+@functools.lru_cache(maxsize=1)
 def get_git_hash() -> str:
-    """Try to get current git commit hash. Returns 'unknown' if not in a git repo."""
+    """Commit the toolkit was built from. Returns 'unknown' if it can't tell.
+
+    Stamped hash first, then a direct read of the checkout's .git. This
+    used to fork `git rev-parse` on every collection, which took 5s on a
+    box with a hung NFS mount.
+    """
     try:
-        result = subprocess.run(
-            ["git", "rev-parse", "--short", "HEAD"],
-            capture_output=True,
-            text=True,
-            timeout=5,
-        )
-        if result.returncode == 0:
-            return result.stdout.strip()
-    except Exception:
+        from toolkit._build_info import GIT_HASH
+        return GIT_HASH
+    except ImportError:
         pass
-    return "unknown"
+    try:
+        return _read_git(Path(__file__).resolve().parent.parent) or "unknown"
+    except (OSError, UnicodeDecodeError):
+        return "unknown"
+
+
+def stamp(git_hash: str | None = None) -> str:
+    """Write _build_info.py. Without a hash, asks git (fine at build time)."""
+    if not git_hash:
+        r = subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                           capture_output=True, text=True, timeout=30,
+                           cwd=Path(__file__).resolve().parent.parent)
+        git_hash = r.stdout.strip() if r.returncode == 0 else "unknown"
+    _BUILD_INFO.write_text(
+        '"""Generated by `python -m toolkit.version --stamp` - don\'t edit."""\n\n'
+        f"GIT_HASH = {git_hash!r}\n"
+    )
+    return git_hash
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "--stamp":
+        print(stamp(sys.argv[2] if len(sys.argv) > 2 else None))
+    else:
+        print(f"{__version__} ({get_git_hash()})")